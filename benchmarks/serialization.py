@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк сериализации ответа GET /submitData/{id}.
+
+Сравнивает прежний путь (схема PerevalDetailResponse, повторная валидация
+по response_model и стандартный json, как это делает FastAPI) с текущим
+(схема через model_construct без повторной валидации и orjson). Перевалы собираются в памяти, база
+данных не нужна; данные изображений читаются из временного хранилища блобов.
+
+Запуск из корня проекта:
+    python benchmarks/serialization.py --iterations 2000 --images 3
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+
+import orjson
+from pydantic import TypeAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.coords import Coords  # noqa: E402
+from models.image import Image  # noqa: E402
+from models.level import Level  # noqa: E402
+from models.pereval import Pereval, PerevalStatus  # noqa: E402
+from models.user import User  # noqa: E402
+from routers.submit_data import _detail_dict  # noqa: E402
+from schemas.image import ImageResponse, ImageSummaryResponse  # noqa: E402
+from schemas.pereval import PerevalDetailResponse  # noqa: E402
+from storage.blob_store import LocalBlobStore  # noqa: E402
+
+# Размер тестового изображения (байт)
+IMAGE_SIZE = 200 * 1024
+
+# FastAPI создает адаптер response_model один раз при регистрации маршрута
+RESPONSE_ADAPTER = TypeAdapter(PerevalDetailResponse)
+
+
+def build_pereval(blob_store: LocalBlobStore, image_count: int) -> Pereval:
+    """Перевал со всеми связями, не привязанный к сессии."""
+    content = os.urandom(IMAGE_SIZE)
+    key = blob_store.put(content)
+    return Pereval(
+        id=1,
+        beauty_title="пер. Тестовый",
+        title="Тестовый перевал",
+        other_titles="Тест",
+        connect="",
+        add_time=datetime(2021, 9, 22, 13, 18, 13),
+        status=PerevalStatus.NEW,
+        user=User(id=1, email="user@example.com", fam="Иванов", name="Иван", otc="Иванович", phone="+7 999 123 45 67"),
+        coords=Coords(id=1, latitude=45.3842, longitude=7.1525, height=1200.0),
+        level=Level(id=1, winter="", summer="1А", autumn="1А", spring=""),
+        images=[
+            Image(id=index, pereval_id=1, blob_key=key, size=IMAGE_SIZE, mime_type="image/jpeg", title=f"Фото {index}")
+            for index in range(1, image_count + 1)
+        ]
+    )
+
+
+def legacy_serialize(pereval: Pereval, blob_store: LocalBlobStore, include_image_data: bool) -> bytes:
+    """Прежний путь: схема из словаря, валидация по response_model, json.dumps."""
+    images = []
+    for image in pereval.images:
+        if include_image_data:
+            images.append(ImageResponse(
+                id=image.id,
+                pereval_id=image.pereval_id,
+                title=image.title,
+                size=image.size,
+                mime_type=image.mime_type,
+                data=base64.b64encode(blob_store.get(image.blob_key)).decode()
+            ))
+        else:
+            images.append(ImageSummaryResponse.model_validate(image))
+    response = PerevalDetailResponse(
+        id=pereval.id,
+        beauty_title=pereval.beauty_title,
+        title=pereval.title,
+        other_titles=pereval.other_titles,
+        connect=pereval.connect,
+        add_time=pereval.add_time,
+        status=pereval.status.value,
+        user=pereval.user,
+        coords=pereval.coords,
+        level=pereval.level,
+        images=images
+    )
+    # FastAPI валидирует возвращенное значение по response_model и сериализует его
+    content = RESPONSE_ADAPTER.dump_python(RESPONSE_ADAPTER.validate_python(response, from_attributes=True), mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def fast_serialize(pereval: Pereval, blob_store: LocalBlobStore, include_image_data: bool) -> bytes:
+    """Текущий путь: model_construct из ORM-объектов и orjson."""
+    return orjson.dumps(_detail_dict(pereval, blob_store, include_image_data))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000, help="Повторов на каждый вариант")
+    parser.add_argument("--images", type=int, default=3, help="Изображений у перевала")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as blob_dir:
+        blob_store = LocalBlobStore(blob_dir)
+        print(f"{'вариант':<28}{'прежний, мкс':>14}{'orjson, мкс':>14}{'ускорение':>12}")
+        for image_count, include_image_data in ((0, False), (args.images, False), (args.images, True)):
+            pereval = build_pereval(blob_store, image_count)
+            assert json.loads(legacy_serialize(pereval, blob_store, include_image_data)) == \
+                json.loads(fast_serialize(pereval, blob_store, include_image_data))
+
+            iterations = args.iterations if not include_image_data else max(args.iterations // 20, 10)
+            timings = [
+                min(timeit.repeat(
+                    lambda: serialize(pereval, blob_store, include_image_data), number=iterations, repeat=3
+                )) / iterations * 1e6
+                for serialize in (legacy_serialize, fast_serialize)
+            ]
+            label = f"{image_count} изобр." + (", images.data" if include_image_data else "")
+            print(f"{label:<28}{timings[0]:>14.1f}{timings[1]:>14.1f}{timings[0] / timings[1]:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
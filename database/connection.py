@@ -3,9 +3,11 @@
 """
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
+from database.pool_stats import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool
 
 # Загрузка переменных окружения
 load_dotenv()
@@ -17,15 +19,45 @@ DB_LOGIN = os.getenv("FSTR_DB_LOGIN", "postgres")
 DB_PASS = os.getenv("FSTR_DB_PASS", "password")
 DB_NAME = os.getenv("FSTR_DB_NAME", "pereval_db")
 
+# Параметры пула соединений (на каждый процесс-воркер и на каждый движок)
+DB_POOL_SIZE = int(os.getenv("FSTR_DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("FSTR_DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("FSTR_DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("FSTR_DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("FSTR_DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Логирование всех SQL запросов - только для отладки
+DB_ECHO = os.getenv("FSTR_DB_ECHO", "false").lower() in ("1", "true", "yes")
+
 # Создание URL для подключения к PostgreSQL
 DATABASE_URL = f"postgresql://{DB_LOGIN}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# URL для асинхронного подключения через драйвер asyncpg
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_LOGIN}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Общие настройки пула для синхронного и асинхронного движков
+ENGINE_OPTIONS = {
+    "echo": DB_ECHO,
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
 # Создание движка SQLAlchemy
-engine = create_engine(DATABASE_URL, echo=True)
+engine = create_engine(DATABASE_URL, poolclass=InstrumentedQueuePool, **ENGINE_OPTIONS)
 
 # Создаем фабрику сессий для работы с базой данных
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронный движок и фабрика сессий для обработчиков запросов.
+# expire_on_commit=False: после коммита объекты остаются доступными без
+# повторной загрузки, которая в асинхронном режиме невозможна неявно.
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, poolclass=InstrumentedAsyncAdaptedQueuePool, **ENGINE_OPTIONS
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Базовый класс для моделей
 Base = declarative_base()
 
@@ -39,3 +71,12 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Асинхронный генератор сессии базы данных.
+    Используется как dependency в FastAPI.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
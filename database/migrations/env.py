@@ -18,6 +18,8 @@ from models.coords import Coords
 from models.level import Level
 from models.image import Image
 from models.pereval import Pereval
+from models.moderation_audit import ModerationAudit
+from models.idempotency_key import IdempotencyKey
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,27 @@
+"""Индекс для курсорной пагинации перевалов пользователя
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_pereval_user_id_add_time_id",
+        "pereval",
+        ["user_id", "add_time", "id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_pereval_user_id_add_time_id", table_name="pereval")
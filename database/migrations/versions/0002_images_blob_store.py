@@ -0,0 +1,95 @@
+"""Перенос данных изображений в хранилище блобов
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    from storage.blob_store import get_blob_store
+    from storage.images import InvalidImageError, decode_base64_image, sniff_mime_type
+
+    op.add_column("images", sa.Column("blob_key", sa.String(64), nullable=True))
+    op.add_column("images", sa.Column("size", sa.Integer(), nullable=True))
+    op.add_column("images", sa.Column("mime_type", sa.String(), nullable=True))
+
+    # Декодируем base64 один раз и переносим байты в хранилище блобов
+    blob_store = get_blob_store()
+    connection = op.get_bind()
+    images = sa.table(
+        "images",
+        sa.column("id", sa.Integer),
+        sa.column("data", sa.Text),
+        sa.column("blob_key", sa.String),
+        sa.column("size", sa.Integer),
+        sa.column("mime_type", sa.String),
+    )
+    image_ids = connection.execute(sa.select(images.c.id)).scalars().all()
+    for image_id in image_ids:
+        data = connection.execute(
+            sa.select(images.c.data).where(images.c.id == image_id)
+        ).scalar_one()
+        try:
+            content = decode_base64_image(data)
+        except InvalidImageError:
+            # Старые строки с некорректным base64 не прерывают миграцию:
+            # их содержимое сохраняется в хранилище как есть
+            logger.warning("Изображение %s: некорректный base64, данные перенесены без декодирования", image_id)
+            content = (data or "").encode()
+        connection.execute(
+            images.update().where(images.c.id == image_id).values(
+                blob_key=blob_store.put(content),
+                size=len(content),
+                mime_type=sniff_mime_type(content),
+            )
+        )
+
+    op.alter_column("images", "blob_key", nullable=False)
+    op.alter_column("images", "size", nullable=False)
+    op.alter_column("images", "mime_type", nullable=False)
+    op.create_index("ix_images_blob_key", "images", ["blob_key"])
+    op.drop_column("images", "data")
+
+
+def downgrade() -> None:
+    import base64
+    from storage.blob_store import get_blob_store
+
+    op.add_column("images", sa.Column("data", sa.Text(), nullable=True))
+
+    blob_store = get_blob_store()
+    connection = op.get_bind()
+    images = sa.table(
+        "images",
+        sa.column("id", sa.Integer),
+        sa.column("data", sa.Text),
+        sa.column("blob_key", sa.String),
+    )
+    rows = connection.execute(sa.select(images.c.id, images.c.blob_key)).all()
+    for image_id, key in rows:
+        connection.execute(
+            images.update().where(images.c.id == image_id).values(
+                data=base64.b64encode(blob_store.get(key)).decode()
+            )
+        )
+
+    op.alter_column("images", "data", nullable=False)
+    op.drop_index("ix_images_blob_key", table_name="images")
+    op.drop_column("images", "mime_type")
+    op.drop_column("images", "size")
+    op.drop_column("images", "blob_key")
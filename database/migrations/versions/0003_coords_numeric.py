@@ -0,0 +1,45 @@
+"""Числовые координаты и индекс для поиска по области карты
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ("latitude", "longitude", "height")
+
+
+def upgrade() -> None:
+    for column in COLUMNS:
+        # Допускаем десятичную запятую в старых строковых значениях
+        op.alter_column(
+            "coords",
+            column,
+            type_=sa.Float(),
+            existing_type=sa.String(),
+            existing_nullable=False,
+            postgresql_using=f"replace(trim({column}), ',', '.')::double precision",
+        )
+    op.create_index("ix_coords_latitude_longitude", "coords", ["latitude", "longitude"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_coords_latitude_longitude", table_name="coords")
+    for column in COLUMNS:
+        op.alter_column(
+            "coords",
+            column,
+            type_=sa.String(),
+            existing_type=sa.Float(),
+            existing_nullable=False,
+            postgresql_using=f"{column}::text",
+        )
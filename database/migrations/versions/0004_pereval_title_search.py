@@ -0,0 +1,36 @@
+"""Индексы поиска перевалов по названиям
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+SEARCH_DOCUMENT = (
+    "coalesce(beauty_title, '') || ' ' || coalesce(title, '') || ' ' || coalesce(other_titles, '')"
+)
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        "CREATE INDEX ix_pereval_search_tsv ON pereval "
+        f"USING gin (to_tsvector('simple'::regconfig, {SEARCH_DOCUMENT}))"
+    )
+    op.execute(
+        "CREATE INDEX ix_pereval_search_trgm ON pereval "
+        f"USING gin (({SEARCH_DOCUMENT}) gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_pereval_search_trgm", table_name="pereval")
+    op.drop_index("ix_pereval_search_tsv", table_name="pereval")
@@ -0,0 +1,23 @@
+"""Индекс для списка перевалов по статусу
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_pereval_status_add_time_id", "pereval", ["status", "add_time", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_pereval_status_add_time_id", table_name="pereval")
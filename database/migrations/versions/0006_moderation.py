@@ -0,0 +1,46 @@
+"""Модерация: захват перевалов модераторами и журнал действий
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+# Тип создан вместе с таблицей pereval, здесь только используется
+pereval_status = postgresql.ENUM("NEW", "PENDING", "ACCEPTED", "REJECTED", name="perevalstatus", create_type=False)
+
+
+def upgrade() -> None:
+    op.add_column("pereval", sa.Column("claimed_by", sa.String(), nullable=True))
+    op.add_column("pereval", sa.Column("claimed_at", sa.DateTime(), nullable=True))
+    op.create_table(
+        "moderation_audit",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("pereval_id", sa.Integer(), sa.ForeignKey("pereval.id"), nullable=False),
+        sa.Column("moderator", sa.String(), nullable=False),
+        sa.Column("action", sa.String(), nullable=False),
+        sa.Column("from_status", pereval_status, nullable=False),
+        sa.Column("to_status", pereval_status, nullable=False),
+        sa.Column("comment", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_moderation_audit_id", "moderation_audit", ["id"])
+    op.create_index("ix_moderation_audit_pereval_id", "moderation_audit", ["pereval_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_moderation_audit_pereval_id", table_name="moderation_audit")
+    op.drop_index("ix_moderation_audit_id", table_name="moderation_audit")
+    op.drop_table("moderation_audit")
+    op.drop_column("pereval", "claimed_at")
+    op.drop_column("pereval", "claimed_by")
@@ -0,0 +1,28 @@
+"""Версия и время изменения перевала для условных HTTP-запросов
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("pereval", sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+    op.add_column("pereval", sa.Column("updated_at", sa.DateTime(), nullable=True))
+    op.execute("UPDATE pereval SET updated_at = add_time")
+    op.alter_column("pereval", "updated_at", existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade() -> None:
+    op.drop_column("pereval", "updated_at")
+    op.drop_column("pereval", "version")
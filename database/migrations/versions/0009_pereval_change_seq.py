@@ -0,0 +1,28 @@
+"""Последовательность изменений перевалов для синхронизации
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Существующие перевалы получают номер 0: они меньше номера любой новой
+    # транзакции и приходят при первой синхронизации в порядке id
+    op.add_column("pereval", sa.Column("change_seq", sa.BigInteger(), nullable=False, server_default="0"))
+    op.create_index("ix_pereval_user_id_change_seq_id", "pereval", ["user_id", "change_seq", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_pereval_user_id_change_seq_id", table_name="pereval")
+    op.drop_column("pereval", "change_seq")
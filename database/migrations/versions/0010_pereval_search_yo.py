@@ -0,0 +1,47 @@
+"""Индексы поиска перевалов без различия ё и е
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+# Выражения совпадают с models.pereval.pereval_search_document
+OLD_SEARCH_DOCUMENT = (
+    "coalesce(beauty_title, '') || ' ' || coalesce(title, '') || ' ' || coalesce(other_titles, '')"
+)
+SEARCH_DOCUMENT = f"translate(lower({OLD_SEARCH_DOCUMENT}), 'ёЁ', 'ее')"
+
+
+def _create_indexes(document: str) -> None:
+    op.execute(
+        "CREATE INDEX ix_pereval_search_tsv ON pereval "
+        f"USING gin (to_tsvector('simple'::regconfig, {document}))"
+    )
+    op.execute(
+        "CREATE INDEX ix_pereval_search_trgm ON pereval "
+        f"USING gin (({document}) gin_trgm_ops)"
+    )
+
+
+def _drop_indexes() -> None:
+    op.drop_index("ix_pereval_search_trgm", table_name="pereval")
+    op.drop_index("ix_pereval_search_tsv", table_name="pereval")
+
+
+def upgrade() -> None:
+    _drop_indexes()
+    _create_indexes(SEARCH_DOCUMENT)
+
+
+def downgrade() -> None:
+    _drop_indexes()
+    _create_indexes(OLD_SEARCH_DOCUMENT)
@@ -0,0 +1,76 @@
+"""
+Инструментированные пулы соединений и статистика их использования.
+"""
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolStatsMixin:
+    """
+    Считает выдачи соединений из пула, время ожидания и таймауты.
+
+    Счетчики - простые атрибуты без блокировок: под GIL инкремент
+    выполняется атомарно, а небольшая неточность при гонке допустима.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.checkout_time_total = 0.0
+        self.checkout_time_max = 0.0
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        elapsed = time.perf_counter() - started
+        self.checkouts += 1
+        self.checkout_time_total += elapsed
+        if elapsed > self.checkout_time_max:
+            self.checkout_time_max = elapsed
+        if self.overflow() > 0:
+            self.overflow_checkouts += 1
+        return connection
+
+
+class InstrumentedQueuePool(PoolStatsMixin, QueuePool):
+    """QueuePool со статистикой для синхронного движка."""
+
+
+class InstrumentedAsyncAdaptedQueuePool(PoolStatsMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool со статистикой для асинхронного движка."""
+
+
+def pool_stats(pool) -> dict:
+    """Снимок состояния пула соединений и накопленных счетчиков."""
+    stats = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        size = pool.size()
+        checked_out = pool.checkedout()
+        stats.update({
+            "size": size,
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+            "checked_in": pool.checkedin(),
+            "checked_out": checked_out,
+            "overflow": max(pool.overflow(), 0),
+            "utilization": round(checked_out / (size + max(pool._max_overflow, 0)), 3) if size else None,
+        })
+    if isinstance(pool, PoolStatsMixin):
+        stats.update({
+            "checkouts": pool.checkouts,
+            "overflow_checkouts": pool.overflow_checkouts,
+            "timeouts": pool.timeouts,
+            "checkout_time_avg_ms": round(pool.checkout_time_total / pool.checkouts * 1000, 3) if pool.checkouts else 0.0,
+            "checkout_time_max_ms": round(pool.checkout_time_max * 1000, 3),
+        })
+    return stats
@@ -1,19 +1,43 @@
 """
 Главный файл FastAPI приложения для работы с перевалами.
 """
+import asyncio
+import contextlib
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routers.submit_data import router as submit_data_router
-from database.connection import engine, Base
+from routers.images import router as images_router
+from routers.perevals import router as perevals_router
+from routers.moderation import router as moderation_router
+from routers.admin import router as admin_router
+from routers.sync import router as sync_router
+from routers.metrics import router as metrics_router
+from database.connection import async_engine, engine, Base
+from services import metrics
+from services.request_stats import RequestStatsMiddleware, instrument_engine
 
 # Создание таблиц в базе данных
 Base.metadata.create_all(bind=engine)
 
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Запуск и остановка воркера: выгрузка метрик для суммирования по воркерам."""
+    if not metrics.METRICS_DIR:
+        yield
+        return
+    flush_task = asyncio.create_task(metrics.flush_periodically(metrics.METRICS_DIR))
+    try:
+        yield
+    finally:
+        flush_task.cancel()
+        metrics.write_snapshot(metrics.METRICS_DIR)
+
 # Создание экземпляра FastAPI
 app = FastAPI(
     title="Перевалы API",
     description="API для работы с данными о перевалах",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Настройка CORS
@@ -25,8 +49,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# SQL-статистика запросов: заголовок Server-Timing, лог и журнал медленных запросов
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+app.add_middleware(RequestStatsMiddleware)
+
 # Подключение роутеров
 app.include_router(submit_data_router, prefix="/api", tags=["submit"])
+app.include_router(images_router, prefix="/api", tags=["images"])
+app.include_router(perevals_router, prefix="/api", tags=["perevals"])
+app.include_router(moderation_router, prefix="/api", tags=["moderation"])
+app.include_router(sync_router, prefix="/api", tags=["sync"])
+app.include_router(admin_router, prefix="/api", tags=["admin"])
+app.include_router(metrics_router, tags=["admin"])
 
 @app.get("/")
 async def root():
@@ -1,15 +1,19 @@
 """
 Модель координат для SQLAlchemy.
 """
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, Float, Index
 from database.connection import Base
 
 class Coords(Base):
     """Координаты перевала на карте."""
 
     __tablename__ = "coords"
+    __table_args__ = (
+        # Поиск перевалов в прямоугольной области карты
+        Index("ix_coords_latitude_longitude", "latitude", "longitude"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    latitude = Column(String, nullable=False)  # Широта перевала
-    longitude = Column(String, nullable=False)  # Долгота перевала
-    height = Column(String, nullable=False)    # Высота над уровнем моря
+    latitude = Column(Float, nullable=False)  # Широта перевала, градусы
+    longitude = Column(Float, nullable=False)  # Долгота перевала, градусы
+    height = Column(Float, nullable=False)    # Высота над уровнем моря, метры
@@ -0,0 +1,17 @@
+"""
+Модель ключей идемпотентности для SQLAlchemy.
+"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from database.connection import Base
+
+
+class IdempotencyKey(Base):
+    """Ключ идемпотентности POST /submitData и созданный по нему перевал."""
+
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)  # Idempotency-Key или content:<хэш запроса>
+    request_hash = Column(String(64), nullable=False)  # SHA-256 содержимого запроса
+    pereval_id = Column(Integer, ForeignKey("pereval.id"), nullable=True)  # Созданный перевал
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)  # Для удаления устаревших
@@ -1,16 +1,18 @@
 """
 Модель изображения для SQLAlchemy.
 """
-from sqlalchemy import Column, Integer, String, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, ForeignKey
 from database.connection import Base
 
 
 class Image(Base):
-    """Фотографии перевала в формате base64."""
+    """Фотографии перевала (сами байты лежат в хранилище блобов)."""
 
     __tablename__ = "images"
 
     id = Column(Integer, primary_key=True, index=True)
-    data = Column(Text, nullable=False)  # Само изображение в base64
+    blob_key = Column(String(64), nullable=False, index=True)  # SHA-256 содержимого в хранилище блобов
+    size = Column(Integer, nullable=False)  # Размер изображения в байтах
+    mime_type = Column(String, nullable=False)  # MIME-тип изображения
     title = Column(String, nullable=False)  # Название фотографии
     pereval_id = Column(Integer, ForeignKey("pereval.id"), nullable=False)  # К какому перевалу относится
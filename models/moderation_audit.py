@@ -0,0 +1,21 @@
+"""
+Модель журнала модерации для SQLAlchemy.
+"""
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum
+from database.connection import Base
+from models.pereval import PerevalStatus
+
+
+class ModerationAudit(Base):
+    """Запись журнала модерации: кто и когда изменил статус перевала."""
+
+    __tablename__ = "moderation_audit"
+
+    id = Column(Integer, primary_key=True, index=True)
+    pereval_id = Column(Integer, ForeignKey("pereval.id"), nullable=False, index=True)  # Какой перевал
+    moderator = Column(String, nullable=False)  # Кто выполнил действие
+    action = Column(String, nullable=False)  # claim, release, expire, accept, reject
+    from_status = Column(Enum(PerevalStatus), nullable=False)  # Статус до действия
+    to_status = Column(Enum(PerevalStatus), nullable=False)  # Статус после действия
+    comment = Column(String, nullable=True)  # Комментарий модератора
+    created_at = Column(DateTime, nullable=False)  # Когда выполнено действие
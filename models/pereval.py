@@ -1,9 +1,11 @@
 """
 Модель перевала для SQLAlchemy.
 """
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum
+from sqlalchemy import BigInteger, Column, Integer, String, ForeignKey, DateTime, Enum, Index, DDL, event, func, text
+from sqlalchemy.orm import relationship
 from database.connection import Base
 import enum
+from datetime import datetime
 
 
 class PerevalStatus(enum.Enum):
@@ -18,6 +20,14 @@ class Pereval(Base):
     """Информация о перевале - основная сущность."""
 
     __tablename__ = "pereval"
+    __table_args__ = (
+        # Курсорная пагинация перевалов пользователя по (add_time, id)
+        Index("ix_pereval_user_id_add_time_id", "user_id", "add_time", "id"),
+        # Список перевалов по статусу (очередь модерации) в порядке (add_time, id)
+        Index("ix_pereval_status_add_time_id", "status", "add_time", "id"),
+        # Синхронизация перевалов пользователя по (change_seq, id)
+        Index("ix_pereval_user_id_change_seq_id", "user_id", "change_seq", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     beauty_title = Column(String, nullable=False)  # Красивое название перевала
@@ -29,3 +39,51 @@ class Pereval(Base):
     coords_id = Column(Integer, ForeignKey("coords.id"), nullable=False)  # Где находится
     level_id = Column(Integer, ForeignKey("levels.id"), nullable=False)  # Уровень сложности
     status = Column(Enum(PerevalStatus), default=PerevalStatus.NEW, nullable=False)  # Статус обработки
+    claimed_by = Column(String, nullable=True)  # Модератор, который взял перевал в работу
+    claimed_at = Column(DateTime, nullable=True)  # Когда перевал взят в работу
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Растет при каждом изменении
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # Время последнего изменения (UTC)
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")  # Номер последнего изменения
+
+    # Связанные сущности (загружаются явно через options() в репозитории)
+    user = relationship("User")
+    coords = relationship("Coords")
+    level = relationship("Level")
+    images = relationship("Image", order_by="Image.id")
+
+
+# Текст для поиска по названиям в нижнем регистре, ё приравнивается к е
+# (как в services.title_search.title_words). Константы записаны через text(),
+# а не параметрами, чтобы выражение в запросе совпадало с выражением индексов.
+pereval_search_document = func.translate(
+    func.lower(
+        func.coalesce(Pereval.__table__.c.beauty_title, text("''"))
+        .concat(text("' '"))
+        .concat(func.coalesce(Pereval.__table__.c.title, text("''")))
+        .concat(text("' '"))
+        .concat(func.coalesce(Pereval.__table__.c.other_titles, text("''")))
+    ),
+    text("'ёЁ'"),
+    text("'ее'")
+)
+
+# Полнотекстовый поиск по префиксам слов
+pereval_search_vector = func.to_tsvector(text("'simple'::regconfig"), pereval_search_document)
+
+# Индексы поиска есть только в PostgreSQL (в SQLite используется поиск в памяти)
+event.listen(
+    Pereval.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+Index(
+    "ix_pereval_search_tsv",
+    pereval_search_vector,
+    postgresql_using="gin"
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_pereval_search_trgm",
+    pereval_search_document.label("search_document"),
+    postgresql_using="gin",
+    postgresql_ops={"search_document": "gin_trgm_ops"}
+).ddl_if(dialect="postgresql")
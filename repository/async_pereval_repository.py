@@ -0,0 +1,260 @@
+"""
+Асинхронный репозиторий для работы с перевалами в базе данных.
+"""
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from models.image import Image
+from models.moderation_audit import ModerationAudit
+from models.pereval import Pereval, PerevalStatus
+from repository.changes import dispatch_async_changes
+from repository.moderation import CLAIM_TIMEOUT_SECONDS
+from repository.pereval_repository import PerevalRepository
+from schemas.image import ImageCreate
+from schemas.pereval import PerevalCreate, PerevalFilters
+from storage.blob_store import BlobStore, get_blob_store
+from storage.images import store_image
+from typing import Optional, List, Tuple
+from datetime import datetime
+
+
+class AsyncPerevalRepository:
+    """
+    Асинхронный вариант PerevalRepository.
+
+    Запросы строит тот же PerevalRepository: он выполняется через
+    AsyncSession.run_sync, где ORM работает в greenlet поверх асинхронного
+    драйвера. Ожидание базы данных не блокирует цикл событий, а логика
+    записи и чтения остается в одном месте.
+
+    Возвращаемые объекты содержат все данные, нужные для ответа
+    (связи загружаются заранее), неявные ленивые загрузки после
+    возврата из метода невозможны.
+
+    Изображения декодируются, хэшируются и пишутся в хранилище блобов
+    в пуле потоков до входа в run_sync: greenlet сессии выполняется
+    в цикле событий, и файловый ввод-вывод в нем останавливал бы цикл.
+    """
+
+    def __init__(self, db: AsyncSession, blob_store: Optional[BlobStore] = None):
+        self.db = db
+        self.blob_store = blob_store or get_blob_store()
+
+    async def _run(self, method_name: str, *args, **kwargs):
+        """Вызывает метод синхронного репозитория на соединении этой сессии."""
+        def call(session: Session):
+            repository = PerevalRepository(session, self.blob_store)
+            return getattr(repository, method_name)(*args, **kwargs)
+
+        try:
+            return await self.db.run_sync(call)
+        finally:
+            # Сетевые подписчики (кэш в Redis) получают изменения уже вне run_sync
+            await dispatch_async_changes(self.db.sync_session)
+
+    async def _store_images(self, images: List[ImageCreate]) -> List[dict]:
+        """Сохраняет изображения в хранилище блобов в пуле потоков; возвращает строки images."""
+        if not images:
+            return []
+        return await run_in_threadpool(
+            lambda: [store_image(self.blob_store, image.content, image.title) for image in images]
+        )
+
+    async def create_pereval(self, pereval_data: PerevalCreate) -> Optional[int]:
+        """Создание перевала и всех связанных сущностей."""
+        stored_images = await self._store_images(pereval_data.images)
+        return await self._run("create_pereval", pereval_data, stored_images=stored_images)
+
+    async def create_pereval_idempotent(
+        self,
+        pereval_data: PerevalCreate,
+        key: str,
+        content_hash: str
+    ) -> Tuple[Optional[int], bool]:
+        """
+        Создание перевала не более одного раза на ключ идемпотентности.
+
+        Ключ занимается первым выражением транзакции, и только после этого
+        изображения сохраняются в хранилище: повтор запроса обходится одним
+        INSERT ... ON CONFLICT и чтением ключа.
+        """
+        existing_id = await self._run("claim_idempotency_key", key, content_hash)
+        if existing_id is not None:
+            return existing_id, False
+        try:
+            stored_images = await self._store_images(pereval_data.images)
+        except Exception:
+            await self.db.rollback()
+            raise
+        pereval_id = await self._run("create_pereval", pereval_data, idempotency_key=key, stored_images=stored_images)
+        return pereval_id, True
+
+    async def purge_idempotency_keys(self) -> int:
+        """Удаление устаревших ключей идемпотентности."""
+        return await self._run("purge_idempotency_keys")
+
+    async def create_perevals_batch(self, perevals_data: List[PerevalCreate]) -> List[int]:
+        """Пакетное создание перевалов."""
+        stored_images = await run_in_threadpool(lambda: [
+            [store_image(self.blob_store, image.content, image.title) for image in item.images]
+            for item in perevals_data
+        ])
+        return await self._run("create_perevals_batch", perevals_data, stored_images)
+
+    async def get_pereval_by_id(self, pereval_id: int) -> Optional[Pereval]:
+        """Получение перевала по ID."""
+        return await self._run("get_pereval_by_id", pereval_id)
+
+    async def get_pereval_detail(self, pereval_id: int, include_image_data: bool = False) -> Optional[Pereval]:
+        """Получение перевала по ID вместе со всеми связанными сущностями."""
+        return await self._run("get_pereval_detail", pereval_id, include_image_data)
+
+    async def add_images(self, pereval_id: int, images_data: List[dict]) -> Optional[List[Image]]:
+        """Добавление к перевалу изображений из хранилища блобов (None, если статус не new)."""
+        return await self._run("add_images", pereval_id, images_data)
+
+    async def get_pereval_version(self, pereval_id: int) -> Optional[Tuple[int, datetime]]:
+        """Версия и время изменения перевала без загрузки связанных сущностей."""
+        return await self._run("get_pereval_version", pereval_id)
+
+    async def get_image(self, image_id: int) -> Optional[Image]:
+        """Получение метаданных изображения по ID."""
+        return await self._run("get_image", image_id)
+
+    async def update_pereval(self, pereval_id: int, data: dict, expected_version: Optional[int] = None) -> bool:
+        """
+        Обновление перевала (только если статус = new и версия совпадает с expected_version).
+        data['images'] - список ImageCreate, изображения сохраняются до входа в run_sync.
+        """
+        if data.get('images'):
+            data = {**data, 'images': await self._store_images(data['images'])}
+        return await self._run("update_pereval", pereval_id, data, expected_version)
+
+    async def list_perevals_by_user_email(
+        self,
+        email: str,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> List[Pereval]:
+        """Получение списка перевалов по email пользователя."""
+        return await self._run("list_perevals_by_user_email", email, offset, limit)
+
+    async def page_perevals_by_user_email(
+        self,
+        email: str,
+        limit: int,
+        after: Optional[str] = None,
+        offset: int = 0,
+        include_image_data: bool = False
+    ) -> Tuple[List[Pereval], Optional[str]]:
+        """Страница перевалов пользователя с курсорной пагинацией."""
+        return await self._run("page_perevals_by_user_email", email, limit, after, offset, include_image_data)
+
+    async def page_pereval_versions_by_user_email(
+        self,
+        email: str,
+        limit: int,
+        after: Optional[str] = None,
+        offset: int = 0
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Версии перевалов страницы пользователя без связанных сущностей."""
+        return await self._run("page_pereval_versions_by_user_email", email, limit, after, offset)
+
+    async def page_perevals(
+        self,
+        filters: PerevalFilters,
+        limit: int,
+        after: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Страница перевалов по фильтрам с курсорной пагинацией."""
+        return await self._run("page_perevals", filters, limit, after)
+
+    async def page_pereval_versions(
+        self,
+        filters: PerevalFilters,
+        limit: int,
+        after: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Версии перевалов страницы по фильтрам без остальных колонок."""
+        return await self._run("page_pereval_versions", filters, limit, after)
+
+    async def sync_perevals(
+        self,
+        email: str,
+        limit: int,
+        since: Optional[str] = None
+    ) -> Tuple[List[dict], str, bool]:
+        """Изменения перевалов пользователя после курсора синхронизации."""
+        return await self._run("sync_perevals", email, limit, since)
+
+    async def list_perevals_in_bbox(
+        self,
+        min_lat: float,
+        min_lon: float,
+        max_lat: float,
+        max_lon: float,
+        limit: int
+    ) -> List[dict]:
+        """Перевалы внутри прямоугольной области карты."""
+        return await self._run("list_perevals_in_bbox", min_lat, min_lon, max_lat, max_lon, limit)
+
+    async def list_pereval_clusters(
+        self,
+        min_lat: float,
+        min_lon: float,
+        max_lat: float,
+        max_lon: float,
+        grid_size: int
+    ) -> List[dict]:
+        """Кластеры перевалов внутри области по сетке grid_size x grid_size."""
+        return await self._run("list_pereval_clusters", min_lat, min_lon, max_lat, max_lon, grid_size)
+
+    async def list_pereval_coords(self, after_seq: Optional[int] = None) -> Tuple[List[tuple], int]:
+        """Координаты перевалов, измененных после номера after_seq, для пространственного индекса."""
+        return await self._run("list_pereval_coords", after_seq)
+
+    async def get_perevals_map_items(self, pereval_ids: List[int]) -> List[dict]:
+        """Компактные данные перевалов для карты в порядке переданных id."""
+        return await self._run("get_perevals_map_items", pereval_ids)
+
+    async def search_perevals(self, text_query: str, limit: int) -> List[dict]:
+        """Поиск перевалов по названиям с учетом опечаток и недописанных слов."""
+        return await self._run("search_perevals", text_query, limit)
+
+    async def claim_perevals(
+        self,
+        moderator: str,
+        limit: int,
+        claim_timeout: int = CLAIM_TIMEOUT_SECONDS
+    ) -> List[dict]:
+        """Захват модератором следующей пачки перевалов из очереди модерации."""
+        return await self._run("claim_perevals", moderator, limit, claim_timeout)
+
+    async def decide_pereval(
+        self,
+        pereval_id: int,
+        moderator: str,
+        status: PerevalStatus,
+        comment: Optional[str] = None,
+        claim_timeout: int = CLAIM_TIMEOUT_SECONDS
+    ) -> Optional[ModerationAudit]:
+        """Решение модератора по захваченному им перевалу."""
+        return await self._run("decide_pereval", pereval_id, moderator, status, comment, claim_timeout)
+
+    async def release_pereval(
+        self,
+        pereval_id: int,
+        moderator: str,
+        comment: Optional[str] = None,
+        claim_timeout: int = CLAIM_TIMEOUT_SECONDS
+    ) -> Optional[ModerationAudit]:
+        """Возврат захваченного перевала в очередь."""
+        return await self._run("release_pereval", pereval_id, moderator, comment, claim_timeout)
+
+    async def release_expired_claims(self, claim_timeout: int = CLAIM_TIMEOUT_SECONDS) -> int:
+        """Возврат в очередь перевалов с истекшим захватом."""
+        return await self._run("release_expired_claims", claim_timeout)
+
+    async def get_moderation_audit(self, pereval_id: int) -> List[ModerationAudit]:
+        """Журнал модерации перевала."""
+        return await self._run("get_moderation_audit", pereval_id)
@@ -0,0 +1,90 @@
+"""
+Уведомления об изменениях перевалов после успешного коммита.
+
+Репозиторий отмечает измененные перевалы в сессии (record_change),
+а после коммита транзакции отметки передаются всем подписчикам
+(внутрипроцессные индексы и кэши). При откате отметки отбрасываются,
+поэтому подписчики никогда не видят незафиксированных изменений.
+
+Синхронные подписчики вызываются прямо в after_commit. Асинхронные
+(например, сброс кэша в Redis по сети) нельзя ждать внутри run_sync,
+поэтому изменения откладываются в сессии и передаются им через
+dispatch_async_changes, когда run_sync вернул управление.
+"""
+from typing import Awaitable, Callable, List, NamedTuple, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import logging
+
+logger = logging.getLogger(__name__)
+
+_SESSION_KEY = "pereval_changes"
+_COMMITTED_KEY = "pereval_changes_committed"
+
+
+class PerevalChange(NamedTuple):
+    """Изменение перевала: id и координаты до/после (если менялись)."""
+    pereval_id: int
+    coords: Optional[Tuple[float, float]] = None
+    old_coords: Optional[Tuple[float, float]] = None
+
+
+ChangeListener = Callable[[List[PerevalChange]], None]
+
+AsyncChangeListener = Callable[[List[PerevalChange]], Awaitable[None]]
+
+_listeners: List[ChangeListener] = []
+_async_listeners: List[AsyncChangeListener] = []
+
+
+def add_change_listener(listener: ChangeListener) -> None:
+    """Подписывает функцию на изменения перевалов в этом процессе."""
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def add_async_change_listener(listener: AsyncChangeListener) -> None:
+    """Подписывает корутину на изменения перевалов (см. dispatch_async_changes)."""
+    if listener not in _async_listeners:
+        _async_listeners.append(listener)
+
+
+def record_change(session: Session, change: PerevalChange) -> None:
+    """Отмечает изменение перевала в текущей транзакции сессии."""
+    session.info.setdefault(_SESSION_KEY, []).append(change)
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_changes(session: Session) -> None:
+    changes = session.info.pop(_SESSION_KEY, None)
+    if not changes:
+        return
+    for listener in _listeners:
+        try:
+            listener(changes)
+        except Exception as e:
+            # Ошибка подписчика не должна ломать уже выполненную запись
+            logger.error(f"Ошибка обработчика изменений перевалов: {str(e)}")
+    if _async_listeners:
+        session.info.setdefault(_COMMITTED_KEY, []).extend(changes)
+
+
+async def dispatch_async_changes(session: Session) -> None:
+    """
+    Передает асинхронным подписчикам изменения, закоммиченные сессией.
+    Вызывается после run_sync асинхронной сессии, в цикле событий.
+    """
+    changes = session.info.pop(_COMMITTED_KEY, None)
+    if not changes:
+        return
+    for listener in _async_listeners:
+        try:
+            await listener(changes)
+        except Exception as e:
+            logger.error(f"Ошибка обработчика изменений перевалов: {str(e)}")
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_changes(session: Session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(_SESSION_KEY, None)
@@ -0,0 +1,43 @@
+"""
+Параметры и ошибки идемпотентного создания перевалов.
+
+Клиент передает заголовок Idempotency-Key; без него ключом служит хэш
+содержимого запроса. Повтор запроса с тем же ключом в течение
+IDEMPOTENCY_TTL_SECONDS возвращает id уже созданного перевала, а не
+создает дубликат. Результаты дополнительно кэшируются в памяти воркера.
+"""
+import hashlib
+import os
+from schemas.pereval import PerevalCreate
+from services.lru import LRUCache
+
+# Сколько секунд ключ защищает от повторного создания
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("FSTR_IDEMPOTENCY_TTL", "86400"))
+
+# Максимальная длина заголовка Idempotency-Key
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+# Префикс ключей, полученных из хэша содержимого запроса
+CONTENT_KEY_PREFIX = "content:"
+
+# Ключ -> (хэш запроса, id перевала) в памяти воркера.
+# Результат по ключу не меняется, поэтому кэш не нужно сбрасывать при изменениях перевалов.
+idempotency_results = LRUCache(int(os.getenv("FSTR_IDEMPOTENCY_CACHE_SIZE", "10000")), IDEMPOTENCY_TTL_SECONDS)
+
+
+class IdempotencyKeyReusedError(Exception):
+    """Ключ идемпотентности уже использован для запроса с другим содержимым."""
+
+
+def request_hash(pereval_data: PerevalCreate) -> str:
+    """SHA-256 содержимого запроса (изображения - по хэшам их байтов)."""
+    digest = hashlib.sha256(pereval_data.model_dump_json(exclude={"images"}).encode())
+    for image in pereval_data.images:
+        digest.update(image.title.encode())
+        digest.update(hashlib.sha256(image.content).digest())
+    return digest.hexdigest()
+
+
+def content_key(content_hash: str) -> str:
+    """Ключ идемпотентности для запроса без заголовка Idempotency-Key."""
+    return CONTENT_KEY_PREFIX + content_hash
@@ -0,0 +1,26 @@
+"""
+Параметры и ошибки модерации перевалов.
+
+Модератор захватывает пачку новых перевалов (статус new -> pending)
+и в течение CLAIM_TIMEOUT_SECONDS принимает по ним решение
+(accepted / rejected) или возвращает их в очередь. Истекшие захваты
+перехватываются следующими модераторами.
+"""
+import os
+from models.pereval import PerevalStatus
+
+# Сколько секунд захват перевала действует без решения модератора
+CLAIM_TIMEOUT_SECONDS = int(os.getenv("FSTR_MODERATION_CLAIM_TIMEOUT", "900"))
+
+# Максимальный размер пачки перевалов при захвате
+MAX_CLAIM_BATCH = 50
+
+# Решения модератора и соответствующие действия в журнале
+DECISION_ACTIONS = {
+    PerevalStatus.ACCEPTED: "accept",
+    PerevalStatus.REJECTED: "reject",
+}
+
+
+class ModerationConflictError(Exception):
+    """Перевал не захвачен этим модератором или захват истек."""
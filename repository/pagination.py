@@ -0,0 +1,50 @@
+"""
+Курсорная (keyset) пагинация по паре (add_time, id), а для синхронизации -
+по паре (change_seq, id).
+"""
+import base64
+import binascii
+from datetime import datetime
+from typing import Tuple
+
+# Размер страницы по умолчанию и максимально допустимый размер страницы
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursorError(ValueError):
+    """Курсор пагинации поврежден или сформирован не сервером."""
+
+
+def encode_cursor(add_time: datetime, pereval_id: int) -> str:
+    """Кодирует позицию последней записи страницы в непрозрачный токен."""
+    raw = f"{add_time.isoformat()}|{pereval_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Раскодирует токен курсора обратно в (add_time, id)."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        add_time, pereval_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(add_time), int(pereval_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursorError("Некорректный курсор пагинации") from e
+
+
+def encode_sync_cursor(change_seq: int, pereval_id: int) -> str:
+    """Кодирует позицию последнего полученного изменения в непрозрачный токен."""
+    raw = f"{change_seq}|{pereval_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_sync_cursor(cursor: str) -> Tuple[int, int]:
+    """Раскодирует токен синхронизации обратно в (change_seq, id)."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        change_seq, pereval_id = raw.split("|")
+        return int(change_seq), int(pereval_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursorError("Некорректный курсор синхронизации") from e
@@ -1,25 +1,61 @@
 """
 Репозиторий для работы с перевалами в базе данных.
 """
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, delete, func, insert, literal, or_, select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, joinedload, selectinload
 from models.user import User
 from models.coords import Coords
 from models.level import Level
 from models.image import Image
-from models.pereval import Pereval, PerevalStatus
+from models.moderation_audit import ModerationAudit
+from models.idempotency_key import IdempotencyKey
+from models.pereval import Pereval, PerevalStatus, pereval_search_document, pereval_search_vector
 from schemas.user import UserCreate
 from schemas.coords import CoordsCreate
 from schemas.level import LevelCreate
 from schemas.image import ImageCreate
-from schemas.pereval import PerevalCreate
-from typing import Optional, List
+from schemas.pereval import PerevalCreate, PerevalFilters
+from repository.changes import PerevalChange, record_change
+from repository.idempotency import IDEMPOTENCY_TTL_SECONDS, IdempotencyKeyReusedError
+from repository.moderation import CLAIM_TIMEOUT_SECONDS, DECISION_ACTIONS, ModerationConflictError
+from repository.pagination import encode_cursor, decode_cursor, encode_sync_cursor, decode_sync_cursor
+from repository.sync import change_seq_value, stable_change_seq_limit
+from services.difficulty import DIFFICULTY_RANKS, difficulty_rank
+from services import title_search
+from storage.blob_store import BlobStore, blob_key, get_blob_store
+from storage.images import decode_base64_image, store_image
+from typing import Optional, List, Dict, Tuple
+from datetime import datetime, timedelta
+
+
+class VersionConflictError(Exception):
+    """Перевал изменился с версии, на которую рассчитывал клиент (If-Match)."""
+
+    def __init__(self, current_version: int):
+        super().__init__(f"Перевал изменен: текущая версия {current_version}")
+        self.current_version = current_version
 
 
 class PerevalRepository:
     """Репозиторий для работы с перевалами."""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, blob_store: Optional[BlobStore] = None):
         self.db = db
+        self.blob_store = blob_store or get_blob_store()
+
+    def _store_image(self, content: bytes, title: str) -> dict:
+        """
+        Сохраняет байты изображения в хранилище блобов.
+
+        Возвращает значения колонок строки images. Блоб пишется до коммита
+        транзакции: при откате он остается в хранилище, но это безопасно -
+        ключ определяется содержимым, и повторная загрузка его переиспользует.
+        AsyncPerevalRepository сохраняет изображения сам, в пуле потоков,
+        и передает в методы записи готовые строки (stored_images).
+        """
+        return store_image(self.blob_store, content, title)
 
     def create_user(self, user_data: UserCreate) -> User:
         """Создание пользователя."""
@@ -84,8 +120,7 @@ class PerevalRepository:
             db_images = []
             for image_data in images_data:
                 db_image = Image(
-                    data=image_data.data,
-                    title=image_data.title,
+                    **self._store_image(image_data.content, image_data.title),
                     pereval_id=pereval_id
                 )
                 self.db.add(db_image)
@@ -100,49 +135,371 @@ class PerevalRepository:
             self.db.rollback()
             raise e
 
-    def create_pereval(self, pereval_data: PerevalCreate) -> Optional[int]:
-        """Создание перевала и всех связанных сущностей."""
+    def _dialect_insert(self, model):
+        """INSERT с поддержкой ON CONFLICT для текущего диалекта БД."""
+        if self.db.get_bind().dialect.name == "postgresql":
+            return postgresql_insert(model)
+        return sqlite_insert(model)
+
+    def _upsert_users(self, users: List[UserCreate]) -> Dict[str, int]:
+        """
+        Находит или создает пользователей одним multi-row запросом.
+
+        Существующие записи не изменяются и не блокируются: ON CONFLICT DO NOTHING
+        возвращает id только новых пользователей, id остальных дочитываются
+        отдельным SELECT. Для повторяющихся email используются данные первого вхождения.
+        """
+        unique_users = {}
+        for user_data in users:
+            unique_users.setdefault(user_data.email, user_data)
+
+        stmt = self._dialect_insert(User).values([
+            {
+                "email": user_data.email,
+                "fam": user_data.fam,
+                "name": user_data.name,
+                "otc": user_data.otc,
+                "phone": user_data.phone
+            }
+            for user_data in unique_users.values()
+        ])
+        stmt = stmt.on_conflict_do_nothing(index_elements=[User.email]).returning(User.id, User.email)
+        user_ids = {email: user_id for user_id, email in self.db.execute(stmt)}
+
+        existing = [email for email in unique_users if email not in user_ids]
+        if existing:
+            user_ids.update(self.db.execute(select(User.email, User.id).where(User.email.in_(existing))).all())
+        return user_ids
+
+    def _upsert_user(self, user_data: UserCreate) -> int:
+        """Находит или создает одного пользователя, возвращает его id."""
+        return self._upsert_users([user_data])[user_data.email]
+
+    def create_pereval(
+        self,
+        pereval_data: PerevalCreate,
+        idempotency_key: Optional[str] = None,
+        stored_images: Optional[List[dict]] = None
+    ) -> Optional[int]:
+        """
+        Создание перевала и всех связанных сущностей.
+
+        Весь граф (пользователь, координаты, уровень, перевал, изображения)
+        записывается в одной транзакции: id получаем через RETURNING,
+        изображения вставляются одним executemany, коммит один в конце.
+        При ошибке откатывается всё, и "осиротевших" записей не остается.
+        idempotency_key - ключ, уже вставленный в этой транзакции
+        (см. create_pereval_idempotent), ему проставляется id перевала.
+        stored_images - изображения, уже сохраненные в хранилище блобов
+        (storage.images.store_image), иначе они сохраняются здесь.
+        """
         try:
-            # Создаем пользователя
-            user = self.create_user(pereval_data.user)
+            # Находим или создаем пользователя
+            user_id = self._upsert_user(pereval_data.user)
 
             # Создаем координаты
-            coords = self.create_coords(pereval_data.coords)
+            coords_id = self.db.execute(
+                insert(Coords).values(
+                    latitude=pereval_data.coords.latitude,
+                    longitude=pereval_data.coords.longitude,
+                    height=pereval_data.coords.height
+                ).returning(Coords.id)
+            ).scalar_one()
 
             # Создаем уровень сложности
-            level = self.create_level(pereval_data.level)
+            level_id = self.db.execute(
+                insert(Level).values(
+                    winter=pereval_data.level.winter,
+                    summer=pereval_data.level.summer,
+                    autumn=pereval_data.level.autumn,
+                    spring=pereval_data.level.spring
+                ).returning(Level.id)
+            ).scalar_one()
 
             # Создаем перевал
-            db_pereval = Pereval(
-                beauty_title=pereval_data.beauty_title,
-                title=pereval_data.title,
-                other_titles=pereval_data.other_titles,
-                connect=pereval_data.connect,
-                add_time=pereval_data.add_time,
-                user_id=user.id,
-                coords_id=coords.id,
-                level_id=level.id,
-                status=PerevalStatus.NEW
-            )
-            self.db.add(db_pereval)
+            pereval_id = self.db.execute(
+                insert(Pereval).values(
+                    beauty_title=pereval_data.beauty_title,
+                    title=pereval_data.title,
+                    other_titles=pereval_data.other_titles,
+                    connect=pereval_data.connect,
+                    add_time=pereval_data.add_time,
+                    user_id=user_id,
+                    coords_id=coords_id,
+                    level_id=level_id,
+                    status=PerevalStatus.NEW,
+                    change_seq=self._change_seq()
+                ).returning(Pereval.id)
+            ).scalar_one()
+
+            # Создаем изображения одним запросом
+            if stored_images is None:
+                stored_images = [
+                    self._store_image(image_data.content, image_data.title) for image_data in pereval_data.images
+                ]
+            if stored_images:
+                self.db.execute(
+                    insert(Image),
+                    [{**image_row, "pereval_id": pereval_id} for image_row in stored_images]
+                )
+
+            if idempotency_key is not None:
+                self.db.execute(
+                    update(IdempotencyKey).where(IdempotencyKey.key == idempotency_key).values(pereval_id=pereval_id)
+                )
+
+            record_change(self.db, PerevalChange(
+                pereval_id, (pereval_data.coords.latitude, pereval_data.coords.longitude)
+            ))
             self.db.commit()
-            self.db.refresh(db_pereval)
+            return pereval_id
 
-            # Создаем изображения
-            self.create_images(pereval_data.images, db_pereval.id)
+        except Exception as e:
+            self.db.rollback()
+            raise e
+
+    def create_pereval_idempotent(
+        self,
+        pereval_data: PerevalCreate,
+        key: str,
+        content_hash: str,
+        stored_images: Optional[List[dict]] = None
+    ) -> Tuple[Optional[int], bool]:
+        """
+        Создание перевала не более одного раза на ключ идемпотентности.
+
+        Возвращает (id, created): для повторного запроса - id созданного ранее
+        перевала и False, без записи изображений и связанных сущностей.
+        IdempotencyKeyReusedError - ключ использован для другого содержимого.
+        """
+        existing_id = self.claim_idempotency_key(key, content_hash)
+        if existing_id is not None:
+            return existing_id, False
+        return self.create_pereval(pereval_data, idempotency_key=key, stored_images=stored_images), True
 
-            return db_pereval.id
+    def claim_idempotency_key(self, key: str, content_hash: str) -> Optional[int]:
+        """
+        Занимает ключ идемпотентности в текущей транзакции (без коммита).
 
+        Возвращает None, если ключ занят этим запросом - дальше нужно создать
+        перевал (create_pereval с idempotency_key), иначе id перевала, созданного
+        по ключу ранее (транзакция при этом откатывается).
+
+        Один INSERT ... ON CONFLICT: новый ключ вставляется, устаревший
+        (старше IDEMPOTENCY_TTL_SECONDS) перезаписывается, действующий
+        не меняется, и RETURNING ничего не возвращает. Параллельный повтор
+        ждет коммита первой транзакции на первичном ключе и получает ее результат.
+        IdempotencyKeyReusedError - ключ использован для другого содержимого.
+        """
+        now = datetime.utcnow()
+        statement = self._dialect_insert(IdempotencyKey).values(key=key, request_hash=content_hash, created_at=now)
+        statement = statement.on_conflict_do_update(
+            index_elements=[IdempotencyKey.key],
+            set_={
+                "request_hash": statement.excluded.request_hash,
+                "pereval_id": None,
+                "created_at": statement.excluded.created_at
+            },
+            where=IdempotencyKey.created_at < now - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+        ).returning(IdempotencyKey.key)
+        try:
+            if self.db.execute(statement).first() is not None:
+                return None
+            row = self.db.execute(
+                select(IdempotencyKey.request_hash, IdempotencyKey.pereval_id).where(IdempotencyKey.key == key)
+            ).one()
+            self.db.rollback()
         except Exception as e:
             self.db.rollback()
             raise e
-    
+        if row.request_hash != content_hash:
+            raise IdempotencyKeyReusedError(f"Ключ идемпотентности {key} уже использован с другими данными")
+        return row.pereval_id
+
+    def purge_idempotency_keys(self) -> int:
+        """
+        Удаляет ключи идемпотентности старше IDEMPOTENCY_TTL_SECONDS. Возвращает их число.
+        Создание перевала устаревшие ключи не удаляет, а перезаписывает.
+        """
+        try:
+            deleted = self.db.execute(delete(IdempotencyKey).where(
+                IdempotencyKey.created_at < datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+            )).rowcount
+            self.db.commit()
+            return deleted
+        except Exception as e:
+            self.db.rollback()
+            raise e
+
+    def create_perevals_batch(
+        self,
+        perevals_data: List[PerevalCreate],
+        stored_images: Optional[List[List[dict]]] = None
+    ) -> List[int]:
+        """
+        Пакетное создание перевалов.
+
+        Каждая таблица заполняется одним set-based INSERT (для psycopg2
+        SQLAlchemy собирает executemany в multi-row VALUES), пользователи -
+        одним upsert по всем различным email. Возвращает id перевалов
+        в порядке входного списка. Пакет записывается в одной транзакции.
+        stored_images - уже сохраненные изображения каждого перевала (см. create_pereval).
+        """
+        if not perevals_data:
+            return []
+
+        try:
+            user_ids = self._upsert_users([item.user for item in perevals_data])
+
+            coords_ids = self.db.scalars(
+                insert(Coords).returning(Coords.id, sort_by_parameter_order=True),
+                [item.coords.model_dump() for item in perevals_data]
+            ).all()
+
+            level_ids = self.db.scalars(
+                insert(Level).returning(Level.id, sort_by_parameter_order=True),
+                [item.level.model_dump() for item in perevals_data]
+            ).all()
+
+            pereval_ids = self.db.scalars(
+                insert(Pereval)
+                .values(change_seq=self._change_seq())
+                .returning(Pereval.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "beauty_title": item.beauty_title,
+                        "title": item.title,
+                        "other_titles": item.other_titles,
+                        "connect": item.connect,
+                        "add_time": item.add_time,
+                        "user_id": user_ids[item.user.email],
+                        "coords_id": coords_id,
+                        "level_id": level_id,
+                        "status": PerevalStatus.NEW
+                    }
+                    for item, coords_id, level_id in zip(perevals_data, coords_ids, level_ids)
+                ]
+            ).all()
+
+            if stored_images is None:
+                stored_images = [
+                    [self._store_image(image_data.content, image_data.title) for image_data in item.images]
+                    for item in perevals_data
+                ]
+            image_rows = [
+                {**image_row, "pereval_id": pereval_id}
+                for item_images, pereval_id in zip(stored_images, pereval_ids)
+                for image_row in item_images
+            ]
+            if image_rows:
+                self.db.execute(insert(Image), image_rows)
+
+            for item, pereval_id in zip(perevals_data, pereval_ids):
+                record_change(self.db, PerevalChange(pereval_id, (item.coords.latitude, item.coords.longitude)))
+            self.db.commit()
+            return list(pereval_ids)
+
+        except Exception as e:
+            self.db.rollback()
+            raise e
+
     def get_pereval_by_id(self, pereval_id: int) -> Optional[Pereval]:
         """Получение перевала по ID."""
         return self.db.query(Pereval).filter(Pereval.id == pereval_id).first()
-    
-    def update_pereval(self, pereval_id: int, data: dict) -> bool:
-        """Обновление перевала (только если статус = new)."""
+
+    def add_images(self, pereval_id: int, images_data: List[dict]) -> Optional[List[Image]]:
+        """
+        Добавление к перевалу изображений, уже сохраненных в хранилище блобов.
+        Каждый элемент содержит blob_key, size, mime_type и title.
+
+        Статус проверяется тем же UPDATE, который увеличивает версию перевала:
+        если перевал не найден или уже не в статусе new (его могли взять на
+        модерацию после проверки в обработчике), изображения не добавляются
+        и возвращается None.
+        """
+        try:
+            touched = self.db.execute(
+                update(Pereval)
+                .where(Pereval.id == pereval_id, Pereval.status == PerevalStatus.NEW)
+                .values(**self._touch_values())
+            ).rowcount
+            if not touched:
+                self.db.rollback()
+                return None
+            db_images = self.db.scalars(
+                insert(Image).returning(Image, sort_by_parameter_order=True),
+                [{**image_data, "pereval_id": pereval_id} for image_data in images_data]
+            ).all()
+            record_change(self.db, PerevalChange(pereval_id))
+            self.db.commit()
+            return list(db_images)
+        except Exception as e:
+            self.db.rollback()
+            raise e
+
+    def _change_seq(self):
+        """Выражение номера изменения перевала для текущего диалекта (см. repository.sync)."""
+        return change_seq_value(self.db.get_bind().dialect.name)
+
+    def _touch_values(self, now: Optional[datetime] = None) -> dict:
+        """Значения для UPDATE: следующая версия перевала, время и номер изменения."""
+        return {
+            "version": Pereval.version + 1,
+            "updated_at": now or datetime.utcnow(),
+            "change_seq": self._change_seq()
+        }
+
+    def get_pereval_version(self, pereval_id: int) -> Optional[Tuple[int, datetime]]:
+        """Версия и время изменения перевала без загрузки связанных сущностей."""
+        row = self.db.execute(
+            select(Pereval.version, Pereval.updated_at).where(Pereval.id == pereval_id)
+        ).first()
+        return tuple(row) if row else None
+
+    def get_image(self, image_id: int) -> Optional[Image]:
+        """Получение метаданных изображения по ID."""
+        return self.db.query(Image).filter(Image.id == image_id).first()
+
+    @staticmethod
+    def _detail_options(include_image_data: bool = False) -> list:
+        """
+        Стратегия загрузки связанных сущностей для детального ответа.
+
+        Пользователь, координаты и уровень подтягиваются JOIN-ом в основной
+        запрос, изображения - одним дополнительным SELECT ... IN на всю
+        выборку, поэтому число запросов не зависит от количества перевалов.
+        У изображений читаются только колонки метаданных; ключ блоба
+        нужен лишь тогда, когда в ответ включаются сами данные.
+        """
+        image_columns = [Image.id, Image.pereval_id, Image.title, Image.size, Image.mime_type]
+        if include_image_data:
+            image_columns.append(Image.blob_key)
+        return [
+            joinedload(Pereval.user),
+            joinedload(Pereval.coords),
+            joinedload(Pereval.level),
+            selectinload(Pereval.images).load_only(*image_columns),
+        ]
+
+    def get_pereval_detail(self, pereval_id: int, include_image_data: bool = False) -> Optional[Pereval]:
+        """Получение перевала по ID вместе со всеми связанными сущностями."""
+        return (
+            self.db.query(Pereval)
+            .options(*self._detail_options(include_image_data))
+            .filter(Pereval.id == pereval_id)
+            .first()
+        )
+
+    def update_pereval(self, pereval_id: int, data: dict, expected_version: Optional[int] = None) -> bool:
+        """
+        Обновление перевала (только если статус = new).
+
+        Если передан expected_version, перевал обновляется только при совпадении
+        версии (оптимистическая блокировка), иначе - VersionConflictError.
+        Статус и версия проверяются, а версия увеличивается одним UPDATE в начале
+        транзакции, так что параллельное обновление или модерация ждут коммита,
+        а перевал, который успели взять на модерацию, не редактируется.
+        """
         try:
             pereval = self.get_pereval_by_id(pereval_id)
             if not pereval:
@@ -152,6 +509,19 @@ class PerevalRepository:
             if pereval.status != PerevalStatus.NEW:
                 return False
             
+            touch = update(Pereval).where(Pereval.id == pereval_id, Pereval.status == PerevalStatus.NEW)
+            if expected_version is not None:
+                touch = touch.where(Pereval.version == expected_version)
+            if not self.db.execute(touch.values(**self._touch_values())).rowcount:
+                self.db.rollback()
+                current = self.db.execute(
+                    select(Pereval.status, Pereval.version).where(Pereval.id == pereval_id)
+                ).first()
+                # Статус сменился после проверки выше - редактирование уже запрещено
+                if current is None or current.status != PerevalStatus.NEW:
+                    return False
+                raise VersionConflictError(current.version)
+
             # Обновляем разрешенные поля
             allowed_fields = [
                 'beauty_title', 'title', 'other_titles', 'connect', 'add_time'
@@ -161,10 +531,12 @@ class PerevalRepository:
                 if field in data:
                     setattr(pereval, field, data[field])
             
+            coords = self.db.query(Coords).filter(Coords.id == pereval.coords_id).first()
+            old_coords = (coords.latitude, coords.longitude) if coords else None
+
             # Обновляем связанные сущности если они переданы
             if 'coords' in data:
                 coords_data = data['coords']
-                coords = self.db.query(Coords).filter(Coords.id == pereval.coords_id).first()
                 if coords and isinstance(coords_data, dict):
                     coords.latitude = coords_data.get('latitude', coords.latitude)
                     coords.longitude = coords_data.get('longitude', coords.longitude)
@@ -182,29 +554,84 @@ class PerevalRepository:
             if 'images' in data:
                 images_data = data['images']
                 if isinstance(images_data, list):
-                    # Удаляем старые изображения
-                    self.db.query(Image).filter(Image.pereval_id == pereval_id).delete()
-                    
-                    # Добавляем новые
-                    for image_data in images_data:
-                        if isinstance(image_data, dict) and 'data' in image_data and 'title' in image_data:
-                            new_image = Image(
-                                data=image_data['data'],
-                                title=image_data['title'],
-                                pereval_id=pereval_id
-                            )
-                            self.db.add(new_image)
+                    self._sync_images(pereval_id, images_data)
             
+            record_change(self.db, PerevalChange(
+                pereval_id,
+                (coords.latitude, coords.longitude) if coords else None,
+                old_coords
+            ))
             self.db.commit()
             return True
             
         except Exception as e:
             self.db.rollback()
             raise e
+
+    def _sync_images(self, pereval_id: int, images_data: List[dict]) -> None:
+        """
+        Приводит изображения перевала к переданному списку.
+
+        Изображения сопоставляются по ключу блоба (хэшу содержимого):
+        совпавшие остаются на месте (меняется только название), в хранилище
+        пишутся только новые, удаляются только исчезнувшие из списка.
+        Элемент содержит title и content (байты) или data (base64), либо
+        уже сохраненное изображение: blob_key, size и mime_type.
+        """
+        existing: Dict[str, List[Image]] = {}
+        for image in self.db.scalars(select(Image).where(Image.pereval_id == pereval_id).order_by(Image.id)):
+            existing.setdefault(image.blob_key, []).append(image)
+
+        new_rows = []
+        for image_data in images_data:
+            if not isinstance(image_data, dict) or 'title' not in image_data:
+                continue
+            content = image_data.get('content')
+            if 'blob_key' in image_data:
+                key = image_data['blob_key']
+            elif content is not None:
+                key = blob_key(content)
+            elif 'data' in image_data:
+                content = decode_base64_image(image_data['data'])
+                key = blob_key(content)
+            else:
+                continue
+            same = existing.get(key)
+            if same:
+                image = same.pop(0)
+                image.title = image_data['title']
+            elif content is None:
+                new_rows.append({**image_data, "pereval_id": pereval_id})
+            else:
+                new_rows.append({**self._store_image(content, image_data['title']), "pereval_id": pereval_id})
+
+        removed_ids = [image.id for images in existing.values() for image in images]
+        if removed_ids:
+            self.db.execute(
+                delete(Image).where(Image.id.in_(removed_ids)).execution_options(synchronize_session=False)
+            )
+        if new_rows:
+            self.db.execute(insert(Image), new_rows)
     
+    def _user_perevals_query(self, email: str, include_image_data: bool = False):
+        """Запрос перевалов пользователя в порядке (add_time, id)."""
+        return (
+            self.db.query(Pereval)
+            .join(Pereval.user)
+            .filter(User.email == email)
+            .options(*self._detail_options(include_image_data))
+            .order_by(Pereval.add_time, Pereval.id)
+        )
+
     def list_perevals_by_user_email(self, email: str, offset: int = 0, limit: Optional[int] = None) -> List[Pereval]:
-        """Получение списка перевалов по email пользователя."""
-        query = self.db.query(Pereval).join(User).filter(User.email == email)
+        """
+        Получение списка перевалов по email пользователя.
+
+        Связанные сущности загружаются заранее (см. _detail_options),
+        так что обращение к pereval.user/coords/level/images не делает
+        дополнительных запросов.
+        """
+        query = self._user_perevals_query(email)
         
         if limit:
             query = query.offset(offset).limit(limit)
@@ -212,3 +639,590 @@ class PerevalRepository:
             query = query.offset(offset)
         
         return query.all()
+
+    def page_perevals_by_user_email(
+        self,
+        email: str,
+        limit: int,
+        after: Optional[str] = None,
+        offset: int = 0,
+        include_image_data: bool = False
+    ) -> Tuple[List[Pereval], Optional[str]]:
+        """
+        Страница перевалов пользователя с курсорной пагинацией.
+
+        Позиция задается курсором after (см. repository.pagination), поэтому
+        стоимость страницы не зависит от ее глубины: поиск идет по индексу
+        pereval(user_id, add_time, id). Возвращает записи и курсор следующей
+        страницы (None, если страница последняя).
+        Может выбросить InvalidCursorError.
+        """
+        query = self._user_perevals_query(email, include_image_data)
+        if after:
+            add_time, pereval_id = decode_cursor(after)
+            query = query.filter(tuple_(Pereval.add_time, Pereval.id) > tuple_(add_time, pereval_id))
+
+        # Берем одну лишнюю запись, чтобы понять, есть ли следующая страница
+        return self._split_page(query.offset(offset).limit(limit + 1).all(), limit)
+
+    def page_pereval_versions_by_user_email(
+        self,
+        email: str,
+        limit: int,
+        after: Optional[str] = None,
+        offset: int = 0
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Та же страница, что у page_perevals_by_user_email, но только id, version
+        и updated_at перевалов - для ответа 304 без загрузки связанных сущностей.
+        """
+        query = (
+            select(Pereval.id, Pereval.add_time, Pereval.version, Pereval.updated_at)
+            .join(User, Pereval.user_id == User.id)
+            .where(User.email == email)
+            .order_by(Pereval.add_time, Pereval.id)
+        )
+        if after:
+            add_time, pereval_id = decode_cursor(after)
+            query = query.where(tuple_(Pereval.add_time, Pereval.id) > tuple_(add_time, pereval_id))
+        rows, next_cursor = self._split_page(self.db.execute(query.offset(offset).limit(limit + 1)).all(), limit)
+        return [row._asdict() for row in rows], next_cursor
+
+    @staticmethod
+    def _split_page(items: list, limit: int) -> Tuple[list, Optional[str]]:
+        """Отрезает лишнюю запись страницы и строит по последней записи курсор следующей."""
+        if len(items) <= limit:
+            return items, None
+        items = items[:limit]
+        last = items[-1]
+        return items, encode_cursor(last.add_time, last.id)
+
+    @staticmethod
+    def _list_items_query():
+        """Запрос колонок краткой схемы перевала для списков."""
+        return (
+            select(
+                Pereval.id,
+                Pereval.beauty_title,
+                Pereval.title,
+                Pereval.status,
+                Pereval.add_time,
+                Pereval.version,
+                Pereval.updated_at,
+                User.email.label("user_email"),
+                Level.winter,
+                Level.summer,
+                Level.autumn,
+                Level.spring
+            )
+            .join(User, Pereval.user_id == User.id)
+            .join(Level, Pereval.level_id == Level.id)
+        )
+
+    def page_perevals(
+        self,
+        filters: PerevalFilters,
+        limit: int,
+        after: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Страница перевалов по фильтрам в порядке (add_time, id).
+
+        Читаются только колонки краткой схемы списка. Фильтр по статусу идет по
+        индексу pereval(status, add_time, id), по отправителю - по индексу
+        pereval(user_id, add_time, id), поэтому стоимость страницы не зависит
+        ни от размера таблицы, ни от глубины страницы. Уровень сложности
+        min_level сравнивается по рангу категории (services.difficulty) для
+        сезона season или, если сезон не указан, для любого сезона.
+        Может выбросить InvalidCursorError.
+        """
+        rows, next_cursor = self._split_page(
+            self.db.execute(self._filter_page(self._list_items_query(), filters, limit, after)).all(), limit
+        )
+        return [row._asdict() for row in rows], next_cursor
+
+    def page_pereval_versions(
+        self,
+        filters: PerevalFilters,
+        limit: int,
+        after: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Та же страница, что у page_perevals, но только id, version и updated_at
+        перевалов - для ответа 304. Пользователи и уровни присоединяются,
+        только если по ним есть фильтр.
+        """
+        query = select(Pereval.id, Pereval.add_time, Pereval.version, Pereval.updated_at)
+        if filters.user_email is not None:
+            query = query.join(User, Pereval.user_id == User.id)
+        if filters.min_level is not None:
+            query = query.join(Level, Pereval.level_id == Level.id)
+        rows, next_cursor = self._split_page(
+            self.db.execute(self._filter_page(query, filters, limit, after)).all(), limit
+        )
+        return [row._asdict() for row in rows], next_cursor
+
+    @staticmethod
+    def _filter_page(query, filters: PerevalFilters, limit: int, after: Optional[str]):
+        """Фильтры, порядок (add_time, id) и курсор страницы списка перевалов."""
+        query = query.order_by(Pereval.add_time, Pereval.id).limit(limit + 1)
+        if filters.status is not None:
+            query = query.where(Pereval.status == filters.status)
+        if filters.user_email is not None:
+            query = query.where(User.email == filters.user_email)
+        if filters.added_from is not None:
+            query = query.where(Pereval.add_time >= filters.added_from)
+        if filters.added_to is not None:
+            query = query.where(Pereval.add_time < filters.added_to)
+        if filters.min_level is not None:
+            min_rank = difficulty_rank(filters.min_level)
+            spellings = [spelling for spelling, rank in DIFFICULTY_RANKS.items() if rank >= min_rank]
+            seasons = [filters.season] if filters.season else ["winter", "summer", "autumn", "spring"]
+            query = query.where(or_(*[func.trim(getattr(Level, season)).in_(spellings) for season in seasons]))
+        if after:
+            add_time, pereval_id = decode_cursor(after)
+            query = query.where(tuple_(Pereval.add_time, Pereval.id) > tuple_(add_time, pereval_id))
+        return query
+
+    def sync_perevals(
+        self,
+        email: str,
+        limit: int,
+        since: Optional[str] = None
+    ) -> Tuple[List[dict], str, bool]:
+        """
+        Перевалы пользователя, созданные или измененные после курсора since,
+        в порядке номера изменения (change_seq, id), без изображений.
+
+        Поиск идет по индексу pereval(user_id, change_seq, id), поэтому стоимость
+        зависит только от числа изменений, а не от всей истории пользователя.
+        Возвращает записи, курсор для следующего запроса и признак того,
+        что изменения получены не все. Может выбросить InvalidCursorError.
+        """
+        query = (
+            select(
+                Pereval.id,
+                Pereval.beauty_title,
+                Pereval.title,
+                Pereval.other_titles,
+                Pereval.connect,
+                Pereval.add_time,
+                Pereval.status,
+                Pereval.version,
+                Pereval.updated_at,
+                Pereval.change_seq,
+                Coords.latitude,
+                Coords.longitude,
+                Coords.height,
+                Level.winter,
+                Level.summer,
+                Level.autumn,
+                Level.spring
+            )
+            .join(User, Pereval.user_id == User.id)
+            .join(Coords, Pereval.coords_id == Coords.id)
+            .join(Level, Pereval.level_id == Level.id)
+            .where(User.email == email)
+            .order_by(Pereval.change_seq, Pereval.id)
+            .limit(limit + 1)
+        )
+        position = decode_sync_cursor(since) if since else (0, 0)
+        query = query.where(tuple_(Pereval.change_seq, Pereval.id) > tuple_(*position))
+        stable_limit = stable_change_seq_limit(self.db.get_bind().dialect.name)
+        if stable_limit is not None:
+            # Изменения незавершенных транзакций могут закоммититься позже с меньшим номером
+            query = query.where(Pereval.change_seq < stable_limit)
+
+        rows = self.db.execute(query).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if rows:
+            position = (rows[-1].change_seq, rows[-1].id)
+        return [row._asdict() for row in rows], encode_sync_cursor(*position), has_more
+
+    @staticmethod
+    def _map_items_query():
+        """Запрос колонок, нужных для маркера перевала на карте."""
+        return select(
+            Pereval.id,
+            Pereval.beauty_title,
+            Pereval.title,
+            Pereval.status,
+            Coords.latitude,
+            Coords.longitude,
+            Coords.height
+        ).join(Coords, Pereval.coords_id == Coords.id)
+
+    def list_perevals_in_bbox(
+        self,
+        min_lat: float,
+        min_lon: float,
+        max_lat: float,
+        max_lon: float,
+        limit: int
+    ) -> List[dict]:
+        """
+        Перевалы внутри прямоугольной области карты.
+
+        Читаются только колонки, нужные для маркера на карте; поиск идет по
+        индексу coords(latitude, longitude). Если min_lon > max_lon, область
+        пересекает 180-й меридиан.
+        """
+        if min_lon <= max_lon:
+            longitude_filter = Coords.longitude.between(min_lon, max_lon)
+        else:
+            longitude_filter = or_(Coords.longitude >= min_lon, Coords.longitude <= max_lon)
+
+        query = (
+            self._map_items_query()
+            .where(Coords.latitude.between(min_lat, max_lat), longitude_filter)
+            .order_by(Pereval.id)
+            .limit(limit)
+        )
+        return [row._asdict() for row in self.db.execute(query)]
+
+    def list_pereval_clusters(
+        self,
+        min_lat: float,
+        min_lon: float,
+        max_lat: float,
+        max_lon: float,
+        grid_size: int
+    ) -> List[dict]:
+        """
+        Кластеры перевалов внутри области: область делится на сетку
+        grid_size x grid_size, и для каждой непустой ячейки считаются число
+        перевалов, центр масс и наибольший ранг категории трудности по сезонам.
+        Границы области: min включительно, max - нет.
+        """
+        cell_row = func.floor((max_lat - Coords.latitude) / ((max_lat - min_lat) / grid_size))
+        cell_col = func.floor((Coords.longitude - min_lon) / ((max_lon - min_lon) / grid_size))
+        ranks = [
+            case(DIFFICULTY_RANKS, value=func.trim(column), else_=0)
+            for column in (Level.winter, Level.summer, Level.autumn, Level.spring)
+        ]
+        cells = (
+            select(
+                cell_row.label("cell_row"),
+                cell_col.label("cell_col"),
+                Coords.latitude,
+                Coords.longitude,
+                *[rank.label(f"rank_{i}") for i, rank in enumerate(ranks)]
+            )
+            .select_from(Pereval)
+            .join(Coords, Pereval.coords_id == Coords.id)
+            .outerjoin(Level, Pereval.level_id == Level.id)
+            .where(
+                Coords.latitude >= min_lat,
+                Coords.latitude < max_lat,
+                Coords.longitude >= min_lon,
+                Coords.longitude < max_lon
+            )
+            .subquery()
+        )
+        query = (
+            select(
+                func.count().label("count"),
+                func.avg(cells.c.latitude).label("latitude"),
+                func.avg(cells.c.longitude).label("longitude"),
+                *[func.max(cells.c[f"rank_{i}"]).label(f"rank_{i}") for i in range(len(ranks))]
+            )
+            .group_by(cells.c.cell_row, cells.c.cell_col)
+            .order_by(cells.c.cell_row, cells.c.cell_col)
+        )
+        return [
+            {
+                "count": row["count"],
+                "latitude": row["latitude"],
+                "longitude": row["longitude"],
+                "max_difficulty_rank": max(row[f"rank_{i}"] or 0 for i in range(len(ranks)))
+            }
+            for row in self.db.execute(query).mappings()
+        ]
+
+    def list_pereval_coords(self, after_seq: Optional[int] = None) -> Tuple[List[tuple], int]:
+        """
+        Координаты перевалов (id, latitude, longitude) для пространственного индекса:
+        все или, если передан after_seq, созданные и измененные после этого номера
+        изменения (см. repository.sync). Возвращает записи и номер изменения,
+        с которого продолжать следующую загрузку.
+        """
+        query = (
+            select(Pereval.id, Coords.latitude, Coords.longitude, Pereval.change_seq)
+            .join(Coords, Pereval.coords_id == Coords.id)
+            .order_by(Pereval.change_seq, Pereval.id)
+        )
+        if after_seq is not None:
+            query = query.where(Pereval.change_seq > after_seq)
+        stable_limit = stable_change_seq_limit(self.db.get_bind().dialect.name)
+        if stable_limit is not None:
+            # Изменения незавершенных транзакций могут закоммититься позже с меньшим номером
+            query = query.where(Pereval.change_seq < stable_limit)
+
+        rows = self.db.execute(query).all()
+        change_seq = rows[-1].change_seq if rows else (after_seq or 0)
+        return [(row.id, row.latitude, row.longitude) for row in rows], change_seq
+
+    def get_perevals_map_items(self, pereval_ids: List[int]) -> List[dict]:
+        """Компактные данные перевалов для карты в порядке переданных id."""
+        query = (
+            self._map_items_query()
+            .where(Pereval.id.in_(pereval_ids))
+        )
+        rows = {row.id: row._asdict() for row in self.db.execute(query)}
+        return [rows[pereval_id] for pereval_id in pereval_ids if pereval_id in rows]
+
+    def list_pereval_titles(self, after_id: int = 0, pereval_ids: Optional[List[int]] = None) -> List[tuple]:
+        """
+        Названия перевалов (id, beauty_title, title, other_titles) с id > after_id
+        или, если передан pereval_ids, только указанных перевалов.
+        """
+        query = select(Pereval.id, Pereval.beauty_title, Pereval.title, Pereval.other_titles).order_by(Pereval.id)
+        if pereval_ids is not None:
+            query = query.where(Pereval.id.in_(pereval_ids))
+        else:
+            query = query.where(Pereval.id > after_id)
+        return [tuple(row) for row in self.db.execute(query)]
+
+    def search_perevals(self, text_query: str, limit: int) -> List[dict]:
+        """
+        Поиск перевалов по названиям с учетом опечаток и недописанных слов.
+
+        В PostgreSQL используются индексы ix_pereval_search_tsv (префиксы слов)
+        и ix_pereval_search_trgm (похожесть по триграммам). В остальных базах
+        поиск идет по n-граммному индексу в памяти процесса.
+        """
+        words = title_search.title_words(text_query)
+        if not words:
+            return []
+        if self.db.get_bind().dialect.name != "postgresql":
+            return self.get_perevals_map_items(self._search_title_index(text_query, limit))
+
+        prefix_query = func.to_tsquery(text("'simple'::regconfig"), " & ".join(f"{word}:*" for word in words))
+        query_text = " ".join(words)
+        query = (
+            self._map_items_query()
+            .where(or_(
+                pereval_search_vector.op("@@")(prefix_query),
+                literal(query_text).op("<%")(pereval_search_document)
+            ))
+            .order_by(func.word_similarity(query_text, pereval_search_document).desc(), Pereval.id)
+            .limit(limit)
+        )
+        return [row._asdict() for row in self.db.execute(query)]
+
+    def _search_title_index(self, text_query: str, limit: int) -> List[int]:
+        """Поиск по индексу названий в памяти с догрузкой новых и измененных перевалов."""
+        index = title_search.title_search_index
+        if not index.loaded:
+            index.upsert_many(self.list_pereval_titles())
+            index.loaded = True
+        else:
+            index.upsert_many(self.list_pereval_titles(after_id=index.max_id))
+            dirty_ids = index.dirty_ids()
+            if dirty_ids:
+                index.upsert_many(self.list_pereval_titles(pereval_ids=dirty_ids))
+        return [pereval_id for pereval_id, _ in index.search(text_query, limit)]
+
+    def claim_perevals(
+        self,
+        moderator: str,
+        limit: int,
+        claim_timeout: int = CLAIM_TIMEOUT_SECONDS
+    ) -> List[dict]:
+        """
+        Захват модератором следующей пачки перевалов из очереди модерации.
+
+        Берутся самые старые перевалы со статусом new, а также pending
+        с истекшим захватом. Строки блокируются через FOR UPDATE SKIP LOCKED:
+        параллельные модераторы пропускают чужие заблокированные строки,
+        не дожидаясь их, и никогда не получают один и тот же перевал.
+        Захваченные перевалы переводятся в pending, каждое действие
+        записывается в журнал модерации. Возвращает краткие данные перевалов.
+        """
+        now = datetime.utcnow()
+        try:
+            candidates = self.db.execute(
+                select(Pereval.id, Pereval.status, Pereval.claimed_by)
+                .where(or_(
+                    Pereval.status == PerevalStatus.NEW,
+                    and_(
+                        Pereval.status == PerevalStatus.PENDING,
+                        Pereval.claimed_at < now - timedelta(seconds=claim_timeout)
+                    )
+                ))
+                .order_by(Pereval.add_time, Pereval.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not candidates:
+                self.db.rollback()
+                return []
+
+            pereval_ids = [candidate.id for candidate in candidates]
+            self.db.execute(
+                update(Pereval)
+                .where(Pereval.id.in_(pereval_ids))
+                .values(
+                    status=PerevalStatus.PENDING,
+                    claimed_by=moderator,
+                    claimed_at=now,
+                    **self._touch_values(now)
+                )
+            )
+            self.db.execute(insert(ModerationAudit), [
+                {
+                    "pereval_id": candidate.id,
+                    "moderator": moderator,
+                    "action": "claim",
+                    "from_status": candidate.status,
+                    "to_status": PerevalStatus.PENDING,
+                    "comment": f"Истек захват модератора {candidate.claimed_by}" if candidate.claimed_by else None,
+                    "created_at": now
+                }
+                for candidate in candidates
+            ])
+            rows = self.db.execute(
+                self._list_items_query()
+                .where(Pereval.id.in_(pereval_ids))
+                .order_by(Pereval.add_time, Pereval.id)
+            ).all()
+            for pereval_id in pereval_ids:
+                record_change(self.db, PerevalChange(pereval_id))
+            self.db.commit()
+            return [row._asdict() for row in rows]
+        except Exception as e:
+            self.db.rollback()
+            raise e
+
+    def _finish_claim(
+        self,
+        pereval_id: int,
+        moderator: str,
+        action: str,
+        to_status: PerevalStatus,
+        comment: Optional[str],
+        claim_timeout: int
+    ) -> Optional[ModerationAudit]:
+        """Завершает захват перевала модератором: меняет статус и пишет журнал."""
+        now = datetime.utcnow()
+        try:
+            pereval = self.db.execute(
+                select(Pereval).where(Pereval.id == pereval_id).with_for_update()
+            ).scalar_one_or_none()
+            if pereval is None:
+                self.db.rollback()
+                return None
+            if (
+                pereval.status != PerevalStatus.PENDING
+                or pereval.claimed_by != moderator
+                or pereval.claimed_at < now - timedelta(seconds=claim_timeout)
+            ):
+                raise ModerationConflictError(f"Перевал {pereval_id} не захвачен модератором {moderator}")
+
+            audit = ModerationAudit(
+                pereval_id=pereval_id,
+                moderator=moderator,
+                action=action,
+                from_status=pereval.status,
+                to_status=to_status,
+                comment=comment,
+                created_at=now
+            )
+            pereval.status = to_status
+            pereval.claimed_by = None
+            pereval.claimed_at = None
+            pereval.version += 1
+            pereval.updated_at = now
+            pereval.change_seq = self._change_seq()
+            self.db.add(audit)
+            record_change(self.db, PerevalChange(pereval_id))
+            self.db.commit()
+            return audit
+        except Exception as e:
+            self.db.rollback()
+            raise e
+
+    def decide_pereval(
+        self,
+        pereval_id: int,
+        moderator: str,
+        status: PerevalStatus,
+        comment: Optional[str] = None,
+        claim_timeout: int = CLAIM_TIMEOUT_SECONDS
+    ) -> Optional[ModerationAudit]:
+        """
+        Решение модератора по захваченному им перевалу (accepted / rejected).
+        Возвращает запись журнала или None, если перевал не найден.
+        Может выбросить ModerationConflictError.
+        """
+        return self._finish_claim(pereval_id, moderator, DECISION_ACTIONS[status], status, comment, claim_timeout)
+
+    def release_pereval(
+        self,
+        pereval_id: int,
+        moderator: str,
+        comment: Optional[str] = None,
+        claim_timeout: int = CLAIM_TIMEOUT_SECONDS
+    ) -> Optional[ModerationAudit]:
+        """
+        Возврат захваченного перевала в очередь (статус new).
+        Возвращает запись журнала или None, если перевал не найден.
+        Может выбросить ModerationConflictError.
+        """
+        return self._finish_claim(pereval_id, moderator, "release", PerevalStatus.NEW, comment, claim_timeout)
+
+    def release_expired_claims(self, claim_timeout: int = CLAIM_TIMEOUT_SECONDS, limit: int = 1000) -> int:
+        """
+        Возвращает в очередь перевалы с истекшим захватом (не больше limit за вызов).
+        Заблокированные строки пропускаются (SKIP LOCKED). Возвращает число перевалов.
+        """
+        now = datetime.utcnow()
+        try:
+            expired = self.db.execute(
+                select(Pereval.id, Pereval.claimed_by)
+                .where(
+                    Pereval.status == PerevalStatus.PENDING,
+                    Pereval.claimed_at < now - timedelta(seconds=claim_timeout)
+                )
+                .order_by(Pereval.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not expired:
+                self.db.rollback()
+                return 0
+
+            pereval_ids = [row.id for row in expired]
+            self.db.execute(
+                update(Pereval)
+                .where(Pereval.id.in_(pereval_ids))
+                .values(status=PerevalStatus.NEW, claimed_by=None, claimed_at=None, **self._touch_values(now))
+            )
+            self.db.execute(insert(ModerationAudit), [
+                {
+                    "pereval_id": row.id,
+                    "moderator": row.claimed_by,
+                    "action": "expire",
+                    "from_status": PerevalStatus.PENDING,
+                    "to_status": PerevalStatus.NEW,
+                    "comment": None,
+                    "created_at": now
+                }
+                for row in expired
+            ])
+            for pereval_id in pereval_ids:
+                record_change(self.db, PerevalChange(pereval_id))
+            self.db.commit()
+            return len(pereval_ids)
+        except Exception as e:
+            self.db.rollback()
+            raise e
+
+    def get_moderation_audit(self, pereval_id: int) -> List[ModerationAudit]:
+        """Журнал модерации перевала в хронологическом порядке."""
+        return list(self.db.scalars(
+            select(ModerationAudit)
+            .where(ModerationAudit.pereval_id == pereval_id)
+            .order_by(ModerationAudit.id)
+        ))
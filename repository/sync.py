@@ -0,0 +1,41 @@
+"""
+Номер изменения перевала (pereval.change_seq) для синхронизации клиентов.
+
+Номер записывается тем же выражением INSERT/UPDATE, что и само изменение,
+без отдельного запроса и без общей блокировки.
+
+PostgreSQL: номер - идентификатор транзакции записи (pg_current_xact_id,
+64 бита, монотонно растет). Номера выдаются в начале транзакций, а видны
+становятся при коммите, то есть не по порядку. Поэтому синхронизация
+отдает только перевалы с номером меньше xmin снимка запроса: транзакции
+с меньшими номерами уже завершены, и позади выданного курсора изменения
+появиться не могут. Изменения, сделанные после начала самой старой
+незавершенной транзакции, приходят при следующей синхронизации, поэтому
+долгие транзакции задерживают синхронизацию.
+
+SQLite (тесты, разработка): записи выполняются по одной, номер -
+наибольший номер + 1.
+"""
+from typing import Optional
+from sqlalchemy import BigInteger, Text, cast, func, select
+from sqlalchemy.sql.elements import ColumnElement
+from models.pereval import Pereval
+
+
+def change_seq_value(dialect_name: str) -> ColumnElement:
+    """Выражение номера изменения для INSERT/UPDATE перевала."""
+    if dialect_name == "postgresql":
+        return cast(cast(func.pg_current_xact_id(), Text), BigInteger)
+    # Псевдоним, чтобы подзапрос не связывался с изменяемой строкой в UPDATE
+    perevals = Pereval.__table__.alias("change_seq_perevals")
+    return select(func.coalesce(func.max(perevals.c.change_seq), 0) + 1).scalar_subquery()
+
+
+def stable_change_seq_limit(dialect_name: str) -> Optional[ColumnElement]:
+    """
+    Граница номеров изменений, ниже которой новых изменений уже не появится
+    (None - любой видимый номер окончательный).
+    """
+    if dialect_name == "postgresql":
+        return cast(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text), BigInteger)
+    return None
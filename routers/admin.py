@@ -0,0 +1,78 @@
+"""
+Роутер служебных endpoint'ов для наблюдения за работой сервиса.
+
+Endpoint'ы раскрывают SQL запросов и внутреннее состояние воркера, поэтому
+доступны только с токеном FSTR_ADMIN_TOKEN в заголовке X-Admin-Token;
+без настроенного токена они отключены.
+"""
+import hmac
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.connection import async_engine, engine, get_async_db
+from database.pool_stats import pool_stats
+from repository.async_pereval_repository import AsyncPerevalRepository
+from services import clusters, request_stats
+from services.response_cache import ResponseCache, get_response_cache
+
+# Токен доступа к служебным endpoint'ам (не задан - endpoint'ы отключены)
+ADMIN_TOKEN = os.getenv("FSTR_ADMIN_TOKEN")
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None, description="Токен FSTR_ADMIN_TOKEN")) -> None:
+    """Пропускает запрос, только если заголовок X-Admin-Token совпадает с FSTR_ADMIN_TOKEN."""
+    if not ADMIN_TOKEN or not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Нужен служебный токен в заголовке X-Admin-Token")
+
+
+router = APIRouter(dependencies=[Depends(require_admin_token)])
+
+
+@router.get("/admin/pool")
+async def get_pool_stats():
+    """
+    GET /admin/pool - состояние пулов соединений с базой данных.
+
+    Показывает размер пула, занятые и свободные соединения, переполнение,
+    число выдач соединений, среднее/максимальное время ожидания и таймауты
+    для синхронного и асинхронного движков текущего воркера.
+    """
+    return {
+        "sync": pool_stats(engine.pool),
+        "async": pool_stats(async_engine.sync_engine.pool),
+    }
+
+
+@router.get("/admin/cache")
+async def get_cache_stats(response_cache: ResponseCache = Depends(get_response_cache)):
+    """
+    GET /admin/cache - попадания и промахи кэшей текущего воркера:
+    кэша ответов GET /submitData/{id} и кэша тайлов кластеров.
+    """
+    tile_cache = clusters.cluster_tile_cache
+    return {
+        "responses": response_cache.stats(),
+        "cluster_tiles": {"hits": tile_cache.hits, "misses": tile_cache.misses, "entries": len(tile_cache)},
+    }
+
+
+@router.get("/admin/slow")
+async def get_slow_requests(limit: int = Query(20, ge=1, le=100, description="Сколько записей вернуть")):
+    """
+    GET /admin/slow - последние медленные запросы и SQL-выражения текущего воркера,
+    самые медленные первыми. Для запроса указаны время в базе, число выражений
+    и строк и самое медленное выражение. Пороги - FSTR_SLOW_REQUEST_MS и FSTR_SLOW_QUERY_MS.
+    """
+    return request_stats.slow_log.snapshot(limit)
+
+
+@router.post("/admin/idempotency/purge")
+async def purge_idempotency_keys(db: AsyncSession = Depends(get_async_db)):
+    """
+    POST /admin/idempotency/purge - удаление ключей идемпотентности старше
+    FSTR_IDEMPOTENCY_TTL. Устаревшие ключи уже не учитываются при создании
+    перевалов, endpoint только освобождает место (вызывается по расписанию).
+    """
+    deleted = await AsyncPerevalRepository(db).purge_idempotency_keys()
+    return {"deleted": deleted}
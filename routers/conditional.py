@@ -0,0 +1,105 @@
+"""
+Условные HTTP-запросы: ETag, Last-Modified и ответ 304.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Iterable, Optional, Tuple, Union
+from starlette.requests import Request
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Проверяет заголовок If-None-Match (слабое сравнение)."""
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+
+def http_date(value: datetime) -> str:
+    """Дата в формате HTTP (время в базе хранится в UTC без часового пояса)."""
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def pereval_etag(pereval_id: int, version: int, variant: str = "") -> str:
+    """ETag представления перевала: меняется вместе с версией перевала."""
+    return f'"pereval-{pereval_id}-v{version}{variant}"'
+
+
+def list_etag(items: Iterable[Tuple[int, int]], *parts: Optional[str]) -> str:
+    """ETag страницы списка по парам (id, version) и параметрам страницы."""
+    digest = hashlib.sha1()
+    for pereval_id, version in items:
+        digest.update(f"{pereval_id}:{version};".encode())
+    for part in parts:
+        digest.update(f"|{part or ''}".encode())
+    return f'"list-{digest.hexdigest()}"'
+
+
+def if_match_version(header: str, pereval_id: int) -> Optional[int]:
+    """
+    Версия перевала из заголовка If-Match: None для "*",
+    ValueError, если заголовок не содержит ETag этого перевала.
+    Слабые ETag для If-Match не подходят.
+    """
+    header = header.strip()
+    if header == "*":
+        return None
+    prefix = f'"pereval-{pereval_id}-v'
+    if not header.startswith(prefix) or not header.endswith('"'):
+        raise ValueError(header)
+    version = header[len(prefix):-1]
+    if version.endswith("-data"):
+        version = version[:-len("-data")]
+    if not version.isdigit():
+        raise ValueError(header)
+    return int(version)
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    """Заголовки ETag и Last-Modified."""
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def list_validator_headers(items: Iterable[Tuple[int, int, datetime]], *parts: Optional[str]) -> Dict[str, str]:
+    """ETag и Last-Modified страницы списка по (id, version, updated_at) перевалов на ней."""
+    items = list(items)
+    return validator_headers(
+        list_etag([(pereval_id, version) for pereval_id, version, _ in items], *parts),
+        max((updated_at for _, _, updated_at in items), default=None)
+    )
+
+
+def is_not_modified(
+    request: Request,
+    etag: str,
+    last_modified: Optional[Union[datetime, str]] = None
+) -> bool:
+    """
+    Можно ли ответить 304. If-None-Match важнее If-Modified-Since;
+    If-Modified-Since учитывается, только если передан last_modified
+    (datetime или готовое значение заголовка Last-Modified).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+        if isinstance(last_modified, str):
+            last_modified = parsedate_to_datetime(last_modified)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+
+def has_conditions(request: Request) -> bool:
+    """Есть ли в запросе условные заголовки."""
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
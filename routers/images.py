@@ -0,0 +1,240 @@
+"""
+Роутер для выдачи изображений перевалов.
+"""
+import logging
+import os
+from typing import Optional, Tuple
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import JSONResponse, Response
+from starlette.types import Receive, Scope, Send
+from database.connection import get_async_db
+from repository.async_pereval_repository import AsyncPerevalRepository
+from routers.conditional import etag_matches
+from services import metrics
+from storage.blob_store import BlobNotFoundError, BlobStore, get_blob_store
+from storage.thumbnails import (
+    DEFAULT_THUMBNAIL_SIZE, THUMBNAIL_MIME_TYPE, THUMBNAIL_SIZES, ThumbnailsUnavailableError, ensure_thumbnail
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Содержимое по ключу блоба никогда не меняется, поэтому кэшируем надолго
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class RangeNotSatisfiableError(Exception):
+    """Запрошенный диапазон байтов лежит за пределами файла."""
+
+
+def _blob_not_found(key: str) -> HTTPException:
+    """404 для изображения, запись о котором есть в базе, а блоба в хранилище нет."""
+    logger.error(f"Блоб {key} отсутствует в хранилище")
+    return HTTPException(status_code=404, detail="Изображение не найдено")
+
+
+class BlobFileResponse(Response):
+    """
+    Отдача файла блоба (или его части) с локального диска.
+
+    Если ASGI-сервер поддерживает расширение http.response.zerocopysend,
+    файл передается без копирования через sendfile, иначе читается кусками.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, path: str, offset: int, length: int, status_code: int, headers: dict, media_type: str):
+        self.path = path
+        self.offset = offset
+        self.length = length
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        start = {
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        }
+        if scope["method"] == "HEAD" or self.length == 0:
+            await send(start)
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        # Файл открывается до отправки заголовков: если его удалили после
+        # проверки в _serve_blob, клиент еще может получить 404
+        try:
+            blob_file = await anyio.open_file(self.path, mode="rb")
+        except FileNotFoundError:
+            error = _blob_not_found(os.path.basename(self.path))
+            await JSONResponse({"detail": error.detail}, status_code=error.status_code)(scope, receive, send)
+            return
+        async with blob_file:
+            await send(start)
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": blob_file.wrapped,
+                    "offset": self.offset,
+                    "count": self.length,
+                    "more_body": False,
+                })
+                return
+            await blob_file.seek(self.offset)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await blob_file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": remaining > 0,
+                })
+
+
+def _parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Разбирает заголовок Range вида bytes=start-end, bytes=start- или bytes=-suffix.
+
+    Возвращает (start, end) включительно или None, если заголовок отсутствует,
+    синтаксически некорректен (в том числе start > end) или запрашивает
+    несколько диапазонов - тогда отдается файл целиком. Диапазон, который
+    начинается за концом файла, - RangeNotSatisfiableError (ответ 416).
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].strip()
+    if "," in spec:
+        return None
+    start_text, separator, end_text = spec.partition("-")
+    try:
+        if not separator:
+            return None
+        if not start_text:
+            suffix = int(end_text)
+            if suffix <= 0:
+                raise RangeNotSatisfiableError()
+            return max(0, size - suffix), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else None
+    except ValueError:
+        return None
+    if end is not None and start > end:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiableError()
+    return start, size - 1 if end is None else min(end, size - 1)
+
+
+async def _serve_blob(
+    request: Request,
+    blob_store: BlobStore,
+    key: str,
+    media_type: str,
+    size: Optional[int] = None
+) -> Response:
+    """Отдает блоб с поддержкой ETag/If-None-Match и Range."""
+    etag = f'"{key}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    path = blob_store.local_path(key)
+    content = None
+    try:
+        if path is None:
+            content = await run_in_threadpool(blob_store.get, key)
+            size = len(content)
+        elif size is None:
+            size = os.path.getsize(path)
+    except (BlobNotFoundError, FileNotFoundError):
+        raise _blob_not_found(key)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != etag:
+        range_header = None
+    try:
+        byte_range = _parse_range(range_header, size)
+    except RangeNotSatisfiableError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    if request.method != "HEAD":
+        metrics.inc("fstr_image_bytes_served_total", end - start + 1)
+
+    if path is not None:
+        return BlobFileResponse(path, start, end - start + 1, status_code, headers, media_type)
+    body = b"" if request.method == "HEAD" else content[start:end + 1]
+    response = Response(status_code=status_code, headers=headers, media_type=media_type)
+    response.body = body
+    return response
+
+
+@router.api_route("/images/{image_id}", methods=["GET", "HEAD"])
+async def get_image(
+    image_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    blob_store: BlobStore = Depends(get_blob_store)
+):
+    """
+    GET /images/{id} - исходное изображение.
+
+    Отдает байты изображения с Content-Length, ETag и Cache-Control,
+    отвечает 304 на If-None-Match и поддерживает HTTP Range.
+    """
+    image = await AsyncPerevalRepository(db, blob_store).get_image(image_id)
+    if not image:
+        raise HTTPException(status_code=404, detail="Изображение не найдено")
+    return await _serve_blob(request, blob_store, image.blob_key, image.mime_type, image.size)
+
+
+@router.api_route("/images/{image_id}/thumbnail", methods=["GET", "HEAD"])
+async def get_image_thumbnail(
+    image_id: int,
+    request: Request,
+    size: int = Query(DEFAULT_THUMBNAIL_SIZE, description=f"Размер миниатюры: {', '.join(map(str, THUMBNAIL_SIZES))}"),
+    db: AsyncSession = Depends(get_async_db),
+    blob_store: BlobStore = Depends(get_blob_store)
+):
+    """
+    GET /images/{id}/thumbnail - миниатюра изображения (JPEG).
+
+    Миниатюра строится при первом запросе и сохраняется в хранилище блобов.
+    Для формата, который Pillow не читает, отдается исходное изображение;
+    без установленного Pillow - ответ 501.
+    """
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=400, detail="Недопустимый размер миниатюры")
+    image = await AsyncPerevalRepository(db, blob_store).get_image(image_id)
+    if not image:
+        raise HTTPException(status_code=404, detail="Изображение не найдено")
+
+    try:
+        key = await run_in_threadpool(ensure_thumbnail, blob_store, image.blob_key, size)
+    except BlobNotFoundError:
+        raise _blob_not_found(image.blob_key)
+    except ThumbnailsUnavailableError:
+        logger.error("Миниатюры недоступны: Pillow не установлен")
+        raise HTTPException(status_code=501, detail="Миниатюры недоступны на этом сервере")
+    if key is None:
+        return await _serve_blob(request, blob_store, image.blob_key, image.mime_type, image.size)
+    return await _serve_blob(request, blob_store, key, THUMBNAIL_MIME_TYPE)
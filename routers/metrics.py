@@ -0,0 +1,51 @@
+"""
+Роутер метрик в формате Prometheus.
+"""
+from typing import Iterable
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from database.connection import async_engine, engine
+from database.pool_stats import pool_stats
+from services import clusters, metrics
+from services.response_cache import get_response_cache
+
+router = APIRouter()
+
+# Тип содержимого текстового формата Prometheus
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _collect_pools() -> Iterable[metrics.Sample]:
+    """Состояние пулов соединений текущего воркера."""
+    for name, pool in (("sync", engine.pool), ("async", async_engine.sync_engine.pool)):
+        stats = pool_stats(pool)
+        labels = {"engine": name}
+        if "size" in stats:
+            yield "fstr_db_pool_checked_out", labels, stats["checked_out"]
+            yield "fstr_db_pool_capacity", labels, stats["size"] + max(stats["max_overflow"], 0)
+        if "checkouts" in stats:
+            yield "fstr_db_pool_checkouts_total", labels, stats["checkouts"]
+            yield "fstr_db_pool_timeouts_total", labels, stats["timeouts"]
+
+
+def _collect_caches() -> Iterable[metrics.Sample]:
+    """Попадания и промахи кэшей текущего воркера."""
+    response_cache = get_response_cache()
+    tile_cache = clusters.cluster_tile_cache
+    for name, cache in (("responses", response_cache), ("cluster_tiles", tile_cache)):
+        yield "fstr_cache_hits_total", {"cache": name}, cache.hits
+        yield "fstr_cache_misses_total", {"cache": name}, cache.misses
+
+
+metrics.registry.add_collector(_collect_pools)
+metrics.registry.add_collector(_collect_caches)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    GET /metrics - метрики для Prometheus: длительность запросов по маршрутам,
+    созданные и измененные перевалы по статусу, байты изображений, пулы
+    соединений и кэши. С FSTR_METRICS_DIR - сумма по всем воркерам.
+    """
+    return PlainTextResponse(metrics.render(metrics.METRICS_DIR), media_type=PROMETHEUS_CONTENT_TYPE)
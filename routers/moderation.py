@@ -0,0 +1,111 @@
+"""
+Роутер модерации перевалов.
+"""
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+from database.connection import get_async_db
+from models.pereval import PerevalStatus
+from repository.async_pereval_repository import AsyncPerevalRepository
+from repository.moderation import CLAIM_TIMEOUT_SECONDS, ModerationConflictError
+from schemas.moderation import (
+    ClaimRequest, ClaimResponse, DecisionRequest, ModerationAuditResponse, ReleaseExpiredResponse, ReleaseRequest
+)
+from schemas.pereval import PerevalListItem
+from services import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.post("/moderation/claim", response_model=ClaimResponse)
+async def claim_perevals(request: ClaimRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    POST /moderation/claim - захват следующей пачки перевалов из очереди.
+
+    Перевалы переходят в статус pending и закрепляются за модератором
+    на FSTR_MODERATION_CLAIM_TIMEOUT секунд. Параллельные модераторы
+    получают непересекающиеся пачки.
+    """
+    expires_at = datetime.utcnow() + timedelta(seconds=CLAIM_TIMEOUT_SECONDS)
+    try:
+        rows = await AsyncPerevalRepository(db).claim_perevals(request.moderator, request.limit)
+    except Exception as e:
+        logger.error(f"Ошибка при захвате перевалов модератором {request.moderator}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+    logger.info(f"Модератор {request.moderator} захватил перевалы: {[row['id'] for row in rows]}")
+    metrics.inc("fstr_perevals_updated_total", len(rows), status="pending")
+    return ClaimResponse(claimed=[PerevalListItem.from_row(row) for row in rows], expires_at=expires_at)
+
+
+@router.post("/moderation/{pereval_id}/decision", response_model=ModerationAuditResponse)
+async def decide_pereval(pereval_id: int, request: DecisionRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    POST /moderation/{id}/decision - принять или отклонить захваченный перевал.
+
+    409, если перевал не захвачен этим модератором или захват истек.
+    """
+    try:
+        audit = await AsyncPerevalRepository(db).decide_pereval(
+            pereval_id, request.moderator, PerevalStatus(request.status), request.comment
+        )
+    except ModerationConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Ошибка при модерации перевала {pereval_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+    if audit is None:
+        raise HTTPException(status_code=404, detail="Перевал не найден")
+    metrics.inc("fstr_perevals_updated_total", status=audit.to_status.value)
+    return ModerationAuditResponse.model_validate(audit)
+
+
+@router.post("/moderation/{pereval_id}/release", response_model=ModerationAuditResponse)
+async def release_pereval(pereval_id: int, request: ReleaseRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    POST /moderation/{id}/release - вернуть захваченный перевал в очередь (статус new).
+
+    409, если перевал не захвачен этим модератором или захват истек.
+    """
+    try:
+        audit = await AsyncPerevalRepository(db).release_pereval(pereval_id, request.moderator, request.comment)
+    except ModerationConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Ошибка при возврате перевала {pereval_id} в очередь: {str(e)}")
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+    if audit is None:
+        raise HTTPException(status_code=404, detail="Перевал не найден")
+    metrics.inc("fstr_perevals_updated_total", status=audit.to_status.value)
+    return ModerationAuditResponse.model_validate(audit)
+
+
+@router.post("/moderation/release-expired", response_model=ReleaseExpiredResponse)
+async def release_expired_claims(db: AsyncSession = Depends(get_async_db)):
+    """
+    POST /moderation/release-expired - вернуть в очередь перевалы с истекшим захватом.
+
+    Истекшие захваты перехватываются и при обычном захвате, а этот endpoint
+    нужен, чтобы перевалы не висели в статусе pending (например, по cron).
+    """
+    try:
+        released = await AsyncPerevalRepository(db).release_expired_claims()
+    except Exception as e:
+        logger.error(f"Ошибка при возврате истекших захватов: {str(e)}")
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+    metrics.inc("fstr_perevals_updated_total", released, status="new")
+    return ReleaseExpiredResponse(released=released)
+
+
+@router.get("/moderation/{pereval_id}/audit", response_model=List[ModerationAuditResponse])
+async def get_moderation_audit(pereval_id: int, db: AsyncSession = Depends(get_async_db)):
+    """GET /moderation/{id}/audit - журнал модерации перевала."""
+    try:
+        entries = await AsyncPerevalRepository(db).get_moderation_audit(pereval_id)
+    except Exception as e:
+        logger.error(f"Ошибка при получении журнала модерации перевала {pereval_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+    return [ModerationAuditResponse.model_validate(entry) for entry in entries]
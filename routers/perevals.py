@@ -0,0 +1,239 @@
+"""
+Роутер для поиска перевалов на карте.
+"""
+import asyncio
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import List, Optional
+from database.connection import get_async_db
+from models.pereval import PerevalStatus
+from repository.async_pereval_repository import AsyncPerevalRepository
+from repository.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursorError
+from routers.conditional import has_conditions, is_not_modified, list_validator_headers
+from schemas.pereval import (
+    PerevalCluster, PerevalClusterTile, PerevalFilters, PerevalListItem, PerevalMapItem, PerevalNearbyItem, Season
+)
+from services import clusters
+from services.clusters import CLUSTER_GRID_SIZE, MAX_CLUSTER_ZOOM, tile_bounds
+from services.difficulty import DIFFICULTY_CATEGORIES, difficulty_category, difficulty_rank
+from services.spatial_index import pereval_spatial_index
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Максимальное количество перевалов в ответе для области карты
+MAX_BBOX_RESULTS = 5000
+
+# Ограничения поиска ближайших перевалов
+MAX_NEARBY_RESULTS = 200
+MAX_NEARBY_RADIUS_KM = 500
+
+# Максимальное количество результатов поиска по названию
+MAX_SEARCH_RESULTS = 50
+
+# Как часто догружать в индекс перевалы, добавленные и измененные другими процессами
+SPATIAL_REFRESH_SECONDS = float(os.getenv("FSTR_SPATIAL_REFRESH_SECONDS", "30"))
+
+_spatial_refresh_lock = asyncio.Lock()
+
+
+async def _refresh_spatial_index(repository: AsyncPerevalRepository) -> None:
+    """
+    Загружает индекс при первом обращении и периодически догружает перевалы,
+    созданные и измененные после последней загрузки (по номеру изменения).
+    """
+    if not pereval_spatial_index.needs_refresh(SPATIAL_REFRESH_SECONDS):
+        return
+    async with _spatial_refresh_lock:
+        if not pereval_spatial_index.needs_refresh(SPATIAL_REFRESH_SECONDS):
+            return
+        after_seq = pereval_spatial_index.change_seq if pereval_spatial_index.loaded else None
+        rows, change_seq = await repository.list_pereval_coords(after_seq)
+        pereval_spatial_index.upsert_many(rows)
+        pereval_spatial_index.mark_refreshed(change_seq)
+
+
+@router.get("/perevals", response_model=List[PerevalListItem])
+async def list_perevals(
+    request: Request,
+    response: Response,
+    status: Optional[PerevalStatus] = Query(None, description="Статус перевала"),
+    season: Optional[Season] = Query(None, description="Сезон для фильтра min_level (по умолчанию любой)"),
+    min_level: Optional[str] = Query(
+        None, description=f"Минимальная категория трудности: {', '.join(DIFFICULTY_CATEGORIES)}"
+    ),
+    added_from: Optional[datetime] = Query(None, description="Добавлены не раньше"),
+    added_to: Optional[datetime] = Query(None, description="Добавлены раньше"),
+    user__email: Optional[str] = Query(None, description="Email отправителя"),
+    limit: int = Query(
+        DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE,
+        description=f"Размер страницы (максимум {MAX_PAGE_SIZE})"
+    ),
+    after: Optional[str] = Query(None, description="Курсор следующей страницы из заголовка X-Next-Cursor"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    GET /perevals - список перевалов по фильтрам в порядке (add_time, id).
+
+    Например, очередь модерации: status=pending&added_from=...&season=summer&min_level=2А.
+    Если есть следующая страница, ее курсор возвращается в заголовке X-Next-Cursor.
+    ETag и Last-Modified страницы считаются по версиям перевалов на ней;
+    условный запрос проверяется по ним без загрузки остальных полей.
+    """
+    if min_level is not None and not difficulty_rank(min_level):
+        raise HTTPException(status_code=400, detail=f"Неизвестная категория трудности: {min_level}")
+    if added_from and added_to and added_from >= added_to:
+        raise HTTPException(status_code=400, detail="added_from должен быть раньше added_to")
+
+    filters = PerevalFilters(
+        status=status,
+        season=season,
+        min_level=min_level,
+        added_from=added_from,
+        added_to=added_to,
+        user_email=user__email
+    )
+    repository = AsyncPerevalRepository(db)
+    try:
+        if has_conditions(request):
+            # Дешевая проверка по версиям перевалов страницы
+            versions, next_cursor = await repository.page_pereval_versions(filters, limit, after)
+            headers = list_validator_headers(
+                [(row["id"], row["version"], row["updated_at"]) for row in versions], next_cursor
+            )
+            if is_not_modified(request, headers["ETag"], headers.get("Last-Modified")):
+                if next_cursor:
+                    headers["X-Next-Cursor"] = next_cursor
+                return Response(status_code=304, headers=headers)
+        rows, next_cursor = await repository.page_perevals(filters, limit, after)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Ошибка при получении списка перевалов: {str(e)}")
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+
+    headers = list_validator_headers([(row["id"], row["version"], row["updated_at"]) for row in rows], next_cursor)
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    response.headers.update(headers)
+    return [PerevalListItem.from_row(row) for row in rows]
+
+
+@router.get("/perevals/bbox", response_model=List[PerevalMapItem])
+async def get_perevals_in_bbox(
+    min_lat: float = Query(..., ge=-90, le=90, description="Южная граница области"),
+    min_lon: float = Query(..., ge=-180, le=180, description="Западная граница области"),
+    max_lat: float = Query(..., ge=-90, le=90, description="Северная граница области"),
+    max_lon: float = Query(..., ge=-180, le=180, description="Восточная граница области"),
+    limit: int = Query(500, ge=1, le=MAX_BBOX_RESULTS, description="Максимум перевалов в ответе"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    GET /perevals/bbox - перевалы внутри видимой области карты.
+
+    Если min_lon > max_lon, область пересекает 180-й меридиан.
+    """
+    if min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="min_lat не может быть больше max_lat")
+    try:
+        rows = await AsyncPerevalRepository(db).list_perevals_in_bbox(min_lat, min_lon, max_lat, max_lon, limit)
+    except Exception as e:
+        logger.error(f"Ошибка при поиске перевалов в области: {str(e)}")
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+    return [PerevalMapItem(**{**row, "status": row["status"].value}) for row in rows]
+
+
+@router.get("/perevals/nearby", response_model=List[PerevalNearbyItem])
+async def get_perevals_nearby(
+    lat: float = Query(..., ge=-90, le=90, description="Широта точки"),
+    lon: float = Query(..., ge=-180, le=180, description="Долгота точки"),
+    radius_km: float = Query(20, gt=0, le=MAX_NEARBY_RADIUS_KM, description="Радиус поиска, км"),
+    k: int = Query(20, ge=1, le=MAX_NEARBY_RESULTS, description="Максимум перевалов в ответе"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    GET /perevals/nearby - ближайшие к точке перевалы в пределах радиуса,
+    отсортированные по расстоянию.
+    """
+    repository = AsyncPerevalRepository(db)
+    try:
+        await _refresh_spatial_index(repository)
+        nearest = pereval_spatial_index.nearest(lat, lon, radius_km, k)
+        rows = await repository.get_perevals_map_items([pereval_id for pereval_id, _ in nearest])
+    except Exception as e:
+        logger.error(f"Ошибка при поиске ближайших перевалов: {str(e)}")
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+    distances = dict(nearest)
+    return [
+        PerevalNearbyItem(**{**row, "status": row["status"].value, "distance_km": round(distances[row["id"]], 3)})
+        for row in rows
+    ]
+
+
+@router.get("/perevals/clusters", response_model=PerevalClusterTile)
+async def get_pereval_clusters(
+    z: int = Query(..., ge=0, le=MAX_CLUSTER_ZOOM, description="Масштаб тайла"),
+    x: int = Query(..., ge=0, description="Номер тайла по горизонтали"),
+    y: int = Query(..., ge=0, description="Номер тайла по вертикали"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    GET /perevals/clusters - кластеры перевалов в тайле карты z/x/y.
+
+    Тайл делится на сетку ячеек, перевалы каждой ячейки сворачиваются
+    в кластер с числом перевалов, центром и наибольшей категорией трудности.
+    """
+    if x >= 2 ** z or y >= 2 ** z:
+        raise HTTPException(status_code=400, detail="Тайл вне сетки указанного масштаба")
+
+    cache = clusters.cluster_tile_cache
+    tile = cache.get((z, x, y))
+    if tile is not None:
+        return tile
+
+    generation = cache.generation
+    try:
+        rows = await AsyncPerevalRepository(db).list_pereval_clusters(*tile_bounds(z, x, y), CLUSTER_GRID_SIZE)
+    except Exception as e:
+        logger.error(f"Ошибка при построении кластеров тайла: {str(e)}")
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+
+    tile = PerevalClusterTile(
+        z=z,
+        x=x,
+        y=y,
+        count=sum(row["count"] for row in rows),
+        clusters=[
+            PerevalCluster(
+                count=row["count"],
+                latitude=row["latitude"],
+                longitude=row["longitude"],
+                max_difficulty=difficulty_category(row["max_difficulty_rank"])
+            )
+            for row in rows
+        ]
+    )
+    cache.put((z, x, y), tile, generation)
+    return tile
+
+
+@router.get("/perevals/search", response_model=List[PerevalMapItem])
+async def search_perevals(
+    q: str = Query(..., min_length=1, max_length=100, description="Название или его начало"),
+    limit: int = Query(10, ge=1, le=MAX_SEARCH_RESULTS, description="Максимум перевалов в ответе"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    GET /perevals/search - поиск перевалов по beauty_title, title и other_titles
+    для автодополнения: учитываются недописанные слова и опечатки.
+    """
+    try:
+        rows = await AsyncPerevalRepository(db).search_perevals(q, limit)
+    except Exception as e:
+        logger.error(f"Ошибка при поиске перевалов по названию: {str(e)}")
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+    return [PerevalMapItem(**{**row, "status": row["status"].value}) for row in rows]
@@ -1,18 +1,39 @@
 """
 Роутер для обработки запросов submitData.
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from database.connection import get_db
-from repository.pereval_repository import PerevalRepository
-from schemas.pereval import PerevalCreate, SubmitDataResponse, PerevalUpdate, PerevalDetailResponse, UpdateResponse
-from models.user import User
-from models.coords import Coords
-from models.level import Level
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar
+from database.connection import get_async_db
+from repository import idempotency
+from repository.async_pereval_repository import AsyncPerevalRepository
+from repository.idempotency import IdempotencyKeyReusedError
+from repository.pereval_repository import VersionConflictError
+from repository.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursorError
+from schemas.pereval import (
+    PerevalCreate, SubmitDataResponse, PerevalUpdate, PerevalDetailResponse, UpdateResponse,
+    BatchItemResult, BatchSubmitResponse
+)
+from schemas.image import ImageResponse, ImageSummaryResponse
+from schemas.user import UserResponse
+from schemas.coords import CoordsResponse
+from schemas.level import LevelResponse
 from models.image import Image
 from models.pereval import Pereval
+from services import metrics
+from routers.conditional import (
+    has_conditions, if_match_version, is_not_modified, list_validator_headers, pereval_etag, validator_headers
+)
+from services.response_cache import CachedResponse, ResponseCache, get_response_cache, pereval_detail_key
+from storage.blob_store import BlobStore, get_blob_store
+from storage.images import InvalidImageError
+from storage.uploads import InvalidUploadError, UploadTooLargeError, receive_images
+import base64
 import logging
+import orjson
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -20,27 +41,143 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# Максимальное количество перевалов в одном пакетном запросе
+MAX_BATCH_SIZE = 500
+
+# Ограничения потоковой загрузки изображений
+MAX_IMAGE_SIZE = 20 * 1024 * 1024
+MAX_IMAGES_PER_UPLOAD = 10
+
+# Допустимые значения параметра include
+INCLUDE_IMAGES_META = "images.meta"
+INCLUDE_IMAGES_DATA = "images.data"
+
+INCLUDE_DESCRIPTION = (
+    "Состав ответа: images.meta (по умолчанию, только метаданные изображений) "
+    "или images.data (вместе с base64 данными)"
+)
+
+
+def _include_image_data(include: Optional[str]) -> bool:
+    """Разбирает параметр include и возвращает, нужны ли данные изображений."""
+    if not include:
+        return False
+    values = {value.strip() for value in include.split(",") if value.strip()}
+    unknown = values - {INCLUDE_IMAGES_META, INCLUDE_IMAGES_DATA}
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Недопустимое значение include: {', '.join(sorted(unknown))}"
+        )
+    return INCLUDE_IMAGES_DATA in values
+
+
+def _from_orm(schema: Type[ModelT], obj: Any, **values: Any) -> ModelT:
+    """
+    Схема ответа из атрибутов ORM-объекта без повторной валидации (model_construct).
+    Поля берутся из самой схемы; values задают поля, которые вычисляются иначе.
+    """
+    for name in schema.model_fields:
+        if name not in values:
+            values[name] = getattr(obj, name)
+    return schema.model_construct(**values)
+
+
+def _image_response(
+    image: Image,
+    blob_store: BlobStore,
+    include_image_data: bool
+) -> ImageSummaryResponse:
+    """
+    Изображение в формате ImageSummaryResponse / ImageResponse.
+    Данные читаются из хранилища блобов только по запросу.
+    """
+    if include_image_data:
+        data = base64.b64encode(blob_store.get(image.blob_key)).decode()
+        return _from_orm(ImageResponse, image, data=data)
+    return _from_orm(ImageSummaryResponse, image)
+
+
+def _detail_dict(
+    pereval: Pereval,
+    blob_store: BlobStore,
+    include_image_data: bool = False
+) -> dict:
+    """
+    Перевал с загруженными связями в формате PerevalDetailResponse.
+
+    Данные из базы уже прошли валидацию при записи, поэтому схема собирается
+    через model_construct без повторной валидации, а словарь сериализуется orjson.
+    """
+    return _from_orm(
+        PerevalDetailResponse,
+        pereval,
+        status=pereval.status.value,
+        user=_from_orm(UserResponse, pereval.user),
+        coords=_from_orm(CoordsResponse, pereval.coords),
+        level=_from_orm(LevelResponse, pereval.level),
+        images=[_image_response(image, blob_store, include_image_data) for image in pereval.images]
+    ).model_dump()
+
 
 @router.post("/submitData", response_model=SubmitDataResponse)
 async def submit_data(
         pereval_data: PerevalCreate,
-        db: Session = Depends(get_db)
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(get_async_db),
+        blob_store: BlobStore = Depends(get_blob_store)
 ):
     """
     POST /submitData - создание нового перевала.
 
     Принимает JSON с данными о перевале и сохраняет их в PostgreSQL.
     Возвращает ID созданной записи или описание ошибки.
+
+    Повтор запроса с тем же заголовком Idempotency-Key (без заголовка - с тем же
+    содержимым) возвращает id уже созданного перевала с заголовком
+    Idempotent-Replayed: true. Тот же ключ с другим содержимым - status 409.
     """
+    idempotency_key = request.headers.get("Idempotency-Key")
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= idempotency.MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Idempotency-Key должен содержать от 1 до {idempotency.MAX_IDEMPOTENCY_KEY_LENGTH} символов"
+        )
+
     try:
-        # Создаем репозиторий
-        pereval_repo = PerevalRepository(db)
+        # Хэш требует декодирования изображений - в пуле потоков, вне цикла событий
+        content_hash = await run_in_threadpool(idempotency.request_hash, pereval_data)
+        key = idempotency_key or idempotency.content_key(content_hash)
+
+        # Повтор, уже обработанный этим воркером, не требует обращения к базе
+        results = idempotency.idempotency_results
+        generation = results.generation
+        cached = results.get(key)
+        if cached is not None:
+            if cached[0] != content_hash:
+                raise IdempotencyKeyReusedError(f"Ключ идемпотентности {key} уже использован с другими данными")
+            pereval_id, created = cached[1], False
+        else:
+            # Создаем репозиторий
+            pereval_repo = AsyncPerevalRepository(db, blob_store)
 
-        # Создаем перевал и все связанные сущности
-        pereval_id = pereval_repo.create_pereval(pereval_data)
+            # Создаем перевал и все связанные сущности (не более одного раза на ключ)
+            pereval_id, created = await pereval_repo.create_pereval_idempotent(pereval_data, key, content_hash)
+            if pereval_id:
+                results.put(key, (content_hash, pereval_id), generation)
+
+        if pereval_id and not created:
+            logger.info(f"Повторный запрос создания перевала с ID: {pereval_id}")
+            response.headers["Idempotent-Replayed"] = "true"
+            return SubmitDataResponse(status=200, message=None, id=pereval_id)
 
         if pereval_id:
             logger.info(f"Успешно создан перевал с ID: {pereval_id}")
+            metrics.inc("fstr_perevals_created_total", status="new")
+            metrics.inc("fstr_image_bytes_ingested_total", sum(len(image.content) for image in pereval_data.images))
             return SubmitDataResponse(
                 status=200,
                 message=None,
@@ -54,6 +191,21 @@ async def submit_data(
                 id=None
             )
 
+    except IdempotencyKeyReusedError as e:
+        logger.warning(str(e))
+        return SubmitDataResponse(
+            status=409,
+            message="Idempotency-Key уже использован для запроса с другими данными",
+            id=None
+        )
+
+    except InvalidImageError as e:
+        return SubmitDataResponse(
+            status=400,
+            message=f"Ошибка валидации данных: {str(e)}",
+            id=None
+        )
+
     except Exception as e:
         logger.error(f"Ошибка при создании перевала: {str(e)}")
 
@@ -77,19 +229,124 @@ async def submit_data(
                 id=None
             )
 
+def _validate_batch(
+    payload: List[Dict[str, Any]]
+) -> Tuple[List[Optional[BatchItemResult]], List[Tuple[int, PerevalCreate]]]:
+    """
+    Валидирует элементы пакета и декодирует их изображения.
+    Возвращает результаты с ошибками (None для валидных) и валидные элементы с индексами.
+    """
+    results: List[Optional[BatchItemResult]] = [None] * len(payload)
+    valid_items = []
+    for index, item in enumerate(payload):
+        try:
+            pereval_data = PerevalCreate.model_validate(item)
+            for image in pereval_data.images:
+                image.content  # декодирует base64 (байты сохраняются в объекте)
+            valid_items.append((index, pereval_data))
+        except ValidationError as e:
+            error = e.errors()[0]
+            location = ".".join(str(part) for part in error["loc"])
+            results[index] = BatchItemResult(
+                index=index,
+                status=400,
+                message=f"Ошибка валидации данных: {location}: {error['msg']}"
+            )
+        except InvalidImageError as e:
+            results[index] = BatchItemResult(index=index, status=400, message=f"Ошибка валидации данных: {str(e)}")
+    return results, valid_items
+
+
+@router.post("/submitData/batch", response_model=BatchSubmitResponse)
+async def submit_data_batch(
+        payload: List[Dict[str, Any]] = Body(..., description="Список перевалов в формате POST /submitData"),
+        db: AsyncSession = Depends(get_async_db),
+        blob_store: BlobStore = Depends(get_blob_store)
+):
+    """
+    POST /submitData/batch - пакетное создание перевалов.
+
+    Каждый элемент валидируется отдельно: невалидные элементы получают
+    status=400 в своем результате и не мешают сохранению остальных.
+    Валидные элементы записываются одной транзакцией set-based вставками.
+    """
+    if len(payload) > MAX_BATCH_SIZE:
+        return BatchSubmitResponse(
+            status=400,
+            message=f"Слишком большой пакет: максимум {MAX_BATCH_SIZE} перевалов",
+            results=[]
+        )
+
+    # Валидация и декодирование изображений пакета - в пуле потоков, вне цикла событий
+    results, valid_items = await run_in_threadpool(_validate_batch, payload)
+
+    status = 200
+    message = None
+    if valid_items:
+        try:
+            pereval_repo = AsyncPerevalRepository(db, blob_store)
+            pereval_ids = await pereval_repo.create_perevals_batch([item for _, item in valid_items])
+            for (index, _), pereval_id in zip(valid_items, pereval_ids):
+                results[index] = BatchItemResult(index=index, status=200, id=pereval_id)
+            metrics.inc("fstr_perevals_created_total", len(pereval_ids), status="new")
+            metrics.inc("fstr_image_bytes_ingested_total", sum(
+                len(image.content) for _, item in valid_items for image in item.images
+            ))
+            logger.info(f"Пакетно создано перевалов: {len(pereval_ids)}")
+        except Exception as e:
+            logger.error(f"Ошибка при пакетном создании перевалов: {str(e)}")
+            status = 500
+            message = "Ошибка при сохранении пакета"
+            for index, _ in valid_items:
+                results[index] = BatchItemResult(index=index, status=500, message=message)
+
+    return BatchSubmitResponse(status=status, message=message, results=results)
+
 @router.get("/submitData/{pereval_id}", response_model=PerevalDetailResponse)
 async def get_pereval_by_id(
     pereval_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db),
+    blob_store: BlobStore = Depends(get_blob_store),
+    response_cache: ResponseCache = Depends(get_response_cache)
 ):
     """
     GET /submitData/{id} - получение перевала по ID.
     
     Возвращает полную информацию о перевале включая статус.
+    Данные изображений включаются только при include=images.data.
+    Ответ без данных изображений кэшируется в сериализованном виде
+    до следующего изменения перевала.
+    Ответ содержит ETag и Last-Modified; на условный запрос с совпавшим
+    валидатором возвращается 304 без загрузки связанных сущностей.
     """
     try:
-        pereval_repo = PerevalRepository(db)
-        pereval = pereval_repo.get_pereval_by_id(pereval_id)
+        include_image_data = _include_image_data(include)
+        cache_key = pereval_detail_key(pereval_id)
+        if not include_image_data:
+            cached = await response_cache.get(cache_key)
+            if cached is not None:
+                if is_not_modified(request, cached.headers["ETag"], cached.headers.get("Last-Modified")):
+                    return Response(status_code=304, headers=cached.headers)
+                return Response(content=cached.body, media_type="application/json", headers=cached.headers)
+        cache_token = await response_cache.token()
+        variant = "-data" if include_image_data else ""
+
+        pereval_repo = AsyncPerevalRepository(db, blob_store)
+        if has_conditions(request):
+            # Дешевая проверка по версии, без загрузки связанных сущностей
+            version = await pereval_repo.get_pereval_version(pereval_id)
+            if not version:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Перевал не найден"
+                )
+            etag = pereval_etag(pereval_id, version[0], variant)
+            if is_not_modified(request, etag, version[1]):
+                return Response(status_code=304, headers=validator_headers(etag, version[1]))
+
+        pereval = await pereval_repo.get_pereval_detail(pereval_id, include_image_data)
         
         if not pereval:
             raise HTTPException(
@@ -97,28 +354,16 @@ async def get_pereval_by_id(
                 detail="Перевал не найден"
             )
         
-        # Получаем связанные данные
-        user = db.query(User).filter(User.id == pereval.user_id).first()
-        coords = db.query(Coords).filter(Coords.id == pereval.coords_id).first()
-        level = db.query(Level).filter(Level.id == pereval.level_id).first()
-        images = db.query(Image).filter(Image.pereval_id == pereval_id).all()
-        
-        # Формируем ответ
-        response_data = {
-            "id": pereval.id,
-            "beauty_title": pereval.beauty_title,
-            "title": pereval.title,
-            "other_titles": pereval.other_titles,
-            "connect": pereval.connect,
-            "add_time": pereval.add_time,
-            "status": pereval.status.value,
-            "user": user,
-            "coords": coords,
-            "level": level,
-            "images": images
-        }
-        
-        return PerevalDetailResponse(**response_data)
+        headers = validator_headers(pereval_etag(pereval_id, pereval.version, variant), pereval.updated_at)
+        if include_image_data:
+            # Чтение данных изображений из хранилища - блокирующий ввод-вывод
+            detail = await run_in_threadpool(_detail_dict, pereval, blob_store, True)
+            metrics.inc("fstr_image_bytes_served_total", sum(image.size for image in pereval.images))
+            return ORJSONResponse(detail, headers=headers)
+
+        content = orjson.dumps(_detail_dict(pereval, blob_store))
+        await response_cache.set(cache_key, CachedResponse(content, headers), cache_token)
+        return Response(content=content, media_type="application/json", headers=headers)
         
     except HTTPException:
         raise
@@ -129,23 +374,94 @@ async def get_pereval_by_id(
             detail="Внутренняя ошибка сервера"
         )
 
+@router.post("/submitData/{pereval_id}/images", response_model=List[ImageSummaryResponse])
+async def upload_images(
+    pereval_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    blob_store: BlobStore = Depends(get_blob_store)
+):
+    """
+    POST /submitData/{id}/images - загрузка изображений файлами (multipart/form-data).
+
+    Файлы передаются частями с filename, названия - полями title.
+    Тело запроса читается потоком и пишется в хранилище блобов кусками,
+    поэтому память на запрос не зависит от размера фотографий.
+    Добавлять изображения можно только к перевалам со статусом 'new'.
+    """
+    pereval_repo = AsyncPerevalRepository(db, blob_store)
+    pereval = await pereval_repo.get_pereval_by_id(pereval_id)
+    if not pereval:
+        raise HTTPException(status_code=400, detail="Перевал не найден")
+    if pereval.status.value != "new":
+        raise HTTPException(status_code=400, detail="Редактирование запрещено: статус не 'new'")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and \
+            int(content_length) > MAX_IMAGE_SIZE * MAX_IMAGES_PER_UPLOAD + 64 * 1024:
+        raise HTTPException(status_code=413, detail="Слишком большой запрос")
+
+    try:
+        uploads = await receive_images(
+            request.headers.get("content-type", ""),
+            request.stream(),
+            blob_store,
+            MAX_IMAGE_SIZE,
+            MAX_IMAGES_PER_UPLOAD
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        images = await pereval_repo.add_images(pereval_id, [upload._asdict() for upload in uploads])
+    except Exception as e:
+        logger.error(f"Ошибка при добавлении изображений к перевалу {pereval_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+    if images is None:
+        # Перевал взяли на модерацию, пока загружались файлы
+        raise HTTPException(status_code=400, detail="Редактирование запрещено: статус не 'new'")
+
+    logger.info(f"К перевалу {pereval_id} добавлено изображений: {len(images)}")
+    metrics.inc("fstr_perevals_updated_total", status="new")
+    metrics.inc("fstr_image_bytes_ingested_total", sum(upload.size for upload in uploads))
+    return [ImageSummaryResponse.model_validate(image) for image in images]
+
 @router.patch("/submitData/{pereval_id}", response_model=UpdateResponse)
 async def update_pereval(
     pereval_id: int,
     update_data: PerevalUpdate,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    blob_store: BlobStore = Depends(get_blob_store)
 ):
     """
     PATCH /submitData/{id} - обновление перевала.
     
     Обновляет перевал только если его статус = 'new'.
     Запрещено изменять ФИО, email и телефон пользователя.
+    С заголовком If-Match (ETag из GET /submitData/{id}) перевал обновляется,
+    только если не изменился с тех пор, иначе ответ 412.
+    Изображения сравниваются по содержимому: неизмененные не перезаписываются.
     """
+    expected_version = None
+    if_match = request.headers.get("if-match")
+    if if_match is not None:
+        try:
+            expected_version = if_match_version(if_match, pereval_id)
+        except ValueError:
+            return JSONResponse(
+                status_code=412,
+                content=UpdateResponse(state=0, message="Некорректный заголовок If-Match").model_dump()
+            )
+
     try:
-        pereval_repo = PerevalRepository(db)
+        pereval_repo = AsyncPerevalRepository(db, blob_store)
         
         # Проверяем существование перевала
-        pereval = pereval_repo.get_pereval_by_id(pereval_id)
+        pereval = await pereval_repo.get_pereval_by_id(pereval_id)
         if not pereval:
             return UpdateResponse(
                 state=0,
@@ -160,33 +476,27 @@ async def update_pereval(
             )
         
         # Подготавливаем данные для обновления
-        update_dict = update_data.dict(exclude_unset=True)
+        # Связанные сущности (coords, level) model_dump тоже превращает в словари
+        update_dict = update_data.model_dump(exclude_unset=True)
         
         # Удаляем запрещенные поля пользователя (если они случайно попали)
         forbidden_user_fields = ['email', 'fam', 'name', 'otc', 'phone']
         for field in forbidden_user_fields:
             update_dict.pop(field, None)
         
-        # Преобразуем Pydantic объекты в словари для связанных сущностей
-        if 'coords' in update_dict and hasattr(update_dict['coords'], 'dict'):
-            update_dict['coords'] = update_dict['coords'].dict()
-        
-        if 'level' in update_dict and hasattr(update_dict['level'], 'dict'):
-            update_dict['level'] = update_dict['level'].dict()
-        
-        if 'images' in update_dict:
-            images_list = []
-            for img in update_dict['images']:
-                if hasattr(img, 'dict'):
-                    images_list.append(img.dict())
-                else:
-                    images_list.append(img)
-            update_dict['images'] = images_list
+        if update_data.images is not None:
+            # Изображения декодирует и сохраняет репозиторий, вне цикла событий
+            update_dict['images'] = update_data.images
         
         # Обновляем перевал
-        success = pereval_repo.update_pereval(pereval_id, update_dict)
+        success = await pereval_repo.update_pereval(pereval_id, update_dict, expected_version)
         
         if success:
+            metrics.inc("fstr_perevals_updated_total", status="new")
+            if update_data.images:
+                metrics.inc("fstr_image_bytes_ingested_total", sum(len(image.content) for image in update_data.images))
+            version = await pereval_repo.get_pereval_version(pereval_id)
+            response.headers.update(validator_headers(pereval_etag(pereval_id, version[0]), version[1]))
             return UpdateResponse(
                 state=1,
                 message=None
@@ -197,6 +507,14 @@ async def update_pereval(
                 message="Ошибка при обновлении перевала"
             )
             
+    except InvalidImageError as e:
+        return UpdateResponse(state=0, message=str(e))
+    except VersionConflictError as e:
+        return JSONResponse(
+            status_code=412,
+            content=UpdateResponse(state=0, message="Перевал изменен другим запросом").model_dump(),
+            headers={"ETag": pereval_etag(pereval_id, e.current_version)}
+        )
     except Exception as e:
         logger.error(f"Ошибка при обновлении перевала {pereval_id}: {str(e)}")
         return UpdateResponse(
@@ -206,48 +524,72 @@ async def update_pereval(
 
 @router.get("/submitData/", response_model=List[PerevalDetailResponse])
 async def get_perevals_by_user_email(
+    request: Request,
     user__email: str = Query(..., description="Email пользователя"),
-    offset: int = Query(0, ge=0, description="Смещение для пагинации"),
-    limit: Optional[int] = Query(None, ge=1, description="Лимит записей для пагинации"),
-    db: Session = Depends(get_db)
+    offset: int = Query(0, ge=0, description="Смещение для пагинации (устаревший способ, используйте after)"),
+    limit: Optional[int] = Query(
+        None, ge=1, le=MAX_PAGE_SIZE,
+        description=f"Размер страницы (по умолчанию {DEFAULT_PAGE_SIZE}, максимум {MAX_PAGE_SIZE})"
+    ),
+    after: Optional[str] = Query(None, description="Курсор следующей страницы из заголовка X-Next-Cursor"),
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db),
+    blob_store: BlobStore = Depends(get_blob_store)
 ):
     """
     GET /submitData/?user__email=<email> - получение перевалов по email пользователя.
     
-    Возвращает список всех перевалов, добавленных пользователем с указанным email.
-    Поддерживает пагинацию через параметры offset и limit.
+    Возвращает страницу перевалов, добавленных пользователем с указанным email,
+    в порядке (add_time, id). Если есть следующая страница, ее курсор
+    возвращается в заголовке X-Next-Cursor и передается в параметре after.
+    Данные изображений включаются только при include=images.data.
+    ETag и Last-Modified страницы считаются по версиям перевалов на ней;
+    условный запрос проверяется по ним без загрузки связанных сущностей.
     """
     try:
-        pereval_repo = PerevalRepository(db)
-        perevals = pereval_repo.list_perevals_by_user_email(user__email, offset, limit)
-        
-        result = []
-        for pereval in perevals:
-            # Получаем связанные данные
-            user = db.query(User).filter(User.id == pereval.user_id).first()
-            coords = db.query(Coords).filter(Coords.id == pereval.coords_id).first()
-            level = db.query(Level).filter(Level.id == pereval.level_id).first()
-            images = db.query(Image).filter(Image.pereval_id == pereval.id).all()
-            
-            # Формируем ответ
-            response_data = {
-                "id": pereval.id,
-                "beauty_title": pereval.beauty_title,
-                "title": pereval.title,
-                "other_titles": pereval.other_titles,
-                "connect": pereval.connect,
-                "add_time": pereval.add_time,
-                "status": pereval.status.value,
-                "user": user,
-                "coords": coords,
-                "level": level,
-                "images": images
-            }
-            
-            result.append(PerevalDetailResponse(**response_data))
+        include_image_data = _include_image_data(include)
+        pereval_repo = AsyncPerevalRepository(db, blob_store)
+        if has_conditions(request):
+            # Дешевая проверка по версиям перевалов страницы
+            rows, next_cursor = await pereval_repo.page_pereval_versions_by_user_email(
+                user__email, limit or DEFAULT_PAGE_SIZE, after, offset
+            )
+            headers = list_validator_headers(
+                [(row["id"], row["version"], row["updated_at"]) for row in rows], next_cursor, include
+            )
+            if is_not_modified(request, headers["ETag"], headers.get("Last-Modified")):
+                if next_cursor:
+                    headers["X-Next-Cursor"] = next_cursor
+                return Response(status_code=304, headers=headers)
+
+        perevals, next_cursor = await pereval_repo.page_perevals_by_user_email(
+            user__email, limit or DEFAULT_PAGE_SIZE, after, offset, include_image_data
+        )
+        headers = list_validator_headers(
+            [(pereval.id, pereval.version, pereval.updated_at) for pereval in perevals], next_cursor, include
+        )
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
         
-        return result
+        if include_image_data:
+            # Чтение данных изображений из хранилища - блокирующий ввод-вывод
+            items = await run_in_threadpool(
+                lambda: [_detail_dict(pereval, blob_store, True) for pereval in perevals]
+            )
+            metrics.inc("fstr_image_bytes_served_total", sum(
+                image.size for pereval in perevals for image in pereval.images
+            ))
+        else:
+            items = [_detail_dict(pereval, blob_store) for pereval in perevals]
+        return ORJSONResponse(items, headers=headers)
         
+    except HTTPException:
+        raise
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Ошибка при получении перевалов для email {user__email}: {str(e)}")
         raise HTTPException(
@@ -0,0 +1,77 @@
+"""
+Роутер синхронизации перевалов мобильного клиента.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from database.connection import get_async_db
+from repository.async_pereval_repository import AsyncPerevalRepository
+from repository.pagination import InvalidCursorError
+from schemas.pereval import SyncResponse
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Размер порции изменений по умолчанию и максимальный
+DEFAULT_SYNC_PAGE_SIZE = 200
+MAX_SYNC_PAGE_SIZE = 500
+
+
+def _sync_item_dict(row: dict) -> dict:
+    """Строка PerevalRepository.sync_perevals в формате PerevalSyncItem (порядок полей схемы)."""
+    return {
+        "id": row["id"],
+        "beauty_title": row["beauty_title"],
+        "title": row["title"],
+        "other_titles": row["other_titles"],
+        "connect": row["connect"],
+        "add_time": row["add_time"],
+        "status": row["status"].value,
+        "version": row["version"],
+        "updated_at": row["updated_at"],
+        "latitude": row["latitude"],
+        "longitude": row["longitude"],
+        "height": row["height"],
+        "level": {
+            "winter": row["winter"],
+            "summer": row["summer"],
+            "autumn": row["autumn"],
+            "spring": row["spring"]
+        }
+    }
+
+
+@router.get("/sync", response_model=SyncResponse)
+async def sync_perevals(
+    user__email: str = Query(..., description="Email пользователя"),
+    since: Optional[str] = Query(None, description="Курсор из предыдущего ответа (без него - все перевалы)"),
+    limit: int = Query(
+        DEFAULT_SYNC_PAGE_SIZE, ge=1, le=MAX_SYNC_PAGE_SIZE,
+        description=f"Максимум перевалов в ответе (не более {MAX_SYNC_PAGE_SIZE})"
+    ),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    GET /sync - перевалы пользователя, созданные или измененные (в том числе
+    сменившие статус) после курсора since, без изображений.
+
+    Клиент сохраняет cursor из ответа и передает его как since при следующем
+    запуске; пока has_more - true, изменения нужно дозапрашивать. Повторно
+    измененный перевал приходит еще раз с новой версией.
+    """
+    try:
+        rows, cursor, has_more = await AsyncPerevalRepository(db).sync_perevals(user__email, limit, since)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Ошибка синхронизации перевалов: {str(e)}")
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+
+    return ORJSONResponse({
+        "items": [_sync_item_dict(row) for row in rows],
+        "cursor": cursor,
+        "has_more": has_more
+    })
@@ -1,14 +1,14 @@
 """
 Pydantic схемы для координат.
 """
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class CoordsBase(BaseModel):
-    """Базовая схема координат."""
-    latitude: str
-    longitude: str
-    height: str
+    """Базовая схема координат (строки вида "45.3842" тоже принимаются)."""
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    height: float
 
 
 class CoordsCreate(CoordsBase):
@@ -1,25 +1,46 @@
 """
 Pydantic схемы для изображения.
 """
-from pydantic import BaseModel
 from typing import Optional
+from pydantic import BaseModel, PrivateAttr
+from storage.images import decode_base64_image
 
 
 class ImageBase(BaseModel):
     """Базовая схема изображения."""
-    data: str  # Base64 данные
     title: str
 
 
 class ImageCreate(ImageBase):
     """Схема для создания изображения."""
-    pass
+    data: str  # Base64 данные
+    _content: Optional[bytes] = PrivateAttr(default=None)
 
+    @property
+    def content(self) -> bytes:
+        """
+        Декодированные байты изображения (InvalidImageError для некорректных данных).
 
-class ImageResponse(ImageBase):
-    """Схема для ответа с данными изображения."""
+        Base64 декодируется при первом обращении, а не при валидации запроса:
+        валидация идет в цикле событий, а декодирование фотографий в несколько
+        мегабайт обработчики выполняют в пуле потоков.
+        """
+        if self._content is None:
+            self._content = decode_base64_image(self.data)
+        return self._content
+
+
+class ImageSummaryResponse(ImageBase):
+    """Схема для ответа с метаданными изображения (без самих данных)."""
     id: int
     pereval_id: int
+    size: int
+    mime_type: str
 
     class Config:
         from_attributes = True
+
+
+class ImageResponse(ImageSummaryResponse):
+    """Схема для ответа с данными изображения."""
+    data: str  # Base64 данные
@@ -0,0 +1,54 @@
+"""
+Pydantic схемы для модерации перевалов.
+"""
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from datetime import datetime
+from models.pereval import PerevalStatus
+from repository.moderation import MAX_CLAIM_BATCH
+from .pereval import PerevalListItem
+
+
+class ClaimRequest(BaseModel):
+    """Запрос на захват пачки перевалов из очереди."""
+    moderator: str = Field(..., min_length=1)
+    limit: int = Field(10, ge=1, le=MAX_CLAIM_BATCH)
+
+
+class ClaimResponse(BaseModel):
+    """Захваченные перевалы и время истечения захвата."""
+    claimed: List[PerevalListItem]
+    expires_at: datetime
+
+
+class DecisionRequest(BaseModel):
+    """Решение модератора по захваченному перевалу."""
+    moderator: str = Field(..., min_length=1)
+    status: Literal["accepted", "rejected"]
+    comment: Optional[str] = None
+
+
+class ReleaseRequest(BaseModel):
+    """Возврат захваченного перевала в очередь."""
+    moderator: str = Field(..., min_length=1)
+    comment: Optional[str] = None
+
+
+class ReleaseExpiredResponse(BaseModel):
+    """Сколько перевалов с истекшим захватом возвращено в очередь."""
+    released: int
+
+
+class ModerationAuditResponse(BaseModel):
+    """Запись журнала модерации."""
+    id: int
+    pereval_id: int
+    moderator: str
+    action: str
+    from_status: PerevalStatus
+    to_status: PerevalStatus
+    comment: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
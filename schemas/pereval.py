@@ -2,12 +2,16 @@
 Pydantic схемы для перевала.
 """
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Literal, Optional, Union
 from datetime import datetime
 from .user import UserCreate, UserResponse
 from .coords import CoordsCreate, CoordsResponse
-from .level import LevelCreate, LevelResponse
-from .image import ImageCreate, ImageResponse
+from .level import LevelBase, LevelCreate, LevelResponse
+from .image import ImageCreate, ImageResponse, ImageSummaryResponse
+from models.pereval import PerevalStatus
+
+# Сезоны, для которых указывается уровень сложности
+Season = Literal["winter", "summer", "autumn", "spring"]
 
 
 class PerevalBase(BaseModel):
@@ -62,17 +66,113 @@ class PerevalDetailResponse(BaseModel):
     user: UserResponse
     coords: CoordsResponse
     level: LevelResponse
-    images: List[ImageResponse]
+    images: List[Union[ImageResponse, ImageSummaryResponse]]  # данные - только по include=images.data
     
     class Config:
         from_attributes = True
 
+class PerevalFilters(BaseModel):
+    """Фильтры списка перевалов."""
+    status: Optional[PerevalStatus] = None
+    season: Optional[Season] = None
+    min_level: Optional[str] = None
+    added_from: Optional[datetime] = None
+    added_to: Optional[datetime] = None
+    user_email: Optional[str] = None
+
+class PerevalListItem(BaseModel):
+    """Краткая схема перевала для списков (очередь модерации и т.п.)."""
+    id: int
+    beauty_title: str
+    title: str
+    status: str
+    add_time: datetime
+    user_email: str
+    level: LevelBase
+
+    @classmethod
+    def from_row(cls, row: dict) -> "PerevalListItem":
+        """Схема из строки запроса PerevalRepository._list_items_query."""
+        return cls(
+            id=row["id"],
+            beauty_title=row["beauty_title"],
+            title=row["title"],
+            status=row["status"].value,
+            add_time=row["add_time"],
+            user_email=row["user_email"],
+            level=LevelBase(winter=row["winter"], summer=row["summer"], autumn=row["autumn"], spring=row["spring"])
+        )
+
+class PerevalMapItem(BaseModel):
+    """Компактная схема перевала для маркера на карте."""
+    id: int
+    beauty_title: str
+    title: str
+    status: str
+    latitude: float
+    longitude: float
+    height: float
+
+class PerevalNearbyItem(PerevalMapItem):
+    """Перевал рядом с точкой с расстоянием до нее."""
+    distance_km: float
+
+class PerevalSyncItem(BaseModel):
+    """Компактная схема перевала для синхронизации мобильного клиента (без изображений)."""
+    id: int
+    beauty_title: str
+    title: str
+    other_titles: Optional[str] = None
+    connect: Optional[str] = None
+    add_time: datetime
+    status: str
+    version: int
+    updated_at: datetime
+    latitude: float
+    longitude: float
+    height: float
+    level: LevelBase
+
+class SyncResponse(BaseModel):
+    """Изменения перевалов после курсора синхронизации."""
+    items: List[PerevalSyncItem]
+    cursor: str  # since для следующего запроса
+    has_more: bool  # изменения получены не все, нужно запросить еще
+
+class PerevalCluster(BaseModel):
+    """Кластер перевалов в ячейке тайла карты."""
+    count: int
+    latitude: float
+    longitude: float
+    max_difficulty: Optional[str] = None
+
+class PerevalClusterTile(BaseModel):
+    """Кластеры перевалов одного тайла карты."""
+    z: int
+    x: int
+    y: int
+    count: int
+    clusters: List[PerevalCluster]
+
 class SubmitDataResponse(BaseModel):
     """Схема ответа API для submitData."""
     status: int
     message: Optional[str] = None
     id: Optional[int] = None
 
+class BatchItemResult(BaseModel):
+    """Результат обработки одного перевала из пакета."""
+    index: int
+    status: int
+    message: Optional[str] = None
+    id: Optional[int] = None
+
+class BatchSubmitResponse(BaseModel):
+    """Схема ответа API для пакетной загрузки submitData/batch."""
+    status: int
+    message: Optional[str] = None
+    results: List[BatchItemResult]
+
 class UpdateResponse(BaseModel):
     """Схема ответа для обновления."""
     state: int
@@ -0,0 +1,77 @@
+"""
+Кластеризация перевалов по тайлам карты и кэш готовых тайлов.
+
+Тайлы адресуются как в веб-картах (z/x/y, проекция Web Mercator).
+Каждый тайл делится на сетку CLUSTER_GRID_SIZE x CLUSTER_GRID_SIZE ячеек,
+и перевалы одной ячейки сворачиваются в один кластер, поэтому размер
+ответа не зависит от числа перевалов. Готовые тайлы хранятся в LRU-кэше
+процесса; после коммита изменения сбрасываются тайлы всех масштабов,
+содержащие старые и новые координаты перевала. Изменения, сделанные
+другими процессами, перестают быть видны по истечении TTL.
+"""
+import math
+import os
+from typing import List, Tuple
+from repository.changes import PerevalChange, add_change_listener
+from services.lru import LRUCache
+
+# Максимальный масштаб, для которого отдаются кластеры
+MAX_CLUSTER_ZOOM = 16
+
+# Число ячеек кластеризации по каждой стороне тайла
+CLUSTER_GRID_SIZE = 8
+
+CLUSTER_CACHE_TILES = int(os.getenv("FSTR_CLUSTER_CACHE_TILES", "4096"))
+CLUSTER_CACHE_TTL = float(os.getenv("FSTR_CLUSTER_CACHE_TTL", "300"))
+
+# Широта, на которой обрезается проекция Web Mercator
+MAX_MERCATOR_LATITUDE = 85.0511287798
+
+TileKey = Tuple[int, int, int]
+
+
+def _tile_latitude(y: int, tiles: int) -> float:
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / tiles))))
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """Границы тайла: (min_lat, min_lon, max_lat, max_lon)."""
+    tiles = 2 ** z
+    return (
+        _tile_latitude(y + 1, tiles),
+        x / tiles * 360 - 180,
+        _tile_latitude(y, tiles),
+        (x + 1) / tiles * 360 - 180,
+    )
+
+
+def tile_for_point(lat: float, lon: float, z: int) -> TileKey:
+    """Тайл масштаба z, содержащий точку."""
+    tiles = 2 ** z
+    lat = max(-MAX_MERCATOR_LATITUDE, min(MAX_MERCATOR_LATITUDE, lat))
+    x = int((lon + 180) / 360 * tiles)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * tiles)
+    return z, min(max(x, 0), tiles - 1), min(max(y, 0), tiles - 1)
+
+
+# Кэш кластеров этого процесса
+cluster_tile_cache = LRUCache(CLUSTER_CACHE_TILES, CLUSTER_CACHE_TTL)
+
+
+def _affected_tiles(changes: List[PerevalChange]) -> set:
+    tiles = set()
+    for change in changes:
+        for point in (change.coords, change.old_coords):
+            if point is not None:
+                tiles.update(tile_for_point(*point, z) for z in range(MAX_CLUSTER_ZOOM + 1))
+    return tiles
+
+
+def _invalidate_cluster_tiles(changes: List[PerevalChange]) -> None:
+    """Сбрасывает тайлы с измененными перевалами после коммита."""
+    tiles = _affected_tiles(changes)
+    if tiles:
+        cluster_tile_cache.invalidate(tiles)
+
+
+add_change_listener(_invalidate_cluster_tiles)
@@ -0,0 +1,39 @@
+"""
+Категории трудности перевалов и их упорядочивание.
+
+В поле уровня сложности участники пишут категорию по-разному
+(кириллицей или латиницей, в разном регистре), поэтому все варианты
+написания сводятся к рангу: 0 - категория не указана, 1 - н/к и т.д.
+"""
+from typing import Dict, Optional
+
+# Категории трудности по возрастанию
+DIFFICULTY_CATEGORIES = ("н/к", "1А", "1Б", "2А", "2Б", "3А", "3Б")
+
+
+def _spellings(category: str) -> set:
+    latin = category.replace("А", "A").replace("Б", "B")
+    variants = {category, latin}
+    if category == "н/к":
+        variants |= {"нк", "н.к.", "н/к."}
+    return variants | {variant.lower() for variant in variants} | {variant.upper() for variant in variants}
+
+
+# Вариант написания -> ранг категории
+DIFFICULTY_RANKS: Dict[str, int] = {
+    spelling: rank
+    for rank, category in enumerate(DIFFICULTY_CATEGORIES, start=1)
+    for spelling in _spellings(category)
+}
+
+
+def difficulty_rank(value: Optional[str]) -> int:
+    """Ранг категории трудности (0, если категория не указана или не распознана)."""
+    if not value:
+        return 0
+    return DIFFICULTY_RANKS.get(value.strip(), 0)
+
+
+def difficulty_category(rank: int) -> Optional[str]:
+    """Каноническое написание категории по рангу."""
+    return DIFFICULTY_CATEGORIES[rank - 1] if rank > 0 else None
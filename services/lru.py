@@ -0,0 +1,59 @@
+"""
+LRU-кэш процесса с ограничением по времени жизни записей.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, Optional, Tuple
+
+
+class LRUCache:
+    """
+    LRU-кэш с ограничением числа записей и времени их жизни.
+
+    Значение, вычисленное до сброса кэша, не сохраняется: put() принимает
+    номер поколения, полученный до чтения из базы, и игнорирует запись,
+    если между чтением и put() произошла инвалидация.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any, generation: int) -> None:
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, keys: Iterable[Hashable]) -> None:
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
@@ -0,0 +1,243 @@
+"""
+Метрики в формате Prometheus.
+
+Счетчики и гистограммы живут в памяти воркера и обновляются без
+блокировок: большая часть обновлений идет из цикла событий, а редкая
+потеря инкремента при гонке потоков допустима (как в database/pool_stats.py).
+Значения, которые уже считаются в других местах (пулы соединений, кэши),
+снимаются сборщиками (add_collector) в момент выгрузки.
+
+Несколько воркеров uvicorn: если задан FSTR_METRICS_DIR, каждый воркер
+раз в FSTR_METRICS_FLUSH_SECONDS записывает снимок своих метрик в файл
+<pid>.json, а /metrics суммирует снимки всех воркеров. Счетчики завершившихся
+воркеров продолжают учитываться, их gauge - нет. Каталог нужно очищать
+при перезапуске сервиса.
+"""
+import asyncio
+import json
+import os
+import tempfile
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+METRICS_DIR = os.getenv("FSTR_METRICS_DIR") or None
+METRICS_FLUSH_SECONDS = float(os.getenv("FSTR_METRICS_FLUSH_SECONDS", "5"))
+
+# Границы корзин гистограммы длительности запросов, секунды
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+# Описания метрик: имя -> (тип, описание)
+METRICS: Dict[str, Tuple[str, str]] = {
+    "fstr_http_request_duration_seconds": (HISTOGRAM, "Длительность HTTP-запросов по маршрутам"),
+    "fstr_perevals_created_total": (COUNTER, "Созданные перевалы по статусу"),
+    "fstr_perevals_updated_total": (COUNTER, "Изменения перевалов по статусу после изменения"),
+    "fstr_image_bytes_ingested_total": (COUNTER, "Байты изображений, полученные от клиентов"),
+    "fstr_image_bytes_served_total": (COUNTER, "Байты изображений, отданные клиентам"),
+    "fstr_db_pool_checked_out": (GAUGE, "Занятые соединения пула"),
+    "fstr_db_pool_capacity": (GAUGE, "Максимум соединений пула (размер и переполнение)"),
+    "fstr_db_pool_utilization": (GAUGE, "Доля занятых соединений пула"),
+    "fstr_db_pool_checkouts_total": (COUNTER, "Выдачи соединений из пула"),
+    "fstr_db_pool_timeouts_total": (COUNTER, "Таймауты ожидания соединения из пула"),
+    "fstr_cache_hits_total": (COUNTER, "Попадания в кэш"),
+    "fstr_cache_misses_total": (COUNTER, "Промахи кэша"),
+    "fstr_cache_hit_ratio": (GAUGE, "Доля попаданий в кэш"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+# Сэмпл сборщика: (имя метрики, метки, значение)
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (счетчики не накопительные)."""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(DURATION_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(DURATION_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Метрики текущего воркера."""
+
+    def __init__(self):
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        series = self.counters.setdefault(name, {})
+        key = tuple(labels.items())
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        series = self.histograms.setdefault(name, {})
+        key = tuple(labels.items())
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        histogram.observe(value)
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """Функция, возвращающая сэмплы (имя, метки, значение) в момент выгрузки."""
+        self.collectors.append(collector)
+
+    def snapshot(self) -> dict:
+        """Снимок метрик воркера в виде, пригодном для JSON."""
+        counters = []
+        gauges = []
+        for name, series in list(self.counters.items()):
+            counters.extend([name, dict(labels), value] for labels, value in list(series.items()))
+        for collector in self.collectors:
+            for name, labels, value in collector():
+                (counters if METRICS[name][0] == COUNTER else gauges).append([name, labels, value])
+        histograms = [
+            [name, dict(labels), list(histogram.counts), histogram.sum, histogram.count]
+            for name, series in list(self.histograms.items())
+            for labels, histogram in list(series.items())
+        ]
+        return {"pid": os.getpid(), "counters": counters, "gauges": gauges, "histograms": histograms}
+
+
+registry = MetricsRegistry()
+
+
+def inc(name: str, value: float = 1, **labels: str) -> None:
+    """Увеличивает счетчик метрик текущего воркера."""
+    registry.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    """Добавляет значение в гистограмму текущего воркера."""
+    registry.observe(name, value, **labels)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def write_snapshot(metrics_dir: str) -> None:
+    """Записывает снимок метрик воркера в <pid>.json (атомарно, через переименование)."""
+    snapshot = registry.snapshot()
+    descriptor, temp_path = tempfile.mkstemp(dir=metrics_dir, suffix=".tmp")
+    with os.fdopen(descriptor, "w") as output:
+        json.dump(snapshot, output)
+    os.replace(temp_path, os.path.join(metrics_dir, f"{snapshot['pid']}.json"))
+
+
+def read_snapshots(metrics_dir: Optional[str]) -> List[dict]:
+    """Снимки всех воркеров; для текущего - свежий, а не из файла."""
+    snapshots = [registry.snapshot()]
+    if not metrics_dir:
+        return snapshots
+    for file_name in os.listdir(metrics_dir):
+        if not file_name.endswith(".json") or file_name == f"{os.getpid()}.json":
+            continue
+        try:
+            with open(os.path.join(metrics_dir, file_name)) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except (OSError, ValueError):
+            continue
+        if not _pid_alive(snapshot["pid"]):
+            snapshot["gauges"] = []
+        snapshots.append(snapshot)
+    return snapshots
+
+
+def _merge(snapshots: List[dict]):
+    counters: Dict[str, Dict[Labels, float]] = {}
+    gauges: Dict[str, Dict[Labels, float]] = {}
+    histograms: Dict[str, Dict[Labels, list]] = {}
+    for snapshot in snapshots:
+        for kind, target in (("counters", counters), ("gauges", gauges)):
+            for name, labels, value in snapshot[kind]:
+                series = target.setdefault(name, {})
+                key = tuple(sorted(labels.items()))
+                series[key] = series.get(key, 0) + value
+        for name, labels, counts, total, count in snapshot["histograms"]:
+            series = histograms.setdefault(name, {})
+            key = tuple(sorted(labels.items()))
+            merged = series.setdefault(key, [[0] * len(counts), 0.0, 0])
+            merged[0] = [left + right for left, right in zip(merged[0], counts)]
+            merged[1] += total
+            merged[2] += count
+    return counters, gauges, histograms
+
+
+def _ratio(numerator: Dict[Labels, float], denominator: Dict[Labels, float]) -> Dict[Labels, float]:
+    return {labels: round(numerator.get(labels, 0) / total, 6) for labels, total in denominator.items() if total}
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(metrics_dir: Optional[str] = None) -> str:
+    """Метрики всех воркеров в текстовом формате Prometheus."""
+    counters, gauges, histograms = _merge(read_snapshots(metrics_dir))
+
+    # Производные метрики считаются после суммирования по воркерам
+    gauges["fstr_db_pool_utilization"] = _ratio(
+        gauges.get("fstr_db_pool_checked_out", {}), gauges.get("fstr_db_pool_capacity", {})
+    )
+    hits = counters.get("fstr_cache_hits_total", {})
+    lookups = {
+        labels: hits.get(labels, 0) + misses
+        for labels, misses in counters.get("fstr_cache_misses_total", {}).items()
+    }
+    gauges["fstr_cache_hit_ratio"] = _ratio(hits, lookups)
+
+    lines = []
+    for name, (kind, description) in METRICS.items():
+        series = (counters if kind == COUNTER else gauges if kind == GAUGE else histograms).get(name)
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(series.items()):
+            if kind != HISTOGRAM:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(DURATION_BUCKETS + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+async def flush_periodically(metrics_dir: str, interval: float = METRICS_FLUSH_SECONDS) -> None:
+    """Фоновая задача воркера: регулярно записывает снимок его метрик."""
+    while True:
+        await asyncio.sleep(interval)
+        write_snapshot(metrics_dir)
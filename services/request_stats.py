@@ -0,0 +1,227 @@
+"""
+SQL-статистика запросов: число выражений, время в базе и число строк
+на каждый HTTP-запрос, заголовок Server-Timing, структурированный лог
+и журнал медленных запросов.
+
+Хуки движка (instrument_engine) пишут в RequestStats текущего запроса
+через contextvar: он доступен и в greenlet'ах run_sync асинхронной сессии,
+и в пуле потоков (run_in_threadpool копирует контекст). Счетчики без
+блокировок, как в database/pool_stats.py.
+
+Строки считаются так: для INSERT/UPDATE/DELETE - rowcount курсора, для
+SELECT через сессию ORM - полученные строки (хук do_orm_execute), так как
+события курсора выборку не видят, а rowcount для SELECT равен -1.
+"""
+import json
+import logging
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import ORMExecuteState, Session
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from services import metrics
+
+logger = logging.getLogger("fstr.requests")
+
+# Запросы и SQL-выражения дольше порога попадают в журнал медленных
+SLOW_REQUEST_MS = float(os.getenv("FSTR_SLOW_REQUEST_MS", "500"))
+SLOW_QUERY_MS = float(os.getenv("FSTR_SLOW_QUERY_MS", "100"))
+# Сколько последних медленных запросов и выражений хранить
+SLOW_LOG_SIZE = int(os.getenv("FSTR_SLOW_LOG_SIZE", "100"))
+
+# Максимальная длина SQL в журнале
+MAX_SQL_LENGTH = 1000
+
+
+class RequestStats:
+    """SQL-статистика одного HTTP-запроса."""
+
+    __slots__ = ("statements", "db_time", "rows", "slowest_sql", "slowest_time")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.slowest_sql: Optional[str] = None
+        self.slowest_time = 0.0
+
+    def add(self, statement: str, elapsed: float, rows: int = 0) -> None:
+        self.statements += 1
+        self.db_time += elapsed
+        self.rows += rows
+        if elapsed > self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_sql = statement
+
+    def server_timing(self, total: float) -> str:
+        """Значение заголовка Server-Timing."""
+        return (
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.statements} statements, {self.rows} rows", '
+            f"total;dur={total * 1000:.2f}"
+        )
+
+
+_current_stats: ContextVar[Optional[RequestStats]] = ContextVar("fstr_request_stats", default=None)
+
+
+class SlowLog:
+    """Последние медленные HTTP-запросы и SQL-выражения текущего воркера."""
+
+    def __init__(self, size: int, request_threshold_ms: float, query_threshold_ms: float):
+        self.request_threshold_ms = request_threshold_ms
+        self.query_threshold_ms = query_threshold_ms
+        self.requests: Deque[dict] = deque(maxlen=size)
+        self.queries: Deque[dict] = deque(maxlen=size)
+
+    def add_request(self, entry: dict) -> None:
+        if entry["duration_ms"] >= self.request_threshold_ms:
+            self.requests.append(entry)
+
+    def add_query(self, statement: str, elapsed_ms: float, path: Optional[str]) -> None:
+        if elapsed_ms >= self.query_threshold_ms:
+            self.queries.append({
+                "time": datetime.utcnow().isoformat(),
+                "path": path,
+                "duration_ms": round(elapsed_ms, 2),
+                "sql": statement[:MAX_SQL_LENGTH],
+            })
+
+    def snapshot(self, limit: Optional[int] = None) -> Dict[str, object]:
+        """Записи журнала, самые медленные первыми."""
+        def slowest(entries) -> List[dict]:
+            return sorted(entries, key=lambda entry: entry["duration_ms"], reverse=True)[:limit]
+
+        return {
+            "request_threshold_ms": self.request_threshold_ms,
+            "query_threshold_ms": self.query_threshold_ms,
+            "requests": slowest(self.requests),
+            "queries": slowest(self.queries),
+        }
+
+
+slow_log = SlowLog(SLOW_LOG_SIZE, SLOW_REQUEST_MS, SLOW_QUERY_MS)
+
+# Путь текущего запроса для журнала медленных SQL-выражений
+_current_path: ContextVar[Optional[str]] = ContextVar("fstr_request_path", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Время начала хранится в контексте выполнения: он живет одно выражение,
+    # и выражение, завершившееся ошибкой, ничего не оставляет на соединении
+    if context is not None:
+        context._fstr_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_fstr_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats = _current_stats.get()
+    if stats is not None:
+        # Для SELECT rowcount не определен, такие строки считает _count_fetched_rows
+        dml = context.isinsert or context.isupdate or context.isdelete
+        stats.add(statement, elapsed, max(cursor.rowcount, 0) if dml and cursor is not None else 0)
+    slow_log.add_query(statement, elapsed * 1000, _current_path.get())
+
+
+def _count_fetched_rows(orm_execute_state: ORMExecuteState):
+    """Считает строки, полученные SELECT через сессию (результат буферизуется)."""
+    stats = _current_stats.get()
+    if stats is None or not orm_execute_state.is_select:
+        return None
+    options = orm_execute_state.execution_options
+    if options.get("yield_per") or options.get("stream_results"):
+        # Потоковую выборку не буферизуем
+        return None
+    frozen = orm_execute_state.invoke_statement().freeze()
+    stats.rows += len(frozen.data)
+    return frozen()
+
+
+event.listen(Session, "do_orm_execute", _count_fetched_rows)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Подключает подсчет SQL-выражений к движку (для асинхронного - к engine.sync_engine)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def route_path(scope: Scope) -> str:
+    """Шаблон маршрута запроса (/api/submitData/{pereval_id}) или путь, если маршрут не найден."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope["path"]
+
+
+class RequestStatsMiddleware:
+    """
+    ASGI middleware: собирает SQL-статистику запроса, добавляет заголовок
+    Server-Timing и пишет строку лога в JSON.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        stats_token = _current_stats.set(stats)
+        path_token = _current_path.set(scope["path"])
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append(
+                    "Server-Timing", stats.server_timing(time.perf_counter() - started)
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_stats.reset(stats_token)
+            _current_path.reset(path_token)
+            self._log(scope, status_code, time.perf_counter() - started, stats)
+
+    @staticmethod
+    def _log(scope: Scope, status_code: int, elapsed: float, stats: RequestStats) -> None:
+        entry = {
+            "time": datetime.utcnow().isoformat(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route_path(scope),
+            "status": status_code,
+            "duration_ms": round(elapsed * 1000, 2),
+            "db_time_ms": round(stats.db_time * 1000, 2),
+            "statements": stats.statements,
+            "rows": stats.rows,
+        }
+        if stats.slowest_sql is not None:
+            entry["slowest_query"] = {
+                "duration_ms": round(stats.slowest_time * 1000, 2),
+                "sql": stats.slowest_sql[:MAX_SQL_LENGTH],
+            }
+        slow_log.add_request(entry)
+        # Для метрик - только шаблоны маршрутов, чтобы число рядов не зависело от URL
+        route = getattr(scope.get("route"), "path", None) or "unmatched"
+        metrics.observe(
+            "fstr_http_request_duration_seconds", elapsed,
+            method=scope["method"], route=route, status=str(status_code)
+        )
+        level = logging.WARNING if entry["duration_ms"] >= slow_log.request_threshold_ms else logging.INFO
+        if logger.isEnabledFor(level):
+            logger.log(level, json.dumps(entry, ensure_ascii=False))
@@ -0,0 +1,293 @@
+"""
+Кэш сериализованных ответов API.
+
+Хранит готовые JSON-байты ответов вместе с заголовками (ETag и т.п.), поэтому повторный запрос не обращается
+ни к базе данных, ни к Pydantic. Записи сбрасываются после коммита
+изменений перевала (repository.changes, асинхронный подписчик).
+
+Методы кэша - корутины: бэкенд redis работает через redis.asyncio
+и не блокирует цикл событий сетевыми запросами.
+
+Бэкенд выбирается через FSTR_RESPONSE_CACHE_BACKEND:
+memory (по умолчанию) - LRU-кэш в памяти процесса, ограниченный числом
+записей и суммарным размером; redis - общий для всех воркеров кэш
+в Redis-совместимом сервере (нужен пакет redis); none - кэш отключен.
+
+Кэш в памяти у каждого процесса свой: при запуске uvicorn с несколькими
+воркерами редактирование или модерация перевала сбрасывает запись только
+в том воркере, который обработал изменение, а остальные отдают прежний
+ответ до истечения FSTR_RESPONSE_CACHE_TTL. Для нескольких воркеров
+нужен бэкенд redis.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from repository.changes import PerevalChange, add_async_change_listener
+import logging
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_BACKEND = os.getenv("FSTR_RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_TTL = int(os.getenv("FSTR_RESPONSE_CACHE_TTL", "60"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("FSTR_RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("FSTR_RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+REDIS_URL = os.getenv("FSTR_REDIS_URL", "redis://localhost:6379/0")
+
+
+class CachedResponse(NamedTuple):
+    """Тело ответа и его заголовки."""
+    body: bytes
+    headers: Dict[str, str]
+
+
+def pereval_detail_key(pereval_id: int) -> str:
+    """Ключ кэша ответа GET /submitData/{id} (без данных изображений)."""
+    return f"pereval:{pereval_id}:detail"
+
+
+class ResponseCache:
+    """
+    Базовый класс кэша ответов.
+
+    Чтобы ответ, прочитанный из базы до инвалидации, не попал в кэш после
+    нее, вызывающий берет token() до чтения из базы и передает его в set().
+    """
+
+    backend = "none"
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    async def token(self) -> int:
+        """Отметка времени для последующего set()."""
+        return 0
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: CachedResponse, token: int) -> None:
+        pass
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        pass
+
+    def stats(self) -> dict:
+        """Счетчики попаданий и промахов."""
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+        }
+
+
+class MemoryResponseCache(ResponseCache):
+    """
+    LRU-кэш в памяти процесса с TTL и ограничениями по числу записей и байтам.
+    Изменения, сделанные другими воркерами, видны только после истечения TTL.
+    """
+
+    backend = "memory"
+
+    # Сколько последних инвалидаций помнить для проверки token
+    MAX_TOMBSTONES = 10000
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, CachedResponse]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._generation = 0
+        # Поколение последней инвалидации каждого ключа
+        self._tombstones: "OrderedDict[str, int]" = OrderedDict()
+        # Старше этого поколения отметки о ключах уже забыты
+        self._forgotten_generation = 0
+        self.evictions = 0
+
+    async def token(self) -> int:
+        return self._generation
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def _pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1].body)
+
+    async def set(self, key: str, value: CachedResponse, token: int) -> None:
+        if len(value.body) > self.max_bytes:
+            return
+        with self._lock:
+            if token < self._forgotten_generation or token < self._tombstones.get(key, 0):
+                return
+            self._pop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._bytes += len(value.body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+                self.evictions += 1
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._pop(key)
+                self._tombstones[key] = self._generation
+                self._tombstones.move_to_end(key)
+            while len(self._tombstones) > self.MAX_TOMBSTONES:
+                _, generation = self._tombstones.popitem(last=False)
+                self._forgotten_generation = max(self._forgotten_generation, generation)
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+class RedisResponseCache(ResponseCache):
+    """
+    Кэш в Redis-совместимом сервере, общий для всех воркеров.
+
+    Защита от записи устаревшего ответа та же, что в кэше в памяти:
+    delete() увеличивает общий счетчик поколений (INCR) и оставляет
+    для каждого ключа отметку с номером поколения, а set() в одном
+    Lua-скрипте сравнивает token с отметкой и не пишет ответ, прочитанный
+    до инвалидации. Отметка живет TTL, как и сама запись.
+
+    Подходит любой асинхронный клиент с методами get и eval, например
+    redis.asyncio.Redis или его локальная замена в тестах. Ошибки сервера
+    не ломают запрос: кэш просто пропускается.
+    """
+
+    backend = "redis"
+
+    SET_SCRIPT = """
+local tombstone = tonumber(redis.call('GET', KEYS[2]) or '0')
+if tonumber(ARGV[1]) < tombstone then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+    # KEYS[1] - счетчик поколений, дальше пары (запись, отметка)
+    DELETE_SCRIPT = """
+local generation = redis.call('INCR', KEYS[1])
+for i = 2, #KEYS, 2 do
+    redis.call('DEL', KEYS[i])
+    redis.call('SET', KEYS[i + 1], generation, 'EX', ARGV[1])
+end
+return generation
+"""
+
+    def __init__(self, client, ttl: int, prefix: str = "fstr:"):
+        super().__init__()
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.generation_key = prefix + "generation"
+
+    def _tombstone_key(self, key: str) -> str:
+        return self.prefix + "tombstone:" + key
+
+    async def token(self) -> int:
+        try:
+            return int(await self.client.get(self.generation_key) or 0)
+        except Exception as e:
+            # Без поколения set() не сможет проверить отметки, поэтому запись пропускается
+            logger.error(f"Ошибка чтения поколения кэша ответов: {str(e)}")
+            return -1
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        try:
+            value = await self.client.get(self.prefix + key)
+        except Exception as e:
+            # Недоступный кэш не должен ломать чтение из базы
+            logger.error(f"Ошибка чтения из кэша ответов: {str(e)}")
+            value = None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Первая строка - заголовки в JSON, дальше - тело ответа
+        headers, _, body = value.partition(b"\n")
+        return CachedResponse(body, json.loads(headers))
+
+    async def set(self, key: str, value: CachedResponse, token: int) -> None:
+        if token < 0:
+            return
+        packed = json.dumps(value.headers).encode() + b"\n" + value.body
+        try:
+            await self.client.eval(
+                self.SET_SCRIPT, 2, self.prefix + key, self._tombstone_key(key), token, packed, self.ttl
+            )
+        except Exception as e:
+            logger.error(f"Ошибка записи в кэш ответов: {str(e)}")
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        redis_keys = [self.generation_key]
+        for key in keys:
+            redis_keys += [self.prefix + key, self._tombstone_key(key)]
+        if len(redis_keys) == 1:
+            return
+        try:
+            await self.client.eval(self.DELETE_SCRIPT, len(redis_keys), *redis_keys, self.ttl)
+        except Exception as e:
+            # Изменение уже закоммичено; запись устареет не позже чем через TTL
+            logger.error(f"Ошибка инвалидации кэша ответов: {str(e)}")
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Кэш ответов приложения, настроенный через FSTR_RESPONSE_CACHE_*.
+    Используется как dependency в FastAPI.
+    """
+    global _response_cache
+    if _response_cache is None:
+        if RESPONSE_CACHE_BACKEND == "redis":
+            import redis.asyncio
+
+            _response_cache = RedisResponseCache(redis.asyncio.Redis.from_url(REDIS_URL), RESPONSE_CACHE_TTL)
+        elif RESPONSE_CACHE_BACKEND == "none":
+            _response_cache = ResponseCache()
+        else:
+            _response_cache = MemoryResponseCache(
+                RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL
+            )
+    return _response_cache
+
+
+async def _invalidate_pereval_responses(changes: List[PerevalChange]) -> None:
+    """Сбрасывает закэшированные ответы измененных перевалов после коммита."""
+    await get_response_cache().delete({pereval_detail_key(change.pereval_id) for change in changes})
+
+
+add_async_change_listener(_invalidate_pereval_responses)
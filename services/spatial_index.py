@@ -0,0 +1,150 @@
+"""
+Внутрипроцессный пространственный индекс перевалов для поиска ближайших.
+
+Точки раскладываются по сетке ячеек фиксированного размера в градусах.
+Запрос собирает кандидатов из ячеек, покрывающих круг поиска, и ранжирует
+их векторизованной формулой гаверсинусов (NumPy), так что время ответа
+зависит от плотности точек рядом с запросом, а не от размера индекса.
+"""
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Set, Tuple
+import numpy as np
+from repository.changes import PerevalChange, add_change_listener
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1: float, lon1: float, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    """Расстояние по большому кругу в километрах (все углы - в радианах)."""
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class SpatialIndex:
+    """Сеточный индекс точек (id, широта, долгота) с поиском k ближайших в радиусе."""
+
+    def __init__(self, cell_size: float = 0.1):
+        self.cell_size = cell_size
+        self._lon_cells = math.ceil(360 / cell_size)
+        self._lock = threading.Lock()
+        self._ids = np.empty(1024, dtype=np.int64)
+        self._lat = np.empty(1024, dtype=np.float64)
+        self._lon = np.empty(1024, dtype=np.float64)
+        self._count = 0
+        self._row_by_id: Dict[int, int] = {}
+        self._cell_by_row: List[Tuple[int, int]] = []
+        self._cells: Dict[Tuple[int, int], Set[int]] = {}
+        self.loaded = False
+        self.change_seq = 0
+        self.refreshed_at = 0.0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (
+            math.floor((lat + 90) / self.cell_size),
+            math.floor((lon + 180) / self.cell_size) % self._lon_cells,
+        )
+
+    def _grow(self) -> None:
+        capacity = len(self._ids) * 2
+        for name in ("_ids", "_lat", "_lon"):
+            array = getattr(self, name)
+            grown = np.empty(capacity, dtype=array.dtype)
+            grown[:self._count] = array[:self._count]
+            setattr(self, name, grown)
+
+    def _upsert(self, point_id: int, lat: float, lon: float) -> None:
+        row = self._row_by_id.get(point_id)
+        if row is None:
+            if self._count == len(self._ids):
+                self._grow()
+            row = self._count
+            self._count += 1
+            self._ids[row] = point_id
+            self._row_by_id[point_id] = row
+            self._cell_by_row.append(None)
+        else:
+            self._cells[self._cell_by_row[row]].discard(row)
+        self._lat[row] = math.radians(lat)
+        self._lon[row] = math.radians(lon)
+        cell = self._cell(lat, lon)
+        self._cells.setdefault(cell, set()).add(row)
+        self._cell_by_row[row] = cell
+
+    def upsert_many(self, points: Iterable[Tuple[int, float, float]]) -> None:
+        """Добавляет точки или переносит существующие на новые координаты."""
+        with self._lock:
+            for point_id, lat, lon in points:
+                self._upsert(point_id, lat, lon)
+
+    def mark_refreshed(self, change_seq: int = 0) -> None:
+        """Отмечает, что индекс синхронизирован с базой данных до номера изменения change_seq."""
+        self.loaded = True
+        self.change_seq = max(self.change_seq, change_seq)
+        self.refreshed_at = time.monotonic()
+
+    def needs_refresh(self, interval: float) -> bool:
+        """Нужно ли догрузить точки из базы (первая загрузка или истек интервал)."""
+        return not self.loaded or time.monotonic() - self.refreshed_at > interval
+
+    def _candidate_rows(self, lat: float, lon: float, radius_km: float) -> List[int]:
+        dlat = radius_km / KM_PER_DEGREE
+        lat_low, lat_high = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+        lat_cells = range(self._cell(lat_low, 0)[0], self._cell(lat_high, 0)[0] + 1)
+
+        widest = math.cos(math.radians(max(abs(lat_low), abs(lat_high))))
+        dlon = 180.0 if widest < 1e-9 else radius_km / (KM_PER_DEGREE * widest)
+        rows: List[int] = []
+        if dlon >= 180.0 or 2 * dlon / self.cell_size >= self._lon_cells:
+            # Круг захватывает все долготы (рядом с полюсом)
+            for (lat_cell, _), cell_rows in self._cells.items():
+                if lat_cell in lat_cells:
+                    rows.extend(cell_rows)
+            return rows
+
+        lon_low = math.floor((lon - dlon + 180) / self.cell_size)
+        lon_high = math.floor((lon + dlon + 180) / self.cell_size)
+        for lat_cell in lat_cells:
+            for lon_cell in range(lon_low, lon_high + 1):
+                cell_rows = self._cells.get((lat_cell, lon_cell % self._lon_cells))
+                if cell_rows:
+                    rows.extend(cell_rows)
+        return rows
+
+    def nearest(self, lat: float, lon: float, radius_km: float, k: int) -> List[Tuple[int, float]]:
+        """До k ближайших точек в радиусе radius_km: [(id, расстояние_км)] по возрастанию."""
+        with self._lock:
+            rows = self._candidate_rows(lat, lon, radius_km)
+            if not rows:
+                return []
+            rows = np.fromiter(rows, dtype=np.int64, count=len(rows))
+            distances = haversine_km(math.radians(lat), math.radians(lon), self._lat[rows], self._lon[rows])
+            inside = distances <= radius_km
+            rows, distances = rows[inside], distances[inside]
+            if len(rows) > k:
+                closest = np.argpartition(distances, k - 1)[:k]
+                rows, distances = rows[closest], distances[closest]
+            order = np.argsort(distances, kind="stable")
+            return [(int(self._ids[row]), float(distance)) for row, distance in zip(rows[order], distances[order])]
+
+
+# Индекс перевалов этого процесса
+pereval_spatial_index = SpatialIndex()
+
+
+def _apply_pereval_changes(changes: List[PerevalChange]) -> None:
+    """Переносит в индекс новые координаты перевалов после коммита."""
+    # До первой загрузки из базы изменения не нужны: загрузка их увидит
+    if not pereval_spatial_index.loaded:
+        return
+    pereval_spatial_index.upsert_many(
+        (change.pereval_id, *change.coords) for change in changes if change.coords is not None
+    )
+
+
+add_change_listener(_apply_pereval_changes)
@@ -0,0 +1,124 @@
+"""
+Поиск перевалов по названиям в памяти процесса (n-граммный индекс).
+
+Используется вместо индексов PostgreSQL (tsvector + pg_trgm), когда база
+их не поддерживает, например в тестах на SQLite. Поиск устойчив к опечаткам
+и работает по префиксам слов, как поиск в PostgreSQL: каждое слово запроса
+сравнивается со словами названий по совпадению триграмм.
+"""
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from repository.changes import PerevalChange, add_change_listener
+
+# Минимальная похожесть слова запроса и слова названия
+SIMILARITY_THRESHOLD = 0.3
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def title_words(value: Optional[str]) -> List[str]:
+    """Слова названия в нижнем регистре (ё приравнивается к е)."""
+    if not value:
+        return []
+    return _WORD_RE.findall(value.lower().replace("ё", "е"))
+
+
+def trigrams(word: str) -> Set[str]:
+    """Триграммы слова с теми же отступами, что и в pg_trgm."""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _similarity(query_grams: Set[str], word: str) -> float:
+    word_grams = trigrams(word)
+    return len(query_grams & word_grams) / len(query_grams | word_grams)
+
+
+def _word_score(query_word: str, query_grams: Set[str], word: str) -> float:
+    if word.startswith(query_word):
+        return 1.0
+    # Опечатка в начале слова, которое еще не допечатано до конца
+    return max(_similarity(query_grams, word), _similarity(query_grams, word[:len(query_word)]))
+
+
+class TitleSearchIndex:
+    """Инвертированный индекс триграмм слов в названиях перевалов."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._words: Dict[int, List[str]] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._dirty: Set[int] = set()
+        self.loaded = False
+        self.max_id = 0
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def _remove(self, pereval_id: int) -> None:
+        for word in self._words.pop(pereval_id, ()):
+            for gram in trigrams(word):
+                ids = self._postings.get(gram)
+                if ids is not None:
+                    ids.discard(pereval_id)
+
+    def upsert_many(self, rows: Iterable[Tuple[int, Optional[str], Optional[str], Optional[str]]]) -> None:
+        """Добавляет или заменяет названия перевалов: (id, beauty_title, title, other_titles)."""
+        with self._lock:
+            for pereval_id, *titles in rows:
+                self._remove(pereval_id)
+                words = sorted({word for value in titles for word in title_words(value)})
+                self._words[pereval_id] = words
+                for word in words:
+                    for gram in trigrams(word):
+                        self._postings.setdefault(gram, set()).add(pereval_id)
+                self._dirty.discard(pereval_id)
+                if pereval_id > self.max_id:
+                    self.max_id = pereval_id
+
+    def mark_dirty(self, pereval_ids: Iterable[int]) -> None:
+        """Отмечает перевалы, названия которых нужно перечитать из базы."""
+        with self._lock:
+            self._dirty.update(pereval_ids)
+
+    def dirty_ids(self) -> List[int]:
+        """Перевалы, отмеченные для перечитывания."""
+        with self._lock:
+            return sorted(self._dirty)
+
+    def search(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """До limit перевалов, все слова запроса которых нашлись в названиях: [(id, оценка)]."""
+        query_words = title_words(query)
+        if not query_words:
+            return []
+        with self._lock:
+            scores: Optional[Dict[int, float]] = None
+            for query_word in query_words:
+                query_grams = trigrams(query_word)
+                candidates = set().union(*(self._postings.get(gram, ()) for gram in query_grams))
+                if scores is not None:
+                    candidates &= scores.keys()
+                word_scores = {}
+                for pereval_id in candidates:
+                    score = max(_word_score(query_word, query_grams, word) for word in self._words[pereval_id])
+                    if score >= SIMILARITY_THRESHOLD:
+                        word_scores[pereval_id] = score + (scores[pereval_id] if scores else 0)
+                scores = word_scores
+                if not scores:
+                    return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(pereval_id, score / len(query_words)) for pereval_id, score in ranked]
+
+
+# Индекс названий этого процесса
+title_search_index = TitleSearchIndex()
+
+
+def _mark_changed_titles(changes: List[PerevalChange]) -> None:
+    """Отмечает измененные перевалы для перечитывания при следующем поиске."""
+    if title_search_index.loaded:
+        title_search_index.mark_dirty(change.pereval_id for change in changes)
+
+
+add_change_listener(_mark_changed_titles)
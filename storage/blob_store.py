@@ -0,0 +1,275 @@
+"""
+Хранилище бинарных данных изображений с адресацией по содержимому.
+
+Ключ блоба - SHA-256 от его байтов, поэтому повторная загрузка той же
+фотографии не занимает места: put() для существующего ключа ничего не пишет.
+"""
+import hashlib
+import os
+import tempfile
+from typing import Optional
+from dotenv import load_dotenv
+
+# Загрузка переменных окружения
+load_dotenv()
+
+BLOB_BACKEND = os.getenv("FSTR_BLOB_BACKEND", "local")
+BLOB_DIR = os.getenv("FSTR_BLOB_DIR", "media/blobs")
+BLOB_S3_BUCKET = os.getenv("FSTR_BLOB_S3_BUCKET", "pereval-images")
+BLOB_S3_ENDPOINT = os.getenv("FSTR_BLOB_S3_ENDPOINT")
+
+
+class BlobNotFoundError(Exception):
+    """Блоб с указанным ключом отсутствует в хранилище."""
+
+
+class BlobTooLargeError(Exception):
+    """Записываемый блоб превысил допустимый размер."""
+
+
+def blob_key(data: bytes) -> str:
+    """Ключ блоба: hex SHA-256 от содержимого."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobWriter:
+    """
+    Потоковая запись блоба кусками.
+
+    Хэш считается инкрементально по мере записи, данные копятся во временном
+    файле (первый мегабайт - в памяти), так что потребление памяти не зависит
+    от размера блоба. commit() сохраняет блоб под ключом его содержимого.
+    """
+
+    # Сколько первых байтов сохраняется для определения формата
+    HEAD_SIZE = 64
+
+    def __init__(self, store: "BlobStore", max_size: Optional[int] = None):
+        self.store = store
+        self.max_size = max_size
+        self.size = 0
+        self.head = b""
+        self._hash = hashlib.sha256()
+        self._file = self._open_temp_file()
+
+    def _open_temp_file(self):
+        return tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+
+    def write(self, chunk: bytes) -> None:
+        """Дописывает кусок данных; при превышении лимита - BlobTooLargeError."""
+        self.size += len(chunk)
+        if self.max_size is not None and self.size > self.max_size:
+            self.abort()
+            raise BlobTooLargeError(f"Размер превышает {self.max_size} байт")
+        if len(self.head) < self.HEAD_SIZE:
+            self.head += chunk[:self.HEAD_SIZE - len(self.head)]
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+    def commit(self) -> str:
+        """Сохраняет записанные данные в хранилище и возвращает ключ."""
+        key = self._hash.hexdigest()
+        try:
+            if not self.store.exists(key):
+                self._file.seek(0)
+                self.store._write_file(key, self._file)
+        finally:
+            self.abort()
+        return key
+
+    def abort(self) -> None:
+        """Отменяет запись и освобождает временные данные."""
+        if not self._file.closed:
+            self._file.close()
+
+
+class BlobStore:
+    """Базовый интерфейс хранилища блобов."""
+
+    def open_writer(self, max_size: Optional[int] = None) -> BlobWriter:
+        """Начинает потоковую запись блоба (см. BlobWriter)."""
+        return BlobWriter(self, max_size)
+
+    def put(self, data: bytes) -> str:
+        """Сохраняет данные и возвращает их ключ (дубликаты не пишутся)."""
+        key = blob_key(data)
+        if not self.exists(key):
+            self._write(key, data)
+        return key
+
+    def put_as(self, key: str, data: bytes) -> str:
+        """
+        Сохраняет производные данные (например, миниатюру) под явным ключом.
+        Ключ должен однозначно определяться исходным блобом и параметрами.
+        """
+        self._write(key, data)
+        return key
+
+    def get(self, key: str) -> bytes:
+        """Возвращает содержимое блоба или выбрасывает BlobNotFoundError."""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        """Проверяет наличие блоба."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """Удаляет блоб (отсутствующий ключ не является ошибкой)."""
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Путь к файлу блоба на локальном диске, если он там хранится."""
+        return None
+
+    def _write(self, key: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    def _write_file(self, key: str, file_obj) -> None:
+        """Сохраняет блоб из файлового объекта (по умолчанию читает его целиком)."""
+        self._write(key, file_obj.read())
+
+
+class _LocalBlobWriter(BlobWriter):
+    """Потоковая запись сразу во временный файл рядом с блобами (без копирования при commit)."""
+
+    def _open_temp_file(self):
+        os.makedirs(self.store.root, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=self.store.root, prefix=".tmp-")
+        return os.fdopen(fd, "wb")
+
+    def commit(self) -> str:
+        key = self._hash.hexdigest()
+        self._file.close()
+        path = self.store._path(key)
+        if os.path.exists(path):
+            os.unlink(self._tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self._tmp_path, path)
+        return key
+
+    def abort(self) -> None:
+        super().abort()
+        if os.path.exists(self._tmp_path):
+            os.unlink(self._tmp_path)
+
+
+class LocalBlobStore(BlobStore):
+    """Хранилище блобов в локальной файловой системе."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def open_writer(self, max_size: Optional[int] = None) -> BlobWriter:
+        return _LocalBlobWriter(self, max_size)
+
+    def _path(self, key: str) -> str:
+        # Раскладываем по подкаталогам, чтобы не держать все файлы в одном
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Пишем во временный файл и атомарно переименовываем,
+        # чтобы читатели никогда не увидели недописанный блоб
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def get(self, key: str) -> bytes:
+        try:
+            with open(self._path(key), "rb") as blob_file:
+                return blob_file.read()
+        except FileNotFoundError as e:
+            raise BlobNotFoundError(key) from e
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        return path if os.path.exists(path) else None
+
+
+class S3BlobStore(BlobStore):
+    """
+    Хранилище блобов в S3-совместимом объектном хранилище.
+
+    Принимает любой клиент с интерфейсом boto3 S3 (put_object, get_object,
+    head_object, delete_object) - например, клиент MinIO или локальную заглушку.
+    """
+
+    def __init__(self, client, bucket: str):
+        self.client = client
+        self.bucket = bucket
+
+    def _write(self, key: str, data: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data)
+
+    def _write_file(self, key: str, file_obj) -> None:
+        # upload_fileobj у boto3 загружает файл частями, не читая его целиком
+        if hasattr(self.client, "upload_fileobj"):
+            self.client.upload_fileobj(file_obj, self.bucket, key)
+        else:
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=file_obj)
+
+    def get(self, key: str) -> bytes:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
+        except Exception as e:
+            if _is_not_found(e):
+                raise BlobNotFoundError(key) from e
+            raise
+        return response["Body"].read()
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except Exception as e:
+            if _is_not_found(e):
+                return False
+            raise
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+def _is_not_found(error: Exception) -> bool:
+    """Распознает ответ "не найдено" от S3-совместимого клиента."""
+    if isinstance(error, (KeyError, FileNotFoundError)):
+        return True
+    code = getattr(error, "response", {}).get("Error", {}).get("Code")
+    return code in ("404", "NoSuchKey", "NotFound")
+
+
+_blob_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    """
+    Хранилище блобов приложения, настроенное через FSTR_BLOB_*.
+    Используется как dependency в FastAPI.
+    """
+    global _blob_store
+    if _blob_store is None:
+        if BLOB_BACKEND == "s3":
+            import boto3
+
+            client = boto3.client("s3", endpoint_url=BLOB_S3_ENDPOINT)
+            _blob_store = S3BlobStore(client, BLOB_S3_BUCKET)
+        else:
+            _blob_store = LocalBlobStore(BLOB_DIR)
+    return _blob_store
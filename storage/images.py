@@ -0,0 +1,64 @@
+"""
+Декодирование и распознавание загружаемых изображений.
+"""
+import base64
+import binascii
+from storage.blob_store import BlobStore
+
+DEFAULT_MIME_TYPE = "application/octet-stream"
+
+# Сигнатуры форматов: (смещение, байты, MIME-тип)
+_SIGNATURES = [
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (8, b"WEBP", "image/webp"),
+    (4, b"ftypheic", "image/heic"),
+    (4, b"ftypmif1", "image/heif"),
+]
+
+
+# Пробельные символы ASCII, которыми base64 переносят по строкам (MIME, base64.encodebytes)
+_ASCII_WHITESPACE = str.maketrans("", "", " \t\r\n\f\v")
+
+
+class InvalidImageError(ValueError):
+    """Данные изображения не являются корректной base64 строкой."""
+
+
+def decode_base64_image(data: str) -> bytes:
+    """
+    Декодирует base64 строку изображения (допускается префикс data:...;base64,
+    и перенос строк). Выбрасывает InvalidImageError для некорректных данных.
+    """
+    if data.startswith("data:") and "," in data:
+        data = data.split(",", 1)[1]
+    try:
+        return base64.b64decode(data.translate(_ASCII_WHITESPACE), validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise InvalidImageError("Некорректные base64 данные изображения") from e
+
+
+def sniff_mime_type(content: bytes) -> str:
+    """Определяет MIME-тип изображения по сигнатуре в начале файла."""
+    for offset, signature, mime_type in _SIGNATURES:
+        if content[offset:offset + len(signature)] == signature:
+            return mime_type
+    return DEFAULT_MIME_TYPE
+
+
+def store_image(blob_store: BlobStore, content: bytes, title: str) -> dict:
+    """
+    Сохраняет байты изображения в хранилище блобов.
+
+    Возвращает значения колонок строки images (без pereval_id). Хэширование
+    и запись файла блокируют поток, поэтому асинхронный код вызывает функцию
+    в пуле потоков, а в репозиторий передает уже готовые строки.
+    """
+    return {
+        "blob_key": blob_store.put(content),
+        "size": len(content),
+        "mime_type": sniff_mime_type(content),
+        "title": title
+    }
@@ -0,0 +1,66 @@
+"""
+Построение миниатюр изображений.
+
+Pillow указан в requirements.txt; если он все же не установлен,
+ensure_thumbnail выбрасывает ThumbnailsUnavailableError (ответ 501),
+а не отдает исходное изображение под видом миниатюры.
+"""
+import io
+from typing import Optional
+from storage.blob_store import BlobStore
+
+try:
+    from PIL import Image as PILImage
+except ImportError:  # Pillow не установлен
+    PILImage = None
+
+# Допустимые размеры миниатюр (по большей стороне, в пикселях)
+THUMBNAIL_SIZES = (128, 256, 512)
+DEFAULT_THUMBNAIL_SIZE = 256
+THUMBNAIL_MIME_TYPE = "image/jpeg"
+
+
+class ThumbnailsUnavailableError(Exception):
+    """Миниатюры не строятся: Pillow не установлен."""
+
+
+def thumbnail_key(key: str, size: int) -> str:
+    """Ключ миниатюры в хранилище блобов: производный от ключа оригинала."""
+    return f"{key}.thumb{size}"
+
+
+def make_thumbnail(content: bytes, size: int) -> Optional[bytes]:
+    """Строит JPEG миниатюру или возвращает None, если формат не поддерживается."""
+    try:
+        with PILImage.open(io.BytesIO(content)) as image:
+            image.thumbnail((size, size))
+            if image.mode in ("RGBA", "LA", "P"):
+                # Прозрачность в JPEG не поддерживается - кладем на белый фон
+                image = image.convert("RGBA")
+                background = PILImage.new("RGB", image.size, (255, 255, 255))
+                background.paste(image, mask=image.split()[-1])
+                image = background
+            elif image.mode != "RGB":
+                image = image.convert("RGB")
+            buffer = io.BytesIO()
+            image.save(buffer, "JPEG", quality=80, optimize=True)
+            return buffer.getvalue()
+    except (OSError, ValueError):
+        return None
+
+
+def ensure_thumbnail(blob_store: BlobStore, key: str, size: int) -> Optional[str]:
+    """
+    Возвращает ключ миниатюры, при необходимости построив и сохранив ее.
+    None означает, что формат изображения не поддерживается. Без Pillow
+    выбрасывает ThumbnailsUnavailableError.
+    """
+    if PILImage is None:
+        raise ThumbnailsUnavailableError("Pillow не установлен")
+    derived_key = thumbnail_key(key, size)
+    if blob_store.exists(derived_key):
+        return derived_key
+    thumbnail = make_thumbnail(blob_store.get(key), size)
+    if thumbnail is None:
+        return None
+    return blob_store.put_as(derived_key, thumbnail)
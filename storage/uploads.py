@@ -0,0 +1,158 @@
+"""
+Потоковый прием изображений из multipart/form-data запроса.
+
+Тело запроса разбирается по мере поступления: содержимое каждого файла
+сразу пишется в хранилище блобов с инкрементальным хэшированием, поэтому
+в памяти одновременно находится лишь один кусок тела запроса. Разбор
+куска (хэширование и запись файла) выполняется в пуле потоков, чтобы
+не останавливать цикл событий.
+"""
+from typing import AsyncIterator, List, NamedTuple, Optional
+from fastapi.concurrency import run_in_threadpool
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+from storage.blob_store import BlobStore, BlobTooLargeError, BlobWriter
+from storage.images import sniff_mime_type
+
+# Максимальный размер текстового поля формы (например, title)
+MAX_FIELD_SIZE = 1024
+
+
+class InvalidUploadError(ValueError):
+    """Тело запроса не является корректной формой с изображениями."""
+
+
+class UploadTooLargeError(ValueError):
+    """Файл или количество файлов превышает допустимые ограничения."""
+
+
+class StoredUpload(NamedTuple):
+    """Изображение, сохраненное в хранилище блобов."""
+    blob_key: str
+    size: int
+    mime_type: str
+    title: str
+
+
+class _UploadCollector:
+    """Обработчики событий MultipartParser: пишут файлы в хранилище блобов."""
+
+    def __init__(self, blob_store: BlobStore, max_file_size: int, max_files: int):
+        self.blob_store = blob_store
+        self.max_file_size = max_file_size
+        self.max_files = max_files
+        self.files: List[StoredUpload] = []
+        self.titles: List[str] = []
+        self._header_field = b""
+        self._header_value = b""
+        self._headers = {}
+        self._writer: Optional[BlobWriter] = None
+        self._field_name: Optional[str] = None
+        self._field_value = b""
+        self._filename = ""
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+        self._writer = None
+        self._field_name = None
+        self._field_value = b""
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        if b"filename" in options:
+            if len(self.files) >= self.max_files:
+                raise UploadTooLargeError(f"Можно загрузить не более {self.max_files} файлов за запрос")
+            self._filename = options[b"filename"].decode("utf-8", "replace")
+            self._writer = self.blob_store.open_writer(self.max_file_size)
+        else:
+            self._field_name = name
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._writer is not None:
+            self._writer.write(data[start:end])
+        elif self._field_name is not None:
+            self._field_value += data[start:end]
+            if len(self._field_value) > MAX_FIELD_SIZE:
+                raise UploadTooLargeError(f"Поле {self._field_name} слишком длинное")
+
+    def on_part_end(self) -> None:
+        if self._writer is not None:
+            writer, self._writer = self._writer, None
+            if writer.size == 0:
+                writer.abort()
+                raise InvalidUploadError(f"Файл {self._filename} пуст")
+            key = writer.commit()
+            self.files.append(StoredUpload(key, writer.size, sniff_mime_type(writer.head), self._filename))
+        elif self._field_name == "title":
+            self.titles.append(self._field_value.decode("utf-8", "replace"))
+
+    def abort(self) -> None:
+        if self._writer is not None:
+            self._writer.abort()
+            self._writer = None
+
+
+async def receive_images(
+    content_type: str,
+    body: AsyncIterator[bytes],
+    blob_store: BlobStore,
+    max_file_size: int,
+    max_files: int
+) -> List[StoredUpload]:
+    """
+    Принимает файлы из тела multipart/form-data и сохраняет их в хранилище блобов.
+
+    Файлы передаются в частях с filename, их названия - в полях title
+    (i-е поле title относится к i-му файлу, без него используется имя файла).
+    Выбрасывает InvalidUploadError и UploadTooLargeError.
+    """
+    media_type, options = parse_options_header(content_type)
+    boundary = options.get(b"boundary")
+    if media_type != b"multipart/form-data" or not boundary:
+        raise InvalidUploadError("Ожидается тело multipart/form-data")
+
+    collector = _UploadCollector(blob_store, max_file_size, max_files)
+    parser = MultipartParser(boundary, collector.callbacks())
+    try:
+        async for chunk in body:
+            await run_in_threadpool(parser.write, chunk)
+        await run_in_threadpool(parser.finalize)
+    except BlobTooLargeError as e:
+        collector.abort()
+        raise UploadTooLargeError(f"Файл слишком большой: {e}") from e
+    except MultipartParseError as e:
+        collector.abort()
+        raise InvalidUploadError("Некорректное тело multipart/form-data") from e
+    except Exception:
+        collector.abort()
+        raise
+
+    if not collector.files:
+        raise InvalidUploadError("В запросе нет файлов")
+    return [
+        upload._replace(title=collector.titles[index]) if index < len(collector.titles) else upload
+        for index, upload in enumerate(collector.files)
+    ]
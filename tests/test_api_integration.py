@@ -1,41 +1,90 @@
 """
 Интеграционные тесты для API endpoints.
 """
+import asyncio
+import base64
+import os
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from database.connection import Base, get_db
+from sqlalchemy.pool import NullPool
+from database.connection import Base, get_db, get_async_db
 from main import app
-from models.user import User
-from models.coords import Coords
-from models.level import Level
-from models.image import Image
-from models.pereval import Pereval, PerevalStatus
-from datetime import datetime
-
-# Создаем тестовую базу данных в памяти
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test_api.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-def override_get_db():
-    """Переопределяем get_db для тестов."""
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
+from repository import idempotency
+from routers import admin, perevals, submit_data
+from services import clusters, request_stats, response_cache, spatial_index, title_search
+from services.lru import LRUCache
+from storage import thumbnails
+from storage.blob_store import LocalBlobStore, blob_key, get_blob_store
+from schemas.pereval import PerevalDetailResponse
+
+@pytest.fixture
+def database_path(tmp_path):
+    """Путь к файлу тестовой базы SQLite во временном каталоге теста."""
+    return str(tmp_path / "test_api.db")
+
+@pytest.fixture(autouse=True)
+def blob_store(tmp_path):
+    """Хранилище блобов во временном каталоге для каждого теста."""
+    store = LocalBlobStore(str(tmp_path / "blobs"))
+    app.dependency_overrides[get_blob_store] = lambda: store
+    yield store
+    del app.dependency_overrides[get_blob_store]
+
+@pytest.fixture
+def admin_headers(monkeypatch):
+    """Заголовок со служебным токеном для /api/admin/*."""
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "test-admin-token")
+    return {"X-Admin-Token": "test-admin-token"}
+
+@pytest.fixture(autouse=True)
+def fresh_response_cache(monkeypatch):
+    """Пустой кэш ответов для каждого теста (id перевалов между тестами повторяются)."""
+    cache = response_cache.MemoryResponseCache(max_entries=100, max_bytes=1024 * 1024, ttl=60)
+    monkeypatch.setattr(response_cache, "_response_cache", cache)
+    return cache
 
-app.dependency_overrides[get_db] = override_get_db
+@pytest.fixture(autouse=True)
+def fresh_idempotency_results(monkeypatch):
+    """Пустой кэш результатов по ключам идемпотентности для каждого теста."""
+    results = LRUCache(max_entries=100, ttl=60)
+    monkeypatch.setattr(idempotency, "idempotency_results", results)
+    return results
 
 @pytest.fixture
-def client():
-    """Фикстура для тестового клиента."""
+def client(database_path):
+    """Фикстура для тестового клиента на отдельной базе во временном каталоге."""
+    engine = create_engine(f"sqlite:///{database_path}", connect_args={"check_same_thread": False})
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    # Асинхронный движок на той же базе для обработчиков запросов.
+    # NullPool: каждый TestClient работает в своем цикле событий.
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{database_path}", poolclass=NullPool)
+    TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    request_stats.instrument_engine(async_engine.sync_engine)
+
+    def override_get_db():
+        """Переопределяем get_db для тестов."""
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_async_db():
+        """Переопределяем get_async_db для тестов."""
+        async with TestingAsyncSessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     Base.metadata.create_all(bind=engine)
     with TestClient(app) as test_client:
         yield test_client
-    Base.metadata.drop_all(bind=engine)
+    del app.dependency_overrides[get_db]
+    del app.dependency_overrides[get_async_db]
+    engine.dispose()
 
 @pytest.fixture
 def sample_pereval_data():
@@ -84,6 +133,37 @@ def test_create_pereval_success(client, sample_pereval_data):
     assert "message" in data
     assert "id" in data
 
+def test_create_pereval_idempotency_key(client, sample_pereval_data):
+    """Повтор POST /submitData с тем же Idempotency-Key не создает дубликат."""
+    headers = {"Idempotency-Key": "retry-1"}
+    first = client.post("/api/submitData", json=sample_pereval_data, headers=headers)
+    assert first.json()["status"] == 200
+    assert "Idempotent-Replayed" not in first.headers
+
+    retry = client.post("/api/submitData", json=sample_pereval_data, headers=headers)
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+
+    # Тот же ключ с другим содержимым - конфликт
+    changed = dict(sample_pereval_data, title="Другой перевал")
+    conflict = client.post("/api/submitData", json=changed, headers=headers)
+    assert conflict.json()["status"] == 409
+    assert conflict.json()["id"] is None
+
+    # Без заголовка ключом служит хэш содержимого; повтор находится и после сброса кэша воркера
+    other = client.post("/api/submitData", json=changed)
+    idempotency.idempotency_results.invalidate([idempotency.content_key(idempotency.request_hash(
+        submit_data.PerevalCreate(**changed)
+    ))])
+    repeated = client.post("/api/submitData", json=changed)
+    assert repeated.json()["id"] == other.json()["id"] != first.json()["id"]
+    assert repeated.headers["Idempotent-Replayed"] == "true"
+
+    listed = client.get("/api/submitData/?user__email=test@example.com")
+    assert len(listed.json()) == 2
+
+    assert client.post("/api/submitData", json=sample_pereval_data, headers={"Idempotency-Key": ""}).status_code == 400
+
 def test_get_pereval_by_id_success(client, sample_pereval_data):
     """Тест получения перевала по ID через GET /submitData/{id}."""
     # Сначала создаем перевал
@@ -106,6 +186,7 @@ def test_get_pereval_by_id_success(client, sample_pereval_data):
             assert "level" in data
             assert "images" in data
             assert data["id"] == pereval_id
+            assert data["images"][0]["mime_type"] == "image/png"
 
 def test_get_pereval_by_id_not_found(client):
     """Тест получения несуществующего перевала."""
@@ -181,6 +262,29 @@ def test_get_perevals_by_email_pagination(client, sample_pereval_data):
         data = response.json()
         assert len(data) <= 2
 
+def test_get_perevals_by_email_cursor(client, sample_pereval_data):
+    """Тест курсорной пагинации через заголовок X-Next-Cursor."""
+    client.post("/api/submitData/batch", json=[sample_pereval_data] * 3)
+
+    first = client.get("/api/submitData/?user__email=test@example.com&limit=2")
+    assert first.status_code == 200
+    assert len(first.json()) == 2
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = client.get(f"/api/submitData/?user__email=test@example.com&limit=2&after={cursor}")
+    assert second.status_code == 200
+    assert len(second.json()) == 1
+    assert "X-Next-Cursor" not in second.headers
+    assert second.json()[0]["id"] not in [item["id"] for item in first.json()]
+
+def test_get_perevals_by_email_limits(client):
+    """Тест ограничения размера страницы и некорректного курсора."""
+    response = client.get("/api/submitData/?user__email=test@example.com&limit=1000")
+    assert response.status_code == 422
+
+    response = client.get("/api/submitData/?user__email=test@example.com&after=broken")
+    assert response.status_code == 400
+
 def test_update_pereval_validation_error(client, sample_pereval_data):
     """Тест обновления с невалидными данными."""
     # Сначала создаем перевал
@@ -199,6 +303,566 @@ def test_update_pereval_validation_error(client, sample_pereval_data):
         # Должна быть ошибка валидации
         assert response.status_code == 422
 
+def test_submit_data_batch(client, sample_pereval_data):
+    """Тест пакетного создания перевалов через POST /submitData/batch."""
+    invalid_data = dict(sample_pereval_data, user=dict(sample_pereval_data["user"], email="invalid-email"))
+    payload = [sample_pereval_data, invalid_data, dict(sample_pereval_data, title="Второй")]
+
+    response = client.post("/api/submitData/batch", json=payload)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == 200
+    results = data["results"]
+    assert [item["index"] for item in results] == [0, 1, 2]
+    assert results[0]["status"] == 200 and results[0]["id"] is not None
+    assert results[1]["status"] == 400 and results[1]["id"] is None
+    assert results[2]["status"] == 200 and results[2]["id"] != results[0]["id"]
+
+def test_submit_data_invalid_image_data(client, sample_pereval_data):
+    """Некорректный base64 изображения - ошибка валидации, а не ошибка сервера."""
+    broken = dict(sample_pereval_data, images=[{"data": "не base64", "title": "Фото"}])
+
+    data = client.post("/api/submitData", json=broken).json()
+    assert data["status"] == 400 and data["id"] is None
+
+    results = client.post("/api/submitData/batch", json=[broken, sample_pereval_data]).json()["results"]
+    assert results[0]["status"] == 400
+    assert results[1]["status"] == 200
+
+def test_submit_data_line_wrapped_image_data(client, sample_pereval_data, blob_store):
+    """base64 с переносами строк (MIME, base64.encodebytes) принимается."""
+    content = base64.b64decode(sample_pereval_data["images"][0]["data"]) * 20
+    wrapped = base64.encodebytes(content).decode()
+    assert "\n" in wrapped
+    payload = dict(sample_pereval_data, images=[{"data": wrapped, "title": "Фото"}])
+
+    data = client.post("/api/submitData", json=payload).json()
+    assert data["status"] == 200
+    image = client.get(f"/api/submitData/{data['id']}").json()["images"][0]
+    assert image["size"] == len(content)
+    assert blob_store.get(blob_key(content)) == content
+
+def test_get_pereval_include_image_data(client, sample_pereval_data):
+    """Тест параметра include: по умолчанию только метаданные изображений."""
+    pereval_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+
+    summary = client.get(f"/api/submitData/{pereval_id}").json()["images"][0]
+    assert "data" not in summary
+    assert summary["title"] == "Тестовое изображение"
+    assert summary["size"] == len(base64.b64decode(sample_pereval_data["images"][0]["data"]))
+
+    full = client.get(f"/api/submitData/{pereval_id}?include=images.data").json()["images"][0]
+    assert full["data"] == sample_pereval_data["images"][0]["data"]
+
+    listing = client.get("/api/submitData/?user__email=test@example.com&include=images.data").json()
+    assert listing[0]["images"][0]["data"] == sample_pereval_data["images"][0]["data"]
+
+    assert client.get(f"/api/submitData/{pereval_id}?include=everything").status_code == 400
+
+def test_upload_images_multipart(client, sample_pereval_data, blob_store):
+    """Тест потоковой загрузки изображений через POST /submitData/{id}/images."""
+    pereval_id = client.post("/api/submitData", json=dict(sample_pereval_data, images=[])).json()["id"]
+    content = base64.b64decode(sample_pereval_data["images"][0]["data"])
+
+    response = client.post(
+        f"/api/submitData/{pereval_id}/images",
+        data={"title": ["Седловина", "Подъём"]},
+        files=[("file", ("a.png", content, "image/png")), ("file", ("b.bin", b"raw-bytes", "application/octet-stream"))]
+    )
+
+    assert response.status_code == 200
+    uploaded = response.json()
+    assert [image["title"] for image in uploaded] == ["Седловина", "Подъём"]
+    assert uploaded[0]["mime_type"] == "image/png"
+    assert uploaded[0]["size"] == len(content)
+    assert client.get(f"/api/images/{uploaded[0]['id']}").content == content
+    assert len(client.get(f"/api/submitData/{pereval_id}").json()["images"]) == 2
+
+def test_upload_images_errors(client, sample_pereval_data, blob_store, monkeypatch):
+    """Тест ограничений потоковой загрузки изображений."""
+    pereval_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+
+    response = client.post("/api/submitData/999/images", files=[("file", ("a.png", b"x", "image/png"))])
+    assert response.status_code == 400
+
+    response = client.post(f"/api/submitData/{pereval_id}/images", json={"title": "x"})
+    assert response.status_code == 400
+
+    monkeypatch.setattr(submit_data, "MAX_IMAGE_SIZE", 4)
+    response = client.post(f"/api/submitData/{pereval_id}/images", files=[("file", ("a.png", b"12345", "image/png"))])
+    assert response.status_code == 413
+    assert not [name for name in os.listdir(blob_store.root) if name.startswith(".tmp-")]
+
+def test_get_image(client, sample_pereval_data):
+    """Тест выдачи изображения через GET /images/{id} с ETag и Range."""
+    pereval_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+    image_id = client.get(f"/api/submitData/{pereval_id}").json()["images"][0]["id"]
+    content = base64.b64decode(sample_pereval_data["images"][0]["data"])
+
+    response = client.get(f"/api/images/{image_id}")
+    assert response.status_code == 200
+    assert response.content == content
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["content-length"] == str(len(content))
+    assert "immutable" in response.headers["cache-control"]
+    etag = response.headers["etag"]
+
+    response = client.get(f"/api/images/{image_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = client.get(f"/api/images/{image_id}", headers={"Range": "bytes=0-3"})
+    assert response.status_code == 206
+    assert response.content == content[:4]
+    assert response.headers["content-range"] == f"bytes 0-3/{len(content)}"
+
+    response = client.get(f"/api/images/{image_id}", headers={"Range": "bytes=-5"})
+    assert response.status_code == 206
+    assert response.content == content[-5:]
+
+    response = client.get(f"/api/images/{image_id}", headers={"Range": f"bytes={len(content)}-"})
+    assert response.status_code == 416
+
+    # Синтаксически некорректный диапазон игнорируется - отдается файл целиком
+    response = client.get(f"/api/images/{image_id}", headers={"Range": "bytes=5-2"})
+    assert response.status_code == 200
+    assert response.content == content
+
+def test_get_image_not_found(client, sample_pereval_data, blob_store):
+    """Тест запроса несуществующего изображения и изображения без блоба."""
+    assert client.get("/api/images/999").status_code == 404
+    assert client.get("/api/images/999/thumbnail").status_code == 404
+
+    pereval_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+    image_id = client.get(f"/api/submitData/{pereval_id}").json()["images"][0]["id"]
+    content = base64.b64decode(sample_pereval_data["images"][0]["data"])
+    blob_store.delete(blob_key(content))
+    assert client.get(f"/api/images/{image_id}").status_code == 404
+    assert client.get(f"/api/images/{image_id}/thumbnail").status_code == 404
+
+def test_get_image_thumbnail(client, sample_pereval_data, blob_store):
+    """Тест выдачи миниатюры изображения."""
+    pytest.importorskip("PIL")
+    pereval_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+    image_id = client.get(f"/api/submitData/{pereval_id}").json()["images"][0]["id"]
+
+    response = client.get(f"/api/images/{image_id}/thumbnail?size=128")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.content.startswith(b"\xff\xd8\xff")
+    key = blob_key(base64.b64decode(sample_pereval_data["images"][0]["data"]))
+    assert blob_store.exists(thumbnails.thumbnail_key(key, 128))
+    assert client.get(f"/api/images/{image_id}/thumbnail?size=100").status_code == 400
+
+def test_get_image_thumbnail_without_pillow(client, sample_pereval_data, monkeypatch):
+    """Без Pillow миниатюра не подменяется исходным изображением - ответ 501."""
+    monkeypatch.setattr(thumbnails, "PILImage", None)
+    pereval_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+    image_id = client.get(f"/api/submitData/{pereval_id}").json()["images"][0]["id"]
+
+    assert client.get(f"/api/images/{image_id}/thumbnail").status_code == 501
+
+def test_list_perevals_with_filters(client, sample_pereval_data):
+    """Тест списка перевалов с фильтрами через GET /perevals."""
+    client.post("/api/submitData/batch", json=[sample_pereval_data] * 3)
+
+    response = client.get("/api/perevals?status=new&season=summer&min_level=1A&limit=2")
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 2
+    assert data[0]["user_email"] == "test@example.com"
+    assert data[0]["level"]["summer"] == "1А"
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get(f"/api/perevals?status=new&season=summer&min_level=1A&limit=2&after={cursor}")
+    assert len(response.json()) == 1
+    assert "X-Next-Cursor" not in response.headers
+
+    assert client.get("/api/perevals?status=pending").json() == []
+    assert client.get("/api/perevals?min_level=2А").json() == []
+    assert client.get("/api/perevals?added_from=2021-09-23T00:00:00").json() == []
+    assert client.get("/api/perevals?min_level=5Z").status_code == 400
+    assert client.get("/api/perevals?status=unknown").status_code == 422
+    assert client.get("/api/perevals?after=broken").status_code == 400
+
+def test_get_perevals_in_bbox(client, sample_pereval_data):
+    """Тест поиска перевалов в области карты через GET /perevals/bbox."""
+    pereval_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+
+    response = client.get("/api/perevals/bbox?min_lat=45&min_lon=7&max_lat=46&max_lon=8")
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["id"] for item in data] == [pereval_id]
+    assert data[0]["latitude"] == 45.3842
+    assert data[0]["status"] == "new"
+
+    response = client.get("/api/perevals/bbox?min_lat=10&min_lon=7&max_lat=11&max_lon=8")
+    assert response.json() == []
+    assert client.get("/api/perevals/bbox?min_lat=46&min_lon=7&max_lat=45&max_lon=8").status_code == 400
+
+def test_get_perevals_nearby(client, sample_pereval_data, monkeypatch):
+    """Тест поиска ближайших перевалов через GET /perevals/nearby."""
+    index = spatial_index.SpatialIndex()
+    monkeypatch.setattr(spatial_index, "pereval_spatial_index", index)
+    monkeypatch.setattr(perevals, "pereval_spatial_index", index)
+    first_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+
+    response = client.get("/api/perevals/nearby?lat=45.38&lon=7.15&radius_km=5")
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["id"] for item in data] == [first_id]
+    assert data[0]["distance_km"] < 1
+    assert data[0]["title"] == sample_pereval_data["title"]
+
+    # Перевал, добавленный после загрузки индекса, находится сразу
+    sample_pereval_data["coords"] = {"latitude": "45.3900", "longitude": "7.1525", "height": "1200"}
+    second_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+    data = client.get("/api/perevals/nearby?lat=45.39&lon=7.1525&radius_km=5&k=1").json()
+    assert [item["id"] for item in data] == [second_id]
+
+    assert client.get("/api/perevals/nearby?lat=10&lon=10").json() == []
+    assert client.get("/api/perevals/nearby?lat=45&lon=7&k=0").status_code == 422
+
+def test_get_perevals_nearby_refresh_updates(client, sample_pereval_data, monkeypatch):
+    """Тест догрузки в индекс перевалов, измененных другим процессом."""
+    index = spatial_index.SpatialIndex()
+    # Слушатель коммитов обновляет индекс "другого процесса", а не проверяемый
+    monkeypatch.setattr(spatial_index, "pereval_spatial_index", spatial_index.SpatialIndex())
+    monkeypatch.setattr(perevals, "pereval_spatial_index", index)
+    monkeypatch.setattr(perevals, "SPATIAL_REFRESH_SECONDS", -1)
+    pereval_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+    assert [item["id"] for item in client.get("/api/perevals/nearby?lat=45.38&lon=7.15").json()] == [pereval_id]
+
+    coords = {"latitude": "43.3500", "longitude": "42.4500", "height": "3000"}
+    client.patch(f"/api/submitData/{pereval_id}", json={"coords": coords})
+    assert client.get("/api/perevals/nearby?lat=45.38&lon=7.15").json() == []
+    assert [item["id"] for item in client.get("/api/perevals/nearby?lat=43.35&lon=42.45").json()] == [pereval_id]
+
+def test_get_pereval_clusters(client, sample_pereval_data, monkeypatch):
+    """Тест кластеров перевалов в тайле через GET /perevals/clusters."""
+    monkeypatch.setattr(clusters, "cluster_tile_cache", LRUCache(max_entries=16, ttl=60))
+    client.post("/api/submitData", json=sample_pereval_data)
+
+    response = client.get("/api/perevals/clusters?z=0&x=0&y=0")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == 1
+    assert data["clusters"][0]["max_difficulty"] == "1А"
+    assert data["clusters"][0]["latitude"] == 45.3842
+
+    # Новый перевал сбрасывает закэшированный тайл
+    client.post("/api/submitData", json=dict(sample_pereval_data, title="Второй перевал"))
+    assert client.get("/api/perevals/clusters?z=0&x=0&y=0").json()["count"] == 2
+
+    assert client.get("/api/perevals/clusters?z=1&x=2&y=0").status_code == 400
+    assert client.get("/api/perevals/clusters?z=2&x=0&y=0").json()["clusters"] == []
+
+def test_search_perevals(client, sample_pereval_data, monkeypatch):
+    """Тест поиска перевалов по названию через GET /perevals/search."""
+    monkeypatch.setattr(title_search, "title_search_index", title_search.TitleSearchIndex())
+    pereval_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+
+    response = client.get("/api/perevals/search", params={"q": "Тествый"})
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["id"] for item in data] == [pereval_id]
+    assert data[0]["beauty_title"] == "пер. Тестовый"
+
+    assert client.get("/api/perevals/search", params={"q": "Эльбрус"}).json() == []
+    assert client.get("/api/perevals/search", params={"q": ""}).status_code == 422
+
+def test_moderation_flow(client, sample_pereval_data):
+    """Тест модерации: захват, решение и журнал."""
+    pereval_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+
+    response = client.post("/api/moderation/claim", json={"moderator": "anna", "limit": 5})
+    assert response.status_code == 200
+    claimed = response.json()["claimed"]
+    assert [item["id"] for item in claimed] == [pereval_id]
+    assert claimed[0]["status"] == "pending"
+    assert client.post("/api/moderation/claim", json={"moderator": "boris"}).json()["claimed"] == []
+
+    # Перевал на модерации нельзя редактировать
+    assert client.patch(f"/api/submitData/{pereval_id}", json={"title": "Новое"}).json()["state"] == 0
+
+    response = client.post(
+        f"/api/moderation/{pereval_id}/decision", json={"moderator": "boris", "status": "accepted"}
+    )
+    assert response.status_code == 409
+    response = client.post(
+        f"/api/moderation/{pereval_id}/decision", json={"moderator": "anna", "status": "rejected", "comment": "Дубль"}
+    )
+    assert response.status_code == 200
+    assert response.json()["to_status"] == "rejected"
+    assert client.get(f"/api/submitData/{pereval_id}").json()["status"] == "rejected"
+
+    audit = client.get(f"/api/moderation/{pereval_id}/audit").json()
+    assert [(entry["action"], entry["moderator"]) for entry in audit] == [("claim", "anna"), ("reject", "anna")]
+    assert client.post("/api/moderation/999/release", json={"moderator": "anna"}).status_code == 404
+    assert client.post("/api/moderation/release-expired").json() == {"released": 0}
+
+def test_sync_perevals(client, sample_pereval_data):
+    """Тест GET /sync: новые и измененные перевалы после курсора, без изображений."""
+    first_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+    second_id = client.post("/api/submitData", json=dict(sample_pereval_data, title="Второй")).json()["id"]
+
+    response = client.get("/api/sync?user__email=test@example.com&limit=1")
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["id"] for item in data["items"]] == [first_id] and data["has_more"]
+    assert "images" not in data["items"][0]
+    assert data["items"][0]["level"]["summer"] == "1А"
+    data = client.get(f"/api/sync?user__email=test@example.com&since={data['cursor']}").json()
+    assert [item["id"] for item in data["items"]] == [second_id] and not data["has_more"]
+    cursor = data["cursor"]
+
+    client.post("/api/moderation/claim", json={"moderator": "anna", "limit": 1})
+    data = client.get(f"/api/sync?user__email=test@example.com&since={cursor}").json()
+    assert [(item["id"], item["status"]) for item in data["items"]] == [(first_id, "pending")]
+    assert client.get(f"/api/sync?user__email=test@example.com&since={data['cursor']}").json()["items"] == []
+
+    assert client.get("/api/sync?user__email=test@example.com&since=broken").status_code == 400
+    assert client.get("/api/sync").status_code == 422
+
+def test_get_pereval_response_cache(client, sample_pereval_data, fresh_response_cache, admin_headers):
+    """Тест кэширования ответа GET /submitData/{id} и его сброса при изменениях."""
+    pereval_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+
+    first = client.get(f"/api/submitData/{pereval_id}")
+    second = client.get(f"/api/submitData/{pereval_id}")
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content
+    assert first.json()["title"] == sample_pereval_data["title"]
+    assert (fresh_response_cache.hits, fresh_response_cache.misses) == (1, 1)
+
+    # Изменение перевала сбрасывает закэшированный ответ
+    client.patch(f"/api/submitData/{pereval_id}", json={"title": "Новое название"})
+    assert client.get(f"/api/submitData/{pereval_id}").json()["title"] == "Новое название"
+    client.post("/api/moderation/claim", json={"moderator": "anna"})
+    assert client.get(f"/api/submitData/{pereval_id}").json()["status"] == "pending"
+
+    # Ответ с данными изображений не кэшируется
+    client.get(f"/api/submitData/{pereval_id}?include=images.data")
+    stats = client.get("/api/admin/cache", headers=admin_headers).json()["responses"]
+    assert stats["backend"] == "memory"
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 3, 1)
+
+class FakeAsyncRedis:
+    """Асинхронный клиент Redis на словаре; eval повторяет скрипты RedisResponseCache."""
+
+    def __init__(self):
+        self.data = {}
+        self.available = True
+        self.calls = 0
+
+    def _check(self):
+        if not self.available:
+            raise ConnectionError("redis недоступен")
+        self.calls += 1
+
+    async def get(self, key):
+        self._check()
+        return self.data.get(key)
+
+    async def eval(self, script, numkeys, *args):
+        self._check()
+        keys, argv = args[:numkeys], args[numkeys:]
+        if script == response_cache.RedisResponseCache.SET_SCRIPT:
+            if argv[0] < int(self.data.get(keys[1], 0)):
+                return 0
+            self.data[keys[0]] = argv[1]
+            return 1
+        generation = int(self.data.get(keys[0], 0)) + 1
+        self.data[keys[0]] = generation
+        for entry_key, tombstone_key in zip(keys[1::2], keys[2::2]):
+            self.data.pop(entry_key, None)
+            self.data[tombstone_key] = generation
+        return generation
+
+def test_redis_response_cache():
+    """Тест кэша ответов поверх асинхронного Redis-совместимого клиента."""
+    client = FakeAsyncRedis()
+    cache = response_cache.RedisResponseCache(client, ttl=60)
+
+    async def scenario():
+        assert await cache.get("pereval:1:detail") is None
+        value = response_cache.CachedResponse(b"{}", {"ETag": '"pereval-1-v1"'})
+        await cache.set("pereval:1:detail", value, await cache.token())
+        assert await cache.get("pereval:1:detail") == (b"{}", {"ETag": '"pereval-1-v1"'})
+        assert "fstr:pereval:1:detail" in client.data
+        await cache.delete(["pereval:1:detail"])
+        assert await cache.get("pereval:1:detail") is None
+        assert cache.stats()["hits"] == 1
+
+        # Ответ, прочитанный до инвалидации, не попадает в кэш после нее
+        token = await cache.token()
+        await cache.delete(["pereval:1:detail"])
+        await cache.set("pereval:1:detail", response_cache.CachedResponse(b"old", {}), token)
+        assert await cache.get("pereval:1:detail") is None
+        await cache.set("pereval:1:detail", response_cache.CachedResponse(b"new", {}), await cache.token())
+        assert (await cache.get("pereval:1:detail")).body == b"new"
+
+        # Недоступный сервер не ломает ни чтение, ни запись, ни инвалидацию
+        client.available = False
+        assert await cache.token() == -1
+        assert await cache.get("pereval:1:detail") is None
+        await cache.set("pereval:1:detail", response_cache.CachedResponse(b"{}", {}), await cache.token())
+        await cache.delete(["pereval:1:detail"])
+
+    asyncio.run(scenario())
+
+def test_get_pereval_redis_response_cache(client, sample_pereval_data, monkeypatch):
+    """Тест кэша ответов в Redis: обработчики и сброс после коммита работают через асинхронный клиент."""
+    redis_client = FakeAsyncRedis()
+    monkeypatch.setattr(response_cache, "_response_cache", response_cache.RedisResponseCache(redis_client, ttl=60))
+    pereval_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+
+    first = client.get(f"/api/submitData/{pereval_id}")
+    assert client.get(f"/api/submitData/{pereval_id}").content == first.content
+    assert f"fstr:pereval:{pereval_id}:detail" in redis_client.data
+
+    # Сброс выполняется после run_sync, до ответа на PATCH
+    client.patch(f"/api/submitData/{pereval_id}", json={"title": "Новое название"})
+    assert f"fstr:pereval:{pereval_id}:detail" not in redis_client.data
+    assert client.get(f"/api/submitData/{pereval_id}").json()["title"] == "Новое название"
+
+def test_get_pereval_conditional_requests(client, sample_pereval_data):
+    """Тест ETag, Last-Modified и ответа 304 для GET /submitData/{id}."""
+    pereval_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+
+    response = client.get(f"/api/submitData/{pereval_id}")
+    etag = response.headers["ETag"]
+    assert etag == f'"pereval-{pereval_id}-v1"'
+    assert "Last-Modified" in response.headers
+
+    # Ответ из кэша и проверка по версии отвечают одинаково
+    for _ in range(2):
+        not_modified = client.get(f"/api/submitData/{pereval_id}", headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert not_modified.headers["ETag"] == etag
+    modified_since = {"If-Modified-Since": response.headers["Last-Modified"]}
+    assert client.get(f"/api/submitData/{pereval_id}", headers=modified_since).status_code == 304
+
+    client.patch(f"/api/submitData/{pereval_id}", json={"title": "Новое название"})
+    changed = client.get(f"/api/submitData/{pereval_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] == f'"pereval-{pereval_id}-v2"'
+
+    data_response = client.get(f"/api/submitData/{pereval_id}?include=images.data")
+    assert data_response.headers["ETag"] == f'"pereval-{pereval_id}-v2-data"'
+    assert client.get("/api/submitData/999", headers={"If-None-Match": etag}).status_code == 400
+
+def test_detail_response_matches_schema(client, sample_pereval_data):
+    """Тест совпадения ответа, собранного без pydantic, с сериализацией схемы."""
+    pereval_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+    email = sample_pereval_data["user"]["email"]
+
+    for url in (f"/api/submitData/{pereval_id}", f"/api/submitData/{pereval_id}?include=images.data"):
+        content = client.get(url).content
+        assert PerevalDetailResponse.model_validate_json(content).model_dump_json().encode() == content
+    items = client.get(f"/api/submitData/?user__email={email}&include=images.data").json()
+    assert items[0]["images"][0]["data"] == sample_pereval_data["images"][0]["data"]
+
+def test_update_pereval_if_match(client, sample_pereval_data):
+    """Тест PATCH /submitData/{id} с заголовком If-Match."""
+    pereval_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+    etag = client.get(f"/api/submitData/{pereval_id}").headers["ETag"]
+
+    response = client.patch(f"/api/submitData/{pereval_id}", json={"title": "Первое"}, headers={"If-Match": etag})
+    assert response.json()["state"] == 1
+    new_etag = response.headers["ETag"]
+    assert new_etag == f'"pereval-{pereval_id}-v2"'
+
+    # Изменение по устаревшему ETag отклоняется
+    conflict = client.patch(f"/api/submitData/{pereval_id}", json={"title": "Второе"}, headers={"If-Match": etag})
+    assert conflict.status_code == 412
+    assert conflict.headers["ETag"] == new_etag
+    assert client.get(f"/api/submitData/{pereval_id}").json()["title"] == "Первое"
+
+    invalid = client.patch(f"/api/submitData/{pereval_id}", json={"title": "Второе"}, headers={"If-Match": '"list-1"'})
+    assert invalid.status_code == 412
+    assert client.patch(f"/api/submitData/{pereval_id}", json={"title": "Второе"}, headers={"If-Match": "*"}).json()["state"] == 1
+
+def test_list_conditional_requests(client, sample_pereval_data):
+    """Тест ETag страниц списков перевалов."""
+    pereval_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+    email = sample_pereval_data["user"]["email"]
+
+    for url in ("/api/perevals", f"/api/submitData/?user__email={email}"):
+        response = client.get(url)
+        etag = response.headers["ETag"]
+        not_modified = client.get(url, headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304
+        assert not_modified.headers["Last-Modified"] == response.headers["Last-Modified"]
+        # Для 304 хватает одного запроса версий, связанные сущности не загружаются
+        assert 'desc="1 statements, 1 rows"' in not_modified.headers["Server-Timing"]
+        modified_since = {"If-Modified-Since": response.headers["Last-Modified"]}
+        assert client.get(url, headers=modified_since).status_code == 304
+
+    etag = client.get("/api/perevals").headers["ETag"]
+    client.patch(f"/api/submitData/{pereval_id}", json={"title": "Новое название"})
+    response = client.get("/api/perevals", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    modified_since = {"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"}
+    assert client.get(f"/api/submitData/?user__email={email}", headers=modified_since).status_code == 200
+
+def test_request_stats_and_slow_log(client, sample_pereval_data, monkeypatch, admin_headers):
+    """Тест заголовка Server-Timing и журнала медленных запросов."""
+    monkeypatch.setattr(request_stats, "slow_log", request_stats.SlowLog(10, 0, 0))
+    pereval_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+
+    response = client.get(f"/api/submitData/{pereval_id}?include=images.data")
+    db_timing, total_timing = response.headers["Server-Timing"].rsplit(", ", 1)
+    assert db_timing.startswith("db;dur=")
+    assert int(db_timing.split('desc="')[1].split()[0]) > 0
+    assert total_timing.startswith("total;dur=")
+    assert int(db_timing.split(", ")[1].split()[0]) > 0
+
+    slow = client.get("/api/admin/slow?limit=5", headers=admin_headers).json()
+    assert len(slow["requests"]) == 2 and len(slow["queries"]) == 5
+    routes = {entry["route"] for entry in slow["requests"]}
+    assert routes == {"/api/submitData", "/api/submitData/{pereval_id}"}
+    assert all(entry["statements"] > 0 and entry["rows"] > 0 and "slowest_query" in entry for entry in slow["requests"])
+
+def test_metrics_endpoint(client, sample_pereval_data):
+    """Тест endpoint'а метрик Prometheus."""
+    pereval_id = client.post("/api/submitData", json=sample_pereval_data).json()["id"]
+    client.get(f"/api/submitData/{pereval_id}")
+    client.get(f"/api/submitData/{pereval_id}")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'fstr_perevals_created_total{status="new"}' in text
+    assert "fstr_image_bytes_ingested_total " in text
+    assert 'route="/api/submitData/{pereval_id}",status="200"' in text
+    assert 'fstr_cache_hits_total{cache="responses"} 1' in text
+    assert 'fstr_cache_hit_ratio{cache="responses"} 0.5' in text
+
+def test_pool_stats_endpoint(client, admin_headers):
+    """Тест endpoint'а статистики пулов соединений."""
+    response = client.get("/api/admin/pool", headers=admin_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data) == {"sync", "async"}
+    assert "pool_class" in data["async"]
+
+def test_admin_endpoints_require_token(client, monkeypatch):
+    """Служебные endpoint'ы без токена недоступны, а без настроенного токена отключены."""
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "test-admin-token")
+    for method, url in (("get", "/api/admin/pool"), ("get", "/api/admin/cache"),
+                        ("get", "/api/admin/slow"), ("post", "/api/admin/idempotency/purge")):
+        assert getattr(client, method)(url).status_code == 403
+        assert getattr(client, method)(url, headers={"X-Admin-Token": "wrong"}).status_code == 403
+        assert getattr(client, method)(url, headers={"X-Admin-Token": "test-admin-token"}).status_code == 200
+
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", None)
+    assert client.get("/api/admin/pool", headers={"X-Admin-Token": ""}).status_code == 403
+
 def test_root_endpoint(client):
     """Тест корневого endpoint."""
     response = client.get("/")
@@ -0,0 +1,34 @@
+"""
+Unit-тесты для тайлов карты и кэша кластеров.
+"""
+from services.clusters import tile_bounds, tile_for_point
+from services.lru import LRUCache
+
+def test_tile_math():
+    """Тест перевода точек в тайлы карты и обратно."""
+    z, x, y = tile_for_point(43.35, 42.45, 8)
+    min_lat, min_lon, max_lat, max_lon = tile_bounds(z, x, y)
+    assert min_lat <= 43.35 < max_lat
+    assert min_lon <= 42.45 < max_lon
+    assert tile_for_point(0, 0, 0) == (0, 0, 0)
+    assert tile_for_point(89.9, 180.0, 2) == (2, 3, 0)
+
+def test_lru_cache():
+    """Тест вытеснения давно использованных записей и защиты от устаревшей записи."""
+    cache = LRUCache(max_entries=2, ttl=60)
+    for key in ("a", "b"):
+        cache.put(key, key, cache.generation)
+    assert cache.get("a") == "a"
+    cache.put("c", "c", cache.generation)
+    assert len(cache) == 2 and cache.get("b") is None and cache.get("a") == "a"
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    # Значение, прочитанное до инвалидации, в кэш не попадает
+    generation = cache.generation
+    cache.invalidate(["a"])
+    cache.put("a", "stale", generation)
+    assert cache.get("a") is None
+
+    expired = LRUCache(max_entries=2, ttl=-1)
+    expired.put("a", "a", expired.generation)
+    assert expired.get("a") is None
@@ -0,0 +1,13 @@
+"""
+Unit-тесты для категорий трудности перевалов.
+"""
+from services.difficulty import difficulty_category, difficulty_rank
+
+def test_difficulty_rank():
+    """Тест ранжирования категорий трудности в разных написаниях."""
+    assert difficulty_rank("н/к") == 1
+    assert difficulty_rank("1А") == difficulty_rank("1a") == difficulty_rank(" 1A ") == 2
+    assert difficulty_rank("3Б") > difficulty_rank("2Б") > difficulty_rank("1Б")
+    assert difficulty_rank("") == difficulty_rank(None) == difficulty_rank("7X") == 0
+    assert difficulty_category(difficulty_rank("2b")) == "2Б"
+    assert difficulty_category(0) is None
@@ -0,0 +1,31 @@
+"""
+Unit-тесты для метрик Prometheus.
+"""
+import json
+import os
+from services import metrics
+
+def test_metrics_aggregated_across_workers(tmp_path, monkeypatch):
+    """Тест суммирования метрик из снимков нескольких воркеров."""
+    monkeypatch.setattr(metrics, "registry", metrics.MetricsRegistry())
+    metrics.inc("fstr_perevals_created_total", 2, status="new")
+    metrics.observe("fstr_http_request_duration_seconds", 0.02, method="GET", route="/api/perevals", status="200")
+    metrics.registry.add_collector(lambda: [("fstr_db_pool_checked_out", {"engine": "async"}, 3)])
+
+    # Снимок другого, уже завершившегося воркера: счетчики учитываются, gauge - нет
+    metrics.write_snapshot(str(tmp_path))
+    (tmp_path / f"{os.getpid()}.json").rename(tmp_path / "999999999.json")
+    other = json.loads((tmp_path / "999999999.json").read_text())
+    other["pid"] = 999999999
+    (tmp_path / "999999999.json").write_text(json.dumps(other))
+    metrics.write_snapshot(str(tmp_path))
+
+    text = metrics.render(str(tmp_path))
+    assert 'fstr_perevals_created_total{status="new"} 4' in text
+    assert 'fstr_db_pool_checked_out{engine="async"} 3' in text
+    labels = 'method="GET",route="/api/perevals",status="200"'
+    assert f'fstr_http_request_duration_seconds_bucket{{{labels},le="0.01"}} 0' in text
+    assert f'fstr_http_request_duration_seconds_bucket{{{labels},le="0.025"}} 2' in text
+    assert f'fstr_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in text
+    assert f"fstr_http_request_duration_seconds_count{{{labels}}} 2" in text
+    assert "# TYPE fstr_http_request_duration_seconds histogram" in text
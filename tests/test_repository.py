@@ -1,33 +1,60 @@
 """
 Unit-тесты для репозитория PerevalRepository.
 """
+import asyncio
+import importlib
 import pytest
-from sqlalchemy import create_engine
+from types import SimpleNamespace
+from sqlalchemy import create_engine, event, exc as sqlalchemy_exc
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.schema import CreateIndex
 from database.connection import Base
-from repository.pereval_repository import PerevalRepository
+from database.pool_stats import InstrumentedQueuePool, pool_stats
+from repository.pereval_repository import PerevalRepository, VersionConflictError
+from repository.async_pereval_repository import AsyncPerevalRepository
+from repository.idempotency import IdempotencyKeyReusedError, request_hash
+from repository.moderation import ModerationConflictError
+from repository.pagination import InvalidCursorError
+from services import clusters, spatial_index, title_search
+from services.clusters import tile_for_point
+from services.lru import LRUCache
+from services.difficulty import difficulty_rank
+from services.spatial_index import SpatialIndex
+from storage.blob_store import LocalBlobStore
 from models.user import User
 from models.coords import Coords
 from models.level import Level
 from models.image import Image
-from models.pereval import Pereval, PerevalStatus
+from models.pereval import Pereval, PerevalStatus, pereval_search_document
+from models.moderation_audit import ModerationAudit
+from models.idempotency_key import IdempotencyKey
 from schemas.user import UserCreate
 from schemas.coords import CoordsCreate
 from schemas.level import LevelCreate
 from schemas.image import ImageCreate
-from schemas.pereval import PerevalCreate
-from datetime import datetime
+from schemas.pereval import PerevalCreate, PerevalFilters
+from datetime import datetime, timedelta
 
-# Создаем тестовую базу данных в памяти
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+@pytest.fixture
+def database_path(tmp_path):
+    """Путь к файлу тестовой базы SQLite во временном каталоге теста."""
+    return str(tmp_path / "test.db")
+
+@pytest.fixture
+def engine(database_path):
+    """Фикстура с движком тестовой базы данных."""
+    engine = create_engine(f"sqlite:///{database_path}", connect_args={"check_same_thread": False})
+    yield engine
+    engine.dispose()
 
 @pytest.fixture
-def db_session():
+def db_session(engine):
     """Фикстура для создания тестовой сессии базы данных."""
     Base.metadata.create_all(bind=engine)
-    db = TestingSessionLocal()
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
     try:
         yield db
     finally:
@@ -35,9 +62,14 @@ def db_session():
         Base.metadata.drop_all(bind=engine)
 
 @pytest.fixture
-def pereval_repo(db_session):
+def blob_store(tmp_path):
+    """Фикстура с хранилищем блобов во временном каталоге."""
+    return LocalBlobStore(str(tmp_path / "blobs"))
+
+@pytest.fixture
+def pereval_repo(db_session, blob_store):
     """Фикстура для создания репозитория."""
-    return PerevalRepository(db_session)
+    return PerevalRepository(db_session, blob_store)
 
 @pytest.fixture
 def sample_user_data():
@@ -138,12 +170,54 @@ def test_update_pereval_wrong_status(pereval_repo, sample_pereval_data, db_sessi
     
     assert success is False
 
+def test_update_pereval_status_changed_concurrently(pereval_repo, sample_pereval_data, db_session, monkeypatch):
+    """Тест обновления перевала, который взяли на модерацию после проверки статуса."""
+    pereval_id = pereval_repo.create_pereval(sample_pereval_data)
+    db_session.query(Pereval).filter(Pereval.id == pereval_id).update({"status": PerevalStatus.PENDING})
+    db_session.commit()
+
+    # Проверка статуса видела прежнее состояние - UPDATE не должен примениться
+    monkeypatch.setattr(pereval_repo, "get_pereval_by_id", lambda _: SimpleNamespace(status=PerevalStatus.NEW))
+    assert pereval_repo.update_pereval(pereval_id, {"title": "Новое название"}, expected_version=1) is False
+    assert pereval_repo.get_pereval_version(pereval_id)[0] == 1
+
 def test_update_pereval_not_found(pereval_repo):
     """Тест обновления несуществующего перевала."""
     update_data = {"title": "Новое название"}
     success = pereval_repo.update_pereval(999, update_data)
     assert success is False
 
+def test_update_pereval_version_conflict(pereval_repo, sample_pereval_data):
+    """Тест оптимистической блокировки при обновлении перевала."""
+    pereval_id = pereval_repo.create_pereval(sample_pereval_data)
+    assert pereval_repo.update_pereval(pereval_id, {"title": "Первое"}, expected_version=1) is True
+
+    # Второй клиент рассчитывал на версию 1 - его изменение не применяется
+    with pytest.raises(VersionConflictError) as conflict:
+        pereval_repo.update_pereval(pereval_id, {"title": "Второе"}, expected_version=1)
+    assert conflict.value.current_version == 2
+    assert pereval_repo.get_pereval_by_id(pereval_id).title == "Первое"
+
+def test_update_pereval_images_diff(pereval_repo, sample_pereval_data, db_session):
+    """Тест обновления изображений по разнице: неизмененные не перезаписываются."""
+    pereval_id = pereval_repo.create_pereval(sample_pereval_data)
+    old_image = db_session.query(Image).filter(Image.pereval_id == pereval_id).one()
+    old_id, old_key = old_image.id, old_image.blob_key
+    gif = "R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7"
+
+    pereval_repo.update_pereval(pereval_id, {"images": [
+        {"data": sample_pereval_data.images[0].data, "title": "Новое название"},
+        {"data": gif, "title": "Вторая"}
+    ]})
+    images = db_session.query(Image).filter(Image.pereval_id == pereval_id).order_by(Image.id).all()
+    assert [(image.id, image.title) for image in images][0] == (old_id, "Новое название")
+    assert images[1].mime_type == "image/gif"
+
+    pereval_repo.update_pereval(pereval_id, {"images": [{"data": gif, "title": "Вторая"}]})
+    images = db_session.query(Image).filter(Image.pereval_id == pereval_id).all()
+    assert [image.id for image in images] == [images[0].id]
+    assert images[0].blob_key != old_key
+
 def test_list_perevals_by_user_email(pereval_repo, sample_pereval_data):
     """Тест получения списка перевалов по email пользователя."""
     # Создаем перевал
@@ -186,3 +260,442 @@ def test_list_perevals_by_user_email_pagination(pereval_repo, sample_pereval_dat
     assert len(perevals_page1) == 2
     assert len(perevals_page2) == 2
     assert perevals_page1[0].id != perevals_page2[0].id
+
+def test_create_pereval_reuses_existing_user(pereval_repo, sample_pereval_data, db_session):
+    """Тест повторного использования существующего пользователя."""
+    first_id = pereval_repo.create_pereval(sample_pereval_data)
+    second_id = pereval_repo.create_pereval(sample_pereval_data)
+
+    assert first_id != second_id
+    assert db_session.query(User).count() == 1
+    first = pereval_repo.get_pereval_by_id(first_id)
+    second = pereval_repo.get_pereval_by_id(second_id)
+    assert first.user_id == second.user_id
+
+def test_upsert_users_does_not_rewrite_existing(pereval_repo, sample_user_data, engine):
+    """Существующие пользователи только читаются: без UPDATE и без изменения данных."""
+    existing_id = pereval_repo._upsert_user(sample_user_data)
+    pereval_repo.db.commit()
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+
+    new_user = sample_user_data.model_copy(update={"email": "new@example.com"})
+    changed_user = sample_user_data.model_copy(update={"fam": "Другая"})
+    user_ids = pereval_repo._upsert_users([changed_user, new_user])
+
+    assert user_ids[sample_user_data.email] == existing_id
+    assert user_ids["new@example.com"] not in (None, existing_id)
+    assert not any(statement.lstrip().upper().startswith("UPDATE") for statement in statements)
+    assert pereval_repo.db.get(User, existing_id).fam == sample_user_data.fam
+
+def test_create_pereval_rollback_leaves_no_orphans(pereval_repo, sample_pereval_data, db_session):
+    """Тест отката всей транзакции при ошибке на вставке изображений."""
+    # Строка изображения без blob_key нарушает NOT NULL на последней вставке
+    broken_image = {"blob_key": None, "size": 3, "mime_type": "image/png", "title": "Фото"}
+
+    with pytest.raises(sqlalchemy_exc.IntegrityError):
+        pereval_repo.create_pereval(sample_pereval_data, stored_images=[broken_image])
+
+    assert db_session.query(User).count() == 0
+    assert db_session.query(Coords).count() == 0
+    assert db_session.query(Level).count() == 0
+    assert db_session.query(Pereval).count() == 0
+    assert db_session.query(Image).count() == 0
+
+def test_create_pereval_idempotent(pereval_repo, sample_pereval_data, db_session):
+    """Повтор с тем же ключом возвращает существующий перевал без новых записей."""
+    pereval = sample_pereval_data
+    content_hash = request_hash(pereval)
+
+    pereval_id, created = pereval_repo.create_pereval_idempotent(pereval, "key-1", content_hash)
+    assert pereval_id is not None and created
+
+    assert pereval_repo.create_pereval_idempotent(pereval, "key-1", content_hash) == (pereval_id, False)
+    assert db_session.query(Pereval).count() == 1
+    assert db_session.query(Image).count() == len(pereval.images)
+
+    changed = pereval.model_copy(update={"title": "Другой перевал"})
+    with pytest.raises(IdempotencyKeyReusedError):
+        pereval_repo.create_pereval_idempotent(changed, "key-1", request_hash(changed))
+
+    # Устаревший ключ перезаписывается при создании и удаляется очисткой
+    db_session.query(IdempotencyKey).update({"created_at": datetime.utcnow() - timedelta(days=2)})
+    db_session.commit()
+    new_id, created = pereval_repo.create_pereval_idempotent(changed, "key-1", request_hash(changed))
+    assert created and new_id != pereval_id
+    assert pereval_repo.purge_idempotency_keys() == 0
+
+    db_session.query(IdempotencyKey).update({"created_at": datetime.utcnow() - timedelta(days=2)})
+    db_session.commit()
+    assert pereval_repo.purge_idempotency_keys() == 1
+
+
+def test_create_perevals_batch(pereval_repo, sample_pereval_data, db_session):
+    """Тест пакетного создания перевалов."""
+    other_user = sample_pereval_data.user.model_copy(update={"email": "other@example.com"})
+    batch = [
+        sample_pereval_data.model_copy(update={"title": f"Перевал {i}", "user": other_user if i % 2 else sample_pereval_data.user})
+        for i in range(4)
+    ]
+
+    pereval_ids = pereval_repo.create_perevals_batch(batch)
+
+    assert len(pereval_ids) == 4
+    assert len(set(pereval_ids)) == 4
+    for i, pereval_id in enumerate(pereval_ids):
+        assert pereval_repo.get_pereval_by_id(pereval_id).title == f"Перевал {i}"
+    assert db_session.query(User).count() == 2
+    assert db_session.query(Image).count() == 4
+
+def test_list_perevals_by_user_email_constant_query_count(pereval_repo, sample_pereval_data, db_session, engine):
+    """Тест отсутствия N+1: число запросов не зависит от размера страницы."""
+    pereval_repo.create_perevals_batch([sample_pereval_data] * 10)
+    db_session.expire_all()
+
+    statements = []
+
+    def count_statement(*args):
+        statements.append(args)
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        perevals = pereval_repo.list_perevals_by_user_email("test@example.com")
+        for pereval in perevals:
+            assert pereval.user.email == "test@example.com"
+            assert pereval.coords.latitude == 45.3842
+            assert pereval.level.summer == "1А"
+            assert len(pereval.images) == 1
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+    assert len(perevals) == 10
+    assert len(statements) == 2
+
+def test_page_perevals_by_user_email_cursor(pereval_repo, sample_pereval_data):
+    """Тест курсорной пагинации: страницы не пересекаются и покрывают все записи."""
+    batch = [
+        sample_pereval_data.model_copy(update={"add_time": datetime(2021, 9, 22 - i % 2, 13, 18, 13)})
+        for i in range(5)
+    ]
+    created_ids = pereval_repo.create_perevals_batch(batch)
+
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        perevals, cursor = pereval_repo.page_perevals_by_user_email("test@example.com", limit=2, after=cursor)
+        seen.extend(perevals)
+        pages += 1
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert sorted(p.id for p in seen) == sorted(created_ids)
+    assert [(p.add_time, p.id) for p in seen] == sorted((p.add_time, p.id) for p in seen)
+
+def test_page_perevals_by_user_email_invalid_cursor(pereval_repo):
+    """Тест обработки поврежденного курсора."""
+    with pytest.raises(InvalidCursorError):
+        pereval_repo.page_perevals_by_user_email("test@example.com", limit=2, after="не-курсор")
+
+def test_create_pereval_stores_images_in_blob_store(pereval_repo, sample_pereval_data, blob_store, db_session):
+    """Тест сохранения изображений в хранилище блобов с дедупликацией."""
+    pereval_repo.create_pereval(sample_pereval_data)
+    pereval_repo.create_pereval(sample_pereval_data)
+
+    images = db_session.query(Image).all()
+    assert len(images) == 2
+    assert images[0].blob_key == images[1].blob_key
+    assert images[0].mime_type == "image/png"
+    content = blob_store.get(images[0].blob_key)
+    assert content == sample_pereval_data.images[0].content
+    assert images[0].size == len(content)
+
+def test_async_repository_create_and_get(db_session, blob_store, sample_pereval_data, database_path):
+    """Тест асинхронного репозитория поверх AsyncSession."""
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{database_path}", poolclass=NullPool)
+
+    async def scenario():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            repo = AsyncPerevalRepository(session, blob_store)
+            pereval_id = await repo.create_pereval(sample_pereval_data)
+            pereval = await repo.get_pereval_detail(pereval_id)
+            return pereval_id, pereval
+
+    pereval_id, pereval = asyncio.run(scenario())
+
+    assert pereval.id == pereval_id
+    assert pereval.user.email == "test@example.com"
+    assert len(pereval.images) == 1
+
+def test_instrumented_pool_stats(database_path):
+    """Тест счетчиков инструментированного пула соединений."""
+    pool_engine = create_engine(
+        f"sqlite:///{database_path}", poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.01
+    )
+    with pool_engine.connect():
+        stats = pool_stats(pool_engine.pool)
+        assert stats["checked_out"] == 1
+        assert stats["utilization"] == 1.0
+        with pytest.raises(sqlalchemy_exc.TimeoutError):
+            pool_engine.connect()
+
+    stats = pool_stats(pool_engine.pool)
+    assert stats["checkouts"] == 1
+    assert stats["timeouts"] == 1
+    assert stats["checked_out"] == 0
+    pool_engine.dispose()
+
+def test_list_perevals_in_bbox(pereval_repo, sample_pereval_data):
+    """Тест поиска перевалов в прямоугольной области карты."""
+    inside_id = pereval_repo.create_pereval(sample_pereval_data)
+    pereval_repo.create_pereval(sample_pereval_data.model_copy(
+        update={"coords": CoordsCreate(latitude=43.35, longitude=42.45, height=3500)}
+    ))
+    dateline_id = pereval_repo.create_pereval(sample_pereval_data.model_copy(
+        update={"coords": CoordsCreate(latitude=45.0, longitude=179.5, height=100)}
+    ))
+
+    rows = pereval_repo.list_perevals_in_bbox(45.0, 7.0, 46.0, 8.0, limit=10)
+    assert [row["id"] for row in rows] == [inside_id]
+    assert rows[0]["latitude"] == 45.3842
+
+    rows = pereval_repo.list_perevals_in_bbox(44.0, 179.0, 46.0, -179.0, limit=10)
+    assert [row["id"] for row in rows] == [dateline_id]
+
+def test_spatial_index_follows_commits(pereval_repo, sample_pereval_data, monkeypatch):
+    """Тест обновления пространственного индекса после коммита."""
+    index = SpatialIndex()
+    index.mark_refreshed()
+    monkeypatch.setattr(spatial_index, "pereval_spatial_index", index)
+
+    pereval_id = pereval_repo.create_pereval(sample_pereval_data)
+    assert index.nearest(45.3842, 7.1525, radius_km=1, k=5)[0][0] == pereval_id
+    _, change_seq = pereval_repo.list_pereval_coords()
+
+    pereval_repo.update_pereval(pereval_id, {"coords": {"latitude": 43.35, "longitude": 42.45}})
+    assert index.nearest(45.3842, 7.1525, radius_km=1, k=5) == []
+    assert index.nearest(43.35, 42.45, radius_km=1, k=5)[0][0] == pereval_id
+
+    # Догрузка по номеру изменения видит измененный перевал
+    rows, next_seq = pereval_repo.list_pereval_coords(change_seq)
+    assert rows == [(pereval_id, 43.35, 42.45)]
+    assert pereval_repo.list_pereval_coords(next_seq) == ([], next_seq)
+
+def test_list_pereval_clusters(pereval_repo, sample_pereval_data):
+    """Тест агрегации перевалов по ячейкам области."""
+    pereval_repo.create_pereval(sample_pereval_data)
+    pereval_repo.create_pereval(sample_pereval_data.model_copy(update={
+        "coords": CoordsCreate(latitude=45.39, longitude=7.16, height=1300),
+        "level": LevelCreate(winter="2Б", summer="1Б")
+    }))
+    pereval_repo.create_pereval(sample_pereval_data.model_copy(
+        update={"coords": CoordsCreate(latitude=45.9, longitude=7.9, height=3000)}
+    ))
+
+    rows = pereval_repo.list_pereval_clusters(45.0, 7.0, 46.0, 8.0, grid_size=4)
+    assert [row["count"] for row in rows] == [1, 2]
+    assert rows[1]["latitude"] == pytest.approx((45.3842 + 45.39) / 2)
+    assert rows[1]["max_difficulty_rank"] == difficulty_rank("2Б")
+    assert rows[0]["max_difficulty_rank"] == difficulty_rank("1А")
+
+def test_tile_cache_invalidated_after_commit(pereval_repo, sample_pereval_data, monkeypatch):
+    """Тест сброса кэша тайлов после коммита изменений."""
+    cache = LRUCache(max_entries=2, ttl=60)
+    monkeypatch.setattr(clusters, "cluster_tile_cache", cache)
+    pereval_id = pereval_repo.create_pereval(sample_pereval_data)
+
+    old_tile = tile_for_point(45.3842, 7.1525, 10)
+    new_tile = tile_for_point(43.35, 42.45, 10)
+    cache.put(old_tile, "old", cache.generation)
+    cache.put(new_tile, "new", cache.generation)
+    assert cache.get(old_tile) == "old"
+
+    generation = cache.generation
+    pereval_repo.update_pereval(pereval_id, {"coords": {"latitude": 43.35, "longitude": 42.45}})
+    assert cache.get(old_tile) is None
+    assert cache.get(new_tile) is None
+
+    # Значение, прочитанное до инвалидации, в кэш не попадает
+    cache.put(old_tile, "stale", generation)
+    assert cache.get(old_tile) is None
+
+def test_search_perevals_fallback(pereval_repo, sample_pereval_data, monkeypatch):
+    """Тест поиска по названиям в SQLite через индекс в памяти."""
+    monkeypatch.setattr(title_search, "title_search_index", title_search.TitleSearchIndex())
+    pereval_id = pereval_repo.create_pereval(sample_pereval_data)
+
+    rows = pereval_repo.search_perevals("тестов", limit=10)
+    assert [row["id"] for row in rows] == [pereval_id]
+    assert rows[0]["title"] == "Тестовый перевал"
+
+    # Новые и измененные после загрузки индекса перевалы тоже находятся
+    other_id = pereval_repo.create_pereval(sample_pereval_data.model_copy(update={"title": "Ледниковый"}))
+    pereval_repo.update_pereval(pereval_id, {"title": "Моренный"})
+    assert [row["id"] for row in pereval_repo.search_perevals("ледникавый", limit=10)] == [other_id]
+    assert [row["id"] for row in pereval_repo.search_perevals("моренн", limit=10)] == [pereval_id]
+    assert pereval_repo.search_perevals("  ", limit=10) == []
+
+def test_search_perevals_postgresql_query(blob_store):
+    """Тест поиска в PostgreSQL: ё и е совпадают и в запросе, и в выражении индексов."""
+    statements = []
+
+    class PostgresSession:
+        def get_bind(self):
+            return SimpleNamespace(dialect=postgresql.dialect())
+
+        def execute(self, query):
+            statements.append(query)
+            return []
+
+    repo = PerevalRepository(PostgresSession(), blob_store)
+    repo.search_perevals("Подъём", limit=10)
+    repo.search_perevals("подъем", limit=10)
+    first, second = (
+        str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        for query in statements
+    )
+    assert first == second
+    assert "to_tsquery('simple'::regconfig, 'подъем:*')" in first
+
+    # Индексы строятся по тому же выражению: название «Подъёмный» в них - «подъемный»
+    document = str(pereval_search_document.compile(dialect=postgresql.dialect()))
+    assert document.startswith("translate(lower(") and document.endswith("'ёЁ', 'ее')")
+    assert first.count(document) == 3
+    index_ddl = {
+        index.name: str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+        for index in Pereval.__table__.indexes if index.name.startswith("ix_pereval_search")
+    }
+    migration = importlib.import_module("database.migrations.versions.0010_pereval_search_yo")
+    for ddl in index_ddl.values():
+        assert document.replace("pereval.", "") in ddl
+        assert migration.SEARCH_DOCUMENT in ddl
+
+def test_page_perevals_filters(pereval_repo, sample_pereval_data, db_session):
+    """Тест списка перевалов с фильтрами по статусу, уровню, дате и отправителю."""
+    easy_id, hard_id, old_id = pereval_repo.create_perevals_batch([
+        sample_pereval_data,
+        sample_pereval_data.model_copy(update={"level": LevelCreate(summer="2Б", winter="н/к")}),
+        sample_pereval_data.model_copy(update={
+            "level": LevelCreate(summer="3A"),
+            "add_time": datetime(2020, 1, 1)
+        }),
+    ])
+    db_session.query(Pereval).filter(Pereval.id.in_([hard_id, old_id])).update(
+        {Pereval.status: PerevalStatus.PENDING}
+    )
+    db_session.commit()
+
+    def ids(**filters):
+        rows, _ = pereval_repo.page_perevals(PerevalFilters(**filters), limit=10)
+        return [row["id"] for row in rows]
+
+    assert ids() == [old_id, easy_id, hard_id]
+    assert ids(status=PerevalStatus.PENDING) == [old_id, hard_id]
+    assert ids(status=PerevalStatus.PENDING, added_from=datetime(2021, 1, 1)) == [hard_id]
+    assert ids(added_to=datetime(2021, 1, 1)) == [old_id]
+    assert ids(season="summer", min_level="2А") == [old_id, hard_id]
+    assert ids(season="winter", min_level="н/к") == [hard_id]
+    assert ids(min_level="3Б") == []
+    assert ids(user_email="other@example.com") == []
+
+    rows, cursor = pereval_repo.page_perevals(PerevalFilters(), limit=2)
+    assert [row["id"] for row in rows] == [old_id, easy_id]
+    assert rows[0]["user_email"] == "test@example.com"
+    rows, cursor = pereval_repo.page_perevals(PerevalFilters(), limit=2, after=cursor)
+    assert [row["id"] for row in rows] == [hard_id]
+    assert cursor is None
+
+def test_moderation_claim_and_decide(pereval_repo, sample_pereval_data):
+    """Тест захвата перевалов модераторами и решений по ним."""
+    first_id, second_id, third_id = pereval_repo.create_perevals_batch([sample_pereval_data] * 3)
+
+    claimed = pereval_repo.claim_perevals("anna", limit=2)
+    assert [row["id"] for row in claimed] == [first_id, second_id]
+    assert claimed[0]["status"] == PerevalStatus.PENDING
+    assert [row["id"] for row in pereval_repo.claim_perevals("boris", limit=2)] == [third_id]
+    assert pereval_repo.claim_perevals("boris", limit=2) == []
+
+    with pytest.raises(ModerationConflictError):
+        pereval_repo.decide_pereval(first_id, "boris", PerevalStatus.ACCEPTED)
+    audit = pereval_repo.decide_pereval(first_id, "anna", PerevalStatus.ACCEPTED, "Все верно")
+    assert (audit.action, audit.from_status, audit.to_status) == ("accept", PerevalStatus.PENDING, PerevalStatus.ACCEPTED)
+    assert pereval_repo.get_pereval_by_id(first_id).status == PerevalStatus.ACCEPTED
+    assert pereval_repo.get_pereval_by_id(first_id).claimed_by is None
+
+    # Решение уже принято - повторно нельзя
+    with pytest.raises(ModerationConflictError):
+        pereval_repo.decide_pereval(first_id, "anna", PerevalStatus.REJECTED)
+
+    pereval_repo.release_pereval(second_id, "anna")
+    assert pereval_repo.get_pereval_by_id(second_id).status == PerevalStatus.NEW
+    assert pereval_repo.decide_pereval(999, "anna", PerevalStatus.ACCEPTED) is None
+
+    assert [entry.action for entry in pereval_repo.get_moderation_audit(first_id)] == ["claim", "accept"]
+    assert [entry.action for entry in pereval_repo.get_moderation_audit(second_id)] == ["claim", "release"]
+
+def test_sync_perevals_change_sequence(pereval_repo, sample_pereval_data):
+    """Синхронизация возвращает только перевалы, измененные после курсора."""
+    first_id, second_id, third_id = pereval_repo.create_perevals_batch([sample_pereval_data] * 3)
+    email = sample_pereval_data.user.email
+
+    rows, cursor, has_more = pereval_repo.sync_perevals(email, limit=2)
+    assert [row["id"] for row in rows] == [first_id, second_id] and has_more
+    rows, cursor, has_more = pereval_repo.sync_perevals(email, limit=2, since=cursor)
+    assert [row["id"] for row in rows] == [third_id] and not has_more
+    assert pereval_repo.sync_perevals(email, limit=2, since=cursor) == ([], cursor, False)
+
+    # Изменение данных и смена статуса модератором - новые номера изменений
+    pereval_repo.update_pereval(second_id, {"title": "Новое название"})
+    pereval_repo.claim_perevals("anna", limit=1)
+    rows, cursor, _ = pereval_repo.sync_perevals(email, limit=10, since=cursor)
+    assert [(row["id"], row["version"]) for row in rows] == [(second_id, 2), (first_id, 2)]
+    assert rows[0]["title"] == "Новое название"
+    assert rows[1]["status"] == PerevalStatus.PENDING
+    assert rows[0]["change_seq"] < rows[1]["change_seq"]
+
+    assert pereval_repo.sync_perevals("other@example.com", limit=10)[0] == []
+    with pytest.raises(InvalidCursorError):
+        pereval_repo.sync_perevals(email, limit=10, since="not-a-cursor")
+
+def test_moderation_expired_claims(pereval_repo, sample_pereval_data, db_session):
+    """Тест перехвата и возврата в очередь истекших захватов."""
+    first_id, second_id = pereval_repo.create_perevals_batch([sample_pereval_data] * 2)
+    pereval_repo.claim_perevals("anna", limit=2)
+
+    # С нулевым временем жизни захват anna уже истек: boris перехватывает перевал
+    claimed = pereval_repo.claim_perevals("boris", limit=1, claim_timeout=-1)
+    assert [row["id"] for row in claimed] == [first_id]
+    with pytest.raises(ModerationConflictError):
+        pereval_repo.decide_pereval(first_id, "anna", PerevalStatus.ACCEPTED)
+    takeover = pereval_repo.get_moderation_audit(first_id)[-1]
+    assert takeover.moderator == "boris"
+    assert "anna" in takeover.comment
+
+    assert pereval_repo.release_expired_claims(claim_timeout=-1) == 2
+    assert pereval_repo.release_expired_claims(claim_timeout=-1) == 0
+    assert pereval_repo.get_pereval_by_id(second_id).status == PerevalStatus.NEW
+    assert db_session.query(ModerationAudit).filter(ModerationAudit.action == "expire").count() == 2
+
+def test_pereval_version_bumped_on_changes(pereval_repo, sample_pereval_data):
+    """Тест увеличения версии перевала при каждом изменении."""
+    pereval_id = pereval_repo.create_pereval(sample_pereval_data)
+    version, updated_at = pereval_repo.get_pereval_version(pereval_id)
+    assert version == 1 and updated_at is not None
+
+    pereval_repo.update_pereval(pereval_id, {"title": "Новое название"})
+    assert pereval_repo.get_pereval_version(pereval_id)[0] == 2
+    pereval_repo.add_images(pereval_id, [{"blob_key": "k", "size": 1, "mime_type": "image/jpeg", "title": "Фото"}])
+    assert pereval_repo.get_pereval_version(pereval_id)[0] == 3
+
+    pereval_repo.claim_perevals("anna", limit=1)
+    pereval_repo.decide_pereval(pereval_id, "anna", PerevalStatus.ACCEPTED)
+    assert pereval_repo.get_pereval_version(pereval_id)[0] == 5
+    assert pereval_repo.get_pereval_version(999) is None
+
+    # После модерации изображения не добавляются и версия не меняется
+    images_count = len(pereval_repo.get_pereval_by_id(pereval_id).images)
+    image = {"blob_key": "k2", "size": 1, "mime_type": "image/jpeg", "title": "Еще фото"}
+    assert pereval_repo.add_images(pereval_id, [image]) is None
+    assert pereval_repo.get_pereval_version(pereval_id)[0] == 5
+    assert len(pereval_repo.get_pereval_by_id(pereval_id).images) == images_count
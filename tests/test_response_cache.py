@@ -0,0 +1,35 @@
+"""
+Unit-тесты для кэша сериализованных ответов.
+"""
+import asyncio
+from services import response_cache
+
+def test_memory_response_cache_bounds():
+    """Тест ограничений кэша ответов и защиты от записи устаревшего ответа."""
+    async def scenario():
+        cache = response_cache.MemoryResponseCache(max_entries=2, max_bytes=10, ttl=60)
+        await cache.set("a", response_cache.CachedResponse(b"1234", {}), await cache.token())
+        await cache.set("b", response_cache.CachedResponse(b"1234", {}), await cache.token())
+        assert (await cache.get("a")).body == b"1234"
+        await cache.set("c", response_cache.CachedResponse(b"1234", {}), await cache.token())
+        assert await cache.get("b") is None
+        assert cache.stats()["entries"] == 2
+
+        # Ограничение по байтам вытесняет самые давно использованные записи
+        await cache.set("d", response_cache.CachedResponse(b"12345678", {}), await cache.token())
+        assert await cache.get("a") is None and await cache.get("c") is None
+        assert cache.stats()["bytes"] == 8
+
+        # Ответ, прочитанный до инвалидации ключа, не сохраняется
+        token = await cache.token()
+        await cache.delete(["e"])
+        await cache.set("e", response_cache.CachedResponse(b"old", {}), token)
+        assert await cache.get("e") is None
+        await cache.set("e", response_cache.CachedResponse(b"new", {}), await cache.token())
+        assert (await cache.get("e")).body == b"new"
+
+        expired = response_cache.MemoryResponseCache(max_entries=2, max_bytes=10, ttl=-1)
+        await expired.set("a", response_cache.CachedResponse(b"1", {}), await expired.token())
+        assert await expired.get("a") is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,23 @@
+"""
+Unit-тесты для пространственного индекса перевалов.
+"""
+from services.spatial_index import SpatialIndex
+
+def test_spatial_index_nearest():
+    """Тест поиска ближайших точек в сеточном индексе."""
+    index = SpatialIndex()
+    index.upsert_many([(1, 43.0, 42.0), (2, 43.05, 42.0), (3, 43.5, 42.0), (4, 43.0, 179.99), (5, 43.0, -179.99)])
+
+    result = index.nearest(43.0, 42.0, radius_km=10, k=5)
+    assert [point_id for point_id, _ in result] == [1, 2]
+    assert result[0][1] == 0
+    assert 5.5 < result[1][1] < 5.6
+    assert [point_id for point_id, _ in index.nearest(43.0, 42.0, radius_km=100, k=1)] == [1]
+
+    # Поиск через 180-й меридиан
+    assert [point_id for point_id, _ in index.nearest(43.0, 179.995, radius_km=5, k=5)] == [4, 5]
+
+    # Перенос точки на новые координаты
+    index.upsert_many([(1, 10.0, 10.0)])
+    assert [point_id for point_id, _ in index.nearest(43.0, 42.0, radius_km=10, k=5)] == [2]
+    assert len(index) == 5
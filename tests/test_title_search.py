@@ -0,0 +1,22 @@
+"""
+Unit-тесты для индекса поиска перевалов по названию.
+"""
+from services import title_search
+
+def test_title_search_index():
+    """Тест n-граммного поиска по названиям с опечатками и префиксами."""
+    index = title_search.TitleSearchIndex()
+    index.upsert_many([
+        (1, "пер. Пхия", "Пхия", "Пхийский"),
+        (2, "пер. Чучхур", "Чучхур", None),
+        (3, "пер. Пхия Южный", "Пхия Южный", ""),
+    ])
+
+    assert [pereval_id for pereval_id, _ in index.search("пхи", 10)] == [1, 3]
+    assert [pereval_id for pereval_id, _ in index.search("пхиа юж", 10)] == [3]
+    assert [pereval_id for pereval_id, _ in index.search("Чучхр", 10)] == [2]
+    assert index.search("Эльбрус", 10) == []
+
+    index.upsert_many([(2, "пер. Эльбрусский", "Эльбрусский", None)])
+    assert [pereval_id for pereval_id, _ in index.search("эльбр", 10)] == [2]
+    assert index.search("чучхур", 10) == []